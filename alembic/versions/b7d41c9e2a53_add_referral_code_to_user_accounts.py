@@ -0,0 +1,33 @@
+"""add_referral_code_to_user_accounts
+
+Revision ID: b7d41c9e2a53
+Revises: 2872afaa6467
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41c9e2a53'
+down_revision: Union[str, Sequence[str], None] = '2872afaa6467'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS referral_code VARCHAR")
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_accounts_referral_code "
+        "ON user_accounts (referral_code)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_user_accounts_referral_code")
+    op.execute("ALTER TABLE user_accounts DROP COLUMN IF EXISTS referral_code")
@@ -0,0 +1,47 @@
+"""unique_active_student_preference_rules
+
+Revision ID: c3e8f1a4d6b2
+Revises: b7d41c9e2a53
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f1a4d6b2'
+down_revision: Union[str, Sequence[str], None] = 'b7d41c9e2a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PREFERENCE_WHERE = (
+    "is_active AND scope = 'student' "
+    "AND type IN ('language', 'speech_pace', 'correction_style')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep only the newest active preference per student and type
+    op.execute(
+        "UPDATE tutor_rules SET is_active = false "
+        f"WHERE {PREFERENCE_WHERE} AND applies_to_student_id IS NOT NULL "
+        "AND id NOT IN ("
+        "SELECT MAX(id) FROM tutor_rules "
+        f"WHERE {PREFERENCE_WHERE} AND applies_to_student_id IS NOT NULL "
+        "GROUP BY applies_to_student_id, type"
+        ")"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_tutor_rules_active_student_preference "
+        f"ON tutor_rules (applies_to_student_id, type) WHERE {PREFERENCE_WHERE}"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS uq_tutor_rules_active_student_preference")
@@ -3,6 +3,8 @@ from sqlmodel import Session, select
 from app.database import get_session
 from app.models import AppSettings, UserAccount, UserProfile, TutorSystemRule, DebugSettings
 from app.services.auth_service import get_current_user
+from app.services.smart_brain import refresh_api_key_cache
+from app.services.tutor_service import BEGINNER_RULES_PATH, bump_rules_version, reload_beginner_rules
 from pydantic import BaseModel
 import openai
 import requests
@@ -45,6 +47,7 @@ def update_settings(data: SettingsUpdate, session: Session = Depends(get_session
     session.add(settings)
     session.commit()
     session.refresh(settings)
+    refresh_api_key_cache()
     return settings
 
 @router.get("/debug-settings")
@@ -281,6 +284,7 @@ def update_system_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    bump_rules_version()
     return rule
 
 # Voice Management Endpoints
@@ -573,7 +577,7 @@ def get_beginner_rules(
     
     import os
     import json
-    rules_path = os.path.join(os.getcwd(), "app", "data", "tutor_rules_beginner.json")
+    rules_path = BEGINNER_RULES_PATH
     
     if not os.path.exists(rules_path):
         return {}
@@ -592,13 +596,13 @@ def save_beginner_rules(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    import os
     import json
-    rules_path = os.path.join(os.getcwd(), "app", "data", "tutor_rules_beginner.json")
+    rules_path = BEGINNER_RULES_PATH
     
     try:
         with open(rules_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
+        reload_beginner_rules()
         return {"status": "ok", "message": "Rules saved"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save rules: {str(e)}")
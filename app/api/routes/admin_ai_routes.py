@@ -11,6 +11,7 @@ from app.models import (
 )
 from app.services.auth_service import get_current_user
 from app.services.admin_ai_service import process_admin_message
+from app.services.speech_preferences import forget_slow_speech_rule
 
 router = APIRouter()
 
@@ -144,6 +145,7 @@ def update_rule(
         raise HTTPException(status_code=404, detail="Rule not found")
     
     changes = []
+    old_type = rule.type
     update_data = data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         old_value = getattr(rule, key)
@@ -157,6 +159,9 @@ def update_rule(
         session.add(rule)
         session.commit()
         session.refresh(rule)
+        if "speech_pace" in (old_type, rule.type):
+            # The student may have changed too; marks are cheap to rebuild
+            forget_slow_speech_rule()
         
         # Create audit version
         version = TutorRuleVersion(
@@ -10,7 +10,7 @@ from pydantic import BaseModel
 
 from app.database import get_session
 from app.models import AppSettings
-from app.services.token_health import test_openai_key, test_yandex_speechkit_key, mask_api_key, TokenHealthResult
+from app.services.token_health import check_all_tokens, mask_api_key, TokenHealthResult
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -76,6 +76,36 @@ async def get_tokens_status(session: Session = Depends(get_session)):
         yandex_speechkit=yandex_status
     )
 
+def _get_or_create_settings(session: Session) -> AppSettings:
+    settings = session.get(AppSettings, 1)
+    if not settings:
+        settings = AppSettings(id=1)
+        session.add(settings)
+        session.commit()
+        session.refresh(settings)
+    return settings
+
+def _resolve_key(provider: str, settings: AppSettings) -> str | None:
+    """API key for a provider: OpenAI from DB or env, Yandex from env (for now)."""
+    if provider == "openai":
+        return settings.openai_api_key if settings and settings.openai_api_key else os.getenv("OPENAI_API_KEY")
+    return os.getenv("YANDEX_API_KEY")
+
+MISSING_KEY_MESSAGES = {
+    "openai": "OpenAI API key not configured",
+    "yandex_speechkit": "Yandex API key not configured (check YANDEX_API_KEY env var)",
+}
+
+def _record_result(settings: AppSettings, provider: str, result: TokenHealthResult, now: datetime):
+    """Store a check result on settings (only if the fields exist)."""
+    prefix = "openai" if provider == "openai" else "yandex"
+    if hasattr(settings, f"{prefix}_key_status"):
+        setattr(settings, f"{prefix}_key_status", result.status)
+    if hasattr(settings, f"{prefix}_key_last_checked_at"):
+        setattr(settings, f"{prefix}_key_last_checked_at", now)
+    if hasattr(settings, f"{prefix}_key_last_error"):
+        setattr(settings, f"{prefix}_key_last_error", result.message if result.status != "ok" else None)
+
 @router.post("/tokens/test", response_model=TestTokenResponse)
 async def test_token(request: TestTokenRequest, session: Session = Depends(get_session)):
     """
@@ -84,86 +114,64 @@ async def test_token(request: TestTokenRequest, session: Session = Depends(get_s
     This makes an actual API call to verify the token is valid and working.
     Updates the token status in the database.
     """
-    settings = session.get(AppSettings, 1)
-    if not settings:
-        settings = AppSettings(id=1)
-        session.add(settings)
-        session.commit()
-        session.refresh(settings)
+    if request.provider not in MISSING_KEY_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown provider: {request.provider}"
+        )
     
-    now = datetime.utcnow()
+    # The admin UI opens the debug modal from this result
+    return (await _test_providers([request.provider], session, capture_debug=True))[0]
+
+@router.post("/tokens/test-all", response_model=list[TestTokenResponse])
+async def test_all_tokens(session: Session = Depends(get_session)):
+    """
+    Test every AI provider's token at once.
     
-    if request.provider == "openai":
-        # Resolve OpenAI key (DB or Env)
-        openai_key = settings.openai_api_key if settings and settings.openai_api_key else os.getenv("OPENAI_API_KEY")
+    The provider calls run concurrently, so this takes as long as the
+    slowest provider rather than the sum of all of them.
+    """
+    return await _test_providers(list(MISSING_KEY_MESSAGES), session)
 
-        # Check if key exists
-        if not openai_key:
-            result = TokenHealthResult(
-                status="error",
-                message="OpenAI API key not configured"
-            )
-        else:
-            # Test the key
-            logger.info("Testing OpenAI API key...")
-            result = await test_openai_key(
-                api_key=openai_key,
-                model=settings.default_model
-            )
-        
-        # Update settings (only if fields exist)
-        if hasattr(settings, 'openai_key_status'):
-            settings.openai_key_status = result.status
-        if hasattr(settings, 'openai_key_last_checked_at'):
-            settings.openai_key_last_checked_at = now
-        if hasattr(settings, 'openai_key_last_error'):
-            settings.openai_key_last_error = result.message if result.status != "ok" else None
-        
-        session.add(settings)
-        session.commit()
-        
-        return TestTokenResponse(
-            provider="openai",
-            status=result.status,
-            message=result.message,
-            last_checked_at=now.isoformat(),
-            debug_info=result.debug_info
-        )
+async def _test_providers(
+    providers: list[str],
+    session: Session,
+    capture_debug: bool = False,
+) -> list[TestTokenResponse]:
+    """Test the given providers concurrently and record the results."""
+    settings = _get_or_create_settings(session)
+    now = datetime.utcnow()
     
-    elif request.provider == "yandex_speechkit":
-        # Yandex keys are from env, not DB (for now)
-        yandex_key = os.getenv("YANDEX_API_KEY")
-        
-        if not yandex_key:
-            result = TokenHealthResult(
+    keys = {}
+    results: dict[str, TokenHealthResult] = {}
+    for provider in providers:
+        key = _resolve_key(provider, settings)
+        if key:
+            keys[provider] = key
+        else:
+            results[provider] = TokenHealthResult(
                 status="error",
-                message="Yandex API key not configured (check YANDEX_API_KEY env var)"
+                message=MISSING_KEY_MESSAGES[provider]
             )
-        else:
-            logger.info("Testing Yandex SpeechKit API key...")
-            result = await test_yandex_speechkit_key(yandex_key)
-        
-        # Update settings (only if fields exist)
-        if hasattr(settings, 'yandex_key_status'):
-            settings.yandex_key_status = result.status
-        if hasattr(settings, 'yandex_key_last_checked_at'):
-            settings.yandex_key_last_checked_at = now
-        if hasattr(settings, 'yandex_key_last_error'):
-            settings.yandex_key_last_error = result.message if result.status != "ok" else None
-        
-        session.add(settings)
-        session.commit()
-        
-        return TestTokenResponse(
-            provider="yandex_speechkit",
-            status=result.status,
-            message=result.message,
-            last_checked_at=now.isoformat(),
-            debug_info=result.debug_info
-        )
     
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unknown provider: {request.provider}"
+    if keys:
+        logger.info(f"Testing API keys: {', '.join(keys)}")
+        results.update(await check_all_tokens(
+            keys, model=settings.default_model, capture_debug=capture_debug
+        ))
+    
+    for provider in providers:
+        _record_result(settings, provider, results[provider], now)
+    session.add(settings)
+    session.commit()
+    
+    return [
+        TestTokenResponse(
+            provider=provider,
+            status=results[provider].status,
+            message=results[provider].message,
+            last_checked_at=now.isoformat(),
+            debug_info=results[provider].to_debug_dict()
         )
+        for provider in providers
+    ]
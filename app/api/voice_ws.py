@@ -998,7 +998,7 @@ async def run_realtime_session(
                             # 🆕 Save to new pipeline
                             if pipeline_manager:
                                 try:
-                                    pipeline_manager.save_turn(
+                                    await pipeline_manager.save_turn_async(
                                         user_text=transcript,
                                         tutor_text=None
                                     )
@@ -1197,7 +1197,7 @@ async def run_realtime_session(
                             # 🆕 Save to new pipeline
                             if pipeline_manager:
                                 try:
-                                    pipeline_manager.save_turn(
+                                    await pipeline_manager.save_turn_async(
                                         user_text=None,
                                         tutor_text=transcript
                                     )
@@ -1407,6 +1407,10 @@ async def run_realtime_session(
             except Exception as cleanup_error:
                 logger.error(f"Realtime: Error during converter cleanup: {cleanup_error}")
 
+            # Let background brain analyses finish before the caller closes the session
+            if pipeline_manager:
+                await pipeline_manager.aclose()
+
 
 async def run_legacy_session(
     websocket: WebSocket,
@@ -1623,7 +1627,7 @@ async def run_legacy_session(
         # 🆕 Save to new pipeline
         if pipeline_manager:
             try:
-                pipeline_manager.save_turn(user_text=text, tutor_text=None)
+                await pipeline_manager.save_turn_async(user_text=text, tutor_text=None)
             except Exception as pm_err:
                 logger.error(f"Legacy: Pipeline manager failed to save user turn: {pm_err}")
         
@@ -1677,7 +1681,7 @@ async def run_legacy_session(
             # 🆕 Save to new pipeline
             if pipeline_manager:
                 try:
-                    pipeline_manager.save_turn(user_text=None, tutor_text=full_resp)
+                    await pipeline_manager.save_turn_async(user_text=None, tutor_text=full_resp)
                 except Exception as pm_err:
                     logger.error(f"Legacy: Pipeline manager failed to save assistant turn: {pm_err}")
             
@@ -1938,8 +1942,13 @@ async def run_legacy_session(
                         is_speaking = False
                         silence_start_time = 0
 
-    await asyncio.gather(receive_task := asyncio.create_task(receive_loop()), stt_task := asyncio.create_task(stt_loop()))
-    converter.close()
+    try:
+        await asyncio.gather(receive_task := asyncio.create_task(receive_loop()), stt_task := asyncio.create_task(stt_loop()))
+    finally:
+        converter.close()
+        # Let background brain analyses finish before the caller closes the session
+        if pipeline_manager:
+            await pipeline_manager.aclose()
 
 def add_wav_header(pcm_data, sample_rate=48000, channels=1, sampwidth=2):
     header = b'RIFF' + struct.pack('<I', 36 + len(pcm_data)) + b'WAVE' + \
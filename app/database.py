@@ -1,4 +1,8 @@
+from contextlib import contextmanager
+from typing import Iterator
+
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy.pool import QueuePool
 
 import os
 from dotenv import load_dotenv
@@ -14,9 +18,32 @@ database_url = os.getenv("DATABASE_URL", sqlite_url)
 if database_url and database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 
-# PostgreSQL does not need check_same_thread
-connect_args = {"check_same_thread": False} if "sqlite" in database_url else {}
-engine = create_engine(database_url, echo=False, connect_args=connect_args)
+# Connection pool sizing (PostgreSQL only; SQLite keeps SQLAlchemy defaults).
+# Every lesson start builds a prompt on its own Session, so the pool has to
+# absorb bursts of concurrent websockets without paying a fresh connect each time.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 25))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 25))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Each websocket holds at most one connection (one Session per socket); when the
+# pool is exhausted, new requests fail after this many seconds instead of hanging.
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+
+if "sqlite" in database_url:
+    # SQLite does not need (or support) a tuned QueuePool
+    engine = create_engine(
+        database_url, echo=False, connect_args={"check_same_thread": False}
+    )
+else:
+    engine = create_engine(
+        database_url,
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -24,3 +51,18 @@ def create_db_and_tables():
 def get_session():
     with Session(engine) as session:
         yield session
+
+@contextmanager
+def no_expire_on_commit(session: Session) -> Iterator[Session]:
+    """Keep objects loaded across commits inside the block.
+
+    For add/commit helpers whose objects are fully populated in Python: the
+    primary key comes back from the INSERT, so the usual session.refresh()
+    re-SELECT after commit is not needed.
+    """
+    previous = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        yield session
+    finally:
+        session.expire_on_commit = previous
@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import create_db_and_tables
+from app.services.openai_service import close_async_openai_clients
+from app.services.http_clients import close_http_clients
+from app.services.smart_brain import USE_BRAIN_BATCH_API, brain_batch_poller
+from app.services.tutor_service import tutor_prompt_request_cache
 from app.api import admin, voice, voice_ws, tokens
 from app.api.routes import auth, progress
 import os
@@ -17,6 +21,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tutor prompts built while serving a request are reused for the rest of it
+# (HTTP only: websocket lessons outlive the data their prompt was built from)
+@app.middleware("http")
+async def tutor_prompt_request_scope(request, call_next):
+    with tutor_prompt_request_cache():
+        return await call_next(request)
+
 # Database init
 @app.on_event("startup")
 def on_startup():
@@ -24,6 +35,18 @@ def on_startup():
         
     os.makedirs("static/audio", exist_ok=True)
 
+@app.on_event("startup")
+async def start_background_workers():
+    # Nothing is submitted to the Batch API unless it is enabled
+    if USE_BRAIN_BATCH_API:
+        await brain_batch_poller.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await brain_batch_poller.stop()
+    await close_async_openai_clients()
+    await close_http_clients()
+
 # Routes
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(tokens.router, prefix="/api/admin", tags=["tokens"])
@@ -1,5 +1,6 @@
 from typing import Optional, List, Dict
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from pydantic import EmailStr
 from datetime import datetime
 import json
@@ -160,6 +161,8 @@ class UserAccount(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     role: str = Field(default="student")
+    # Own shareable referral code (random, generated on first request)
+    referral_code: Optional[str] = Field(default=None, index=True, unique=True, nullable=True)
 
 class TutorSystemRule(SQLModel, table=True):
     __tablename__ = "tutor_system_rules"
@@ -191,6 +194,7 @@ class AuthSession(SQLModel, table=True):
 
 from decimal import Decimal
 from sqlalchemy import Column, Numeric, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
 class BillingPackage(SQLModel, table=True):
     __tablename__ = "billing_packages"
@@ -246,8 +250,26 @@ class Referral(SQLModel, table=True):
 
 # --- AI Admin Assistant Models ---
 
+# Student preferences detected from speech (SessionRuleManager): at most one
+# active rule per student and type, enforced by a partial unique index so
+# they can be written with a single upsert.
+ACTIVE_STUDENT_PREFERENCE_WHERE = (
+    "is_active AND scope = 'student' "
+    "AND type IN ('language', 'speech_pace', 'correction_style')"
+)
+
 class TutorRule(SQLModel, table=True):
     __tablename__ = "tutor_rules"
+    __table_args__ = (
+        Index(
+            "uq_tutor_rules_active_student_preference",
+            "applies_to_student_id",
+            "type",
+            unique=True,
+            postgresql_where=text(ACTIVE_STUDENT_PREFERENCE_WHERE),
+            sqlite_where=text(ACTIVE_STUDENT_PREFERENCE_WHERE),
+        ),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     scope: str = Field(index=True)  # "global" | "app" | "student" | "session"
     type: str  # "greeting" | "toxicity_warning" | "difficulty_adjustment" | "language_mode" | "other"
@@ -325,6 +347,10 @@ class TutorLesson(SQLModel, table=True):
     in tutor_student_knowledge.
     """
     __tablename__ = "tutor_lessons"
+    # Mirrors the Supabase migration; lets max(lesson_number) per user use the index
+    __table_args__ = (
+        Index("idx_tutor_lessons_lesson_number", "user_id", "lesson_number"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user_accounts.id", index=True)
     lesson_number: int  # 1, 2, 3...
@@ -399,6 +425,26 @@ class TutorBrainEvent(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class TutorBrainBatch(SQLModel, table=True):
+    """Background brain analyses submitted to the OpenAI Batch API.
+    
+    Turns that don't need live feedback are analyzed through /v1/batches
+    (half the price, results within 24h). Each row tracks one submitted batch
+    until its results have been saved as brain events.
+    
+    Statuses: submitted, completed, failed, expired, cancelled
+    """
+    __tablename__ = "tutor_brain_batches"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    openai_batch_id: str = Field(index=True, unique=True)
+    status: str = Field(default="submitted", index=True)
+    
+    # Turn ids in the batch; each request's custom_id is its turn id
+    turn_ids_json: list = Field(default_factory=list, sa_column=Column(JSON))
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
 class TutorStudentKnowledge(SQLModel, table=True):
     """Current snapshot of student knowledge (vocabulary, grammar, topics).
     
@@ -418,16 +464,17 @@ class TutorStudentKnowledge(SQLModel, table=True):
     
     # Vocabulary tracking
     # Structure: {"weak": [...], "strong": [...], "neutral": [...]}
+    # JSONB on PostgreSQL so the brain can patch it in place (jsonb_set)
     vocabulary_json: dict = Field(
         default_factory=lambda: {"weak": [], "strong": [], "neutral": []},
-        sa_column=Column(JSON)
+        sa_column=Column(JSON().with_variant(JSONB(), "postgresql"))
     )
     
     # Grammar tracking
     # Structure: {"patterns": {...}, "mistakes": {...}}
     grammar_json: dict = Field(
         default_factory=lambda: {"patterns": {}, "mistakes": {}},
-        sa_column=Column(JSON)
+        sa_column=Column(JSON().with_variant(JSONB(), "postgresql"))
     )
     
     # Topics tracking
@@ -7,6 +7,7 @@ from app.models import (
     AppSettings, TutorRule, TutorRuleVersion, 
     AdminAIConversation, AdminAIMessage, UserAccount
 )
+from app.services.speech_preferences import forget_slow_speech_rule
 
 SYSTEM_PROMPT = """You are an AI assistant for the AIlingva admin panel. Your role is to help the admin manage tutor behavior rules and query analytics.
 
@@ -162,6 +163,7 @@ def update_rule_tool(session: Session, rule_id: int, updates: dict):
     
     # Track what changed
     changes = []
+    old_type = rule.type
     for key, value in updates.items():
         if hasattr(rule, key):
             old_value = getattr(rule, key)
@@ -177,6 +179,9 @@ def update_rule_tool(session: Session, rule_id: int, updates: dict):
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    if "speech_pace" in (old_type, rule.type):
+        # The student may have changed too; marks are cheap to rebuild
+        forget_slow_speech_rule()
     
     # Create audit version
     version = TutorRuleVersion(
@@ -212,6 +217,8 @@ def deactivate_rule_tool(session: Session, rule_id: int):
     rule.updated_at = datetime.utcnow()
     session.add(rule)
     session.commit()
+    if rule.type == "speech_pace":
+        forget_slow_speech_rule(rule.applies_to_student_id)
     
     # Create audit version
     version = TutorRuleVersion(
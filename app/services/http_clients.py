@@ -0,0 +1,59 @@
+"""
+Shared outbound HTTP clients.
+
+Provider health checks reuse one pooled httpx.AsyncClient per event loop, so
+repeated checks keep their TCP+TLS connections alive instead of paying a new
+handshake each time. Keyed by loop because httpx connections cannot be shared
+across event loops.
+"""
+import asyncio
+from typing import Dict
+
+import httpx
+
+HEALTH_CLIENT_TIMEOUT_SECONDS = 5.0
+HEALTH_CLIENT_CONNECT_TIMEOUT_SECONDS = 2.0
+HEALTH_CLIENT_MAX_CONNECTIONS = 100
+HEALTH_CLIENT_MAX_KEEPALIVE = 20
+
+# HTTP/2 needs the optional h2 package; plain keep-alive HTTP/1.1 otherwise
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_HEALTH_CLIENTS: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_health_client() -> httpx.AsyncClient:
+    """Return the shared health-check client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _HEALTH_CLIENTS.get(loop)
+    if client is not None and not client.is_closed:
+        return client
+
+    # Forget clients whose loop has closed; their connections are gone anyway
+    for stale in [l for l in _HEALTH_CLIENTS if l.is_closed()]:
+        del _HEALTH_CLIENTS[stale]
+
+    client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=HEALTH_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=HEALTH_CLIENT_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(
+            HEALTH_CLIENT_TIMEOUT_SECONDS,
+            connect=HEALTH_CLIENT_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+    _HEALTH_CLIENTS[loop] = client
+    return client
+
+
+async def close_http_clients():
+    """Close the shared clients that belong to the running event loop (app shutdown)."""
+    client = _HEALTH_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -5,11 +5,14 @@ This module bridges the existing voice_ws.py with the new tutor lesson tracking
 and brain analysis pipeline.
 """
 
+import asyncio
 import logging
-from typing import Optional, List
+from typing import Optional, List, Set
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 
+from app.database import engine
 from app.models import (
     UserAccount,
     LessonSession,
@@ -23,7 +26,9 @@ from app.services.tutor_service import (
     get_or_create_student_knowledge
 )
 from app.services.brain_service import BrainService
-from app.services.smart_brain import SmartBrainService, AsyncBrainWorker
+from app.services.smart_brain import (
+    SmartBrainService, AsyncBrainWorker, SYNC_ANALYSIS_TIMEOUT_SECONDS
+)
 from app.services.knowledge_sync import sync_all_for_user
 
 logger = logging.getLogger(__name__)
@@ -31,6 +36,22 @@ logger = logging.getLogger(__name__)
 # Feature flag: use smart brain (LLM-powered) vs legacy (string matching)
 USE_SMART_BRAIN = True
 
+# How long a closing socket waits for its background brain analyses
+ANALYSIS_DRAIN_TIMEOUT_SECONDS = 15
+
+
+def _detached_turn(turn: TutorLessonTurn) -> TutorLessonTurn:
+    """Unattached copy of the fields brain analysis reads from a turn."""
+    return TutorLessonTurn(
+        id=turn.id,
+        lesson_id=turn.lesson_id,
+        user_id=turn.user_id,
+        turn_index=turn.turn_index,
+        pipeline_type=turn.pipeline_type,
+        user_text=turn.user_text,
+        tutor_text=turn.tutor_text,
+    )
+
 
 class LessonPipelineManager:
     """Manages lesson lifecycle and coordinates STREAMING + ANALYSIS pipelines."""
@@ -55,6 +76,9 @@ class LessonPipelineManager:
         # Pending turns for batched analysis
         self.pending_turns: List[TutorLessonTurn] = []
         self.last_analysis_time = datetime.utcnow()
+        # Background analyses started by save_turn_async (strong refs so the
+        # event loop doesn't garbage-collect them mid-flight)
+        self._analysis_tasks: Set[asyncio.Task] = set()
     
     def start_lesson(self, legacy_session_id: int) -> TutorLesson:
         """
@@ -101,6 +125,9 @@ class LessonPipelineManager:
         """
         Save a conversation turn and trigger brain analysis.
 
+        For synchronous callers; code running on an event loop should await
+        save_turn_async instead.
+
         Args:
             user_text: What the user said (can be None for tutor-only turns, e.g., greeting)
             tutor_text: What the tutor said (can be None for user-only turns)
@@ -110,6 +137,72 @@ class LessonPipelineManager:
         Returns:
             TutorLessonTurn instance or None if lesson not started
         """
+        turn = self._store_turn(user_text, tutor_text, raw_payload)
+        if turn and self._queue_for_analysis(turn):
+            try:
+                self._run_batched_analysis(context)
+            except Exception as e:
+                logger.error(f"Smart brain analysis failed: {e}", exc_info=True)
+        return turn
+
+    async def save_turn_async(
+        self,
+        user_text: Optional[str],
+        tutor_text: Optional[str],
+        raw_payload: Optional[dict] = None,
+        context: Optional[dict] = None,
+    ) -> Optional[TutorLessonTurn]:
+        """
+        Save a conversation turn and trigger brain analysis in the background.
+
+        The turn is stored inline; a due batch is analyzed in a separate task
+        so the caller (the realtime socket loop) never waits on the LLM.
+
+        Same arguments and return value as save_turn.
+        """
+        turn = self._store_turn(user_text, tutor_text, raw_payload)
+        if turn and self._queue_for_analysis(turn):
+            self._start_background_analysis(context)
+        return turn
+
+    async def aclose(self, timeout: float = ANALYSIS_DRAIN_TIMEOUT_SECONDS):
+        """
+        Analyze the turns still pending and wait for background analyses.
+
+        Voice handlers await this before closing their Session; analyses
+        still running after `timeout` seconds are cancelled.
+        """
+        if self.pending_turns and self.smart_brain:
+            self._start_background_analysis()
+        if not self._analysis_tasks:
+            return
+
+        done, pending = await asyncio.wait(set(self._analysis_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                f"Cancelled {len(pending)} brain analyses still running after {timeout}s"
+            )
+
+    def _start_background_analysis(self, context: Optional[dict] = None):
+        """Hand the pending turns to a background analysis task."""
+        # Plain copies: the task must not touch the socket's Session or its objects
+        turns = [_detached_turn(turn) for turn in self.pending_turns]
+        self._finish_batch()
+        task = asyncio.create_task(
+            self._run_batched_analysis_async(turns, self.user.id, context)
+        )
+        self._analysis_tasks.add(task)
+        task.add_done_callback(self._analysis_tasks.discard)
+
+    def _store_turn(
+        self,
+        user_text: Optional[str],
+        tutor_text: Optional[str],
+        raw_payload: Optional[dict] = None,
+    ) -> Optional[TutorLessonTurn]:
+        """Persist a turn; None if the lesson has not started or the turn is empty."""
         if not self.tutor_lesson:
             logger.warning("Attempted to save turn but lesson not started")
             return None
@@ -136,21 +229,25 @@ class LessonPipelineManager:
 
         logger.info(
             f"Saved turn {turn.turn_index} for lesson {self.tutor_lesson.id}: "
-            f"user={bool(user_text)}, tutor={bool(tutor_text)}"
+            f"user={bool(turn.user_text)}, tutor={bool(turn.tutor_text)}"
         )
+        return turn
 
+    def _queue_for_analysis(self, turn: TutorLessonTurn) -> bool:
+        """
+        Hand a saved turn to the brain.
+
+        Smart brain turns are batched; returns True when the batch is due.
+        The legacy brain analyzes the turn right away.
+        """
         # 🆕 Smart Brain Analysis (batched for efficiency)
-        if self.smart_brain and user_text:
+        if self.smart_brain and turn.user_text:
             # Add to pending turns for batched analysis
             self.pending_turns.append(turn)
 
             # Analyze every 3 turns or if 30 seconds have passed
             time_since_last = (datetime.utcnow() - self.last_analysis_time).total_seconds()
-            if len(self.pending_turns) >= 3 or time_since_last > 30:
-                try:
-                    self._run_batched_analysis(context)
-                except Exception as e:
-                    logger.error(f"Smart brain analysis failed: {e}", exc_info=True)
+            return len(self.pending_turns) >= 3 or time_since_last > 30
 
         # Legacy brain analysis (if smart brain not available)
         elif self.brain_service:
@@ -163,7 +260,7 @@ class LessonPipelineManager:
             except Exception as e:
                 logger.error(f"Legacy brain analysis failed: {e}", exc_info=True)
 
-        return turn
+        return False
 
     def _run_batched_analysis(self, context: Optional[dict] = None):
         """Run smart brain analysis on pending turns."""
@@ -175,14 +272,66 @@ class LessonPipelineManager:
         for turn in self.pending_turns:
             try:
                 result = self.smart_brain.analyze_turn_sync(turn, self.user, context)
-                events = self.smart_brain.save_analysis_to_db(result, turn, self.user.id)
-                if events:
-                    logger.info(
-                        f"Smart brain generated {len(events)} events for turn {turn.turn_index}"
-                    )
+                self._save_analysis(result, turn)
             except Exception as e:
                 logger.error(f"Smart brain failed on turn {turn.turn_index}: {e}")
 
+        self._finish_batch()
+
+    async def _run_batched_analysis_async(
+        self,
+        turns: List[TutorLessonTurn],
+        user_id: int,
+        context: Optional[dict] = None,
+    ):
+        """
+        Run smart brain analysis on a detached batch of turns, each capped in time.
+
+        Uses its own Session: the socket's one is busy with the live lesson
+        and may be closed before the analysis finishes.
+        """
+        if not turns or not self.smart_brain:
+            return
+
+        logger.info(f"Running smart brain analysis on {len(turns)} pending turns")
+
+        with Session(engine) as session:
+            brain = SmartBrainService(session, self.api_key)
+            user = await run_in_threadpool(session.get, UserAccount, user_id)
+            if user is None:
+                return
+
+            for turn in turns:
+                try:
+                    result = await asyncio.wait_for(
+                        brain.analyze_turn_async(turn, user, context),
+                        SYNC_ANALYSIS_TIMEOUT_SECONDS,
+                    )
+                    # Blocking DB writes go to the threadpool, off the event loop
+                    events = await run_in_threadpool(
+                        brain.save_analysis_to_db, result, turn, user_id
+                    )
+                    if events:
+                        logger.info(
+                            f"Smart brain generated {len(events)} events for turn {turn.turn_index}"
+                        )
+                except asyncio.TimeoutError:
+                    logger.error(
+                        f"Smart brain timed out on turn {turn.turn_index} "
+                        f"after {SYNC_ANALYSIS_TIMEOUT_SECONDS}s"
+                    )
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Smart brain failed on turn {turn.turn_index}: {e}")
+
+    def _save_analysis(self, result, turn: TutorLessonTurn):
+        events = self.smart_brain.save_analysis_to_db(result, turn, self.user.id)
+        if events:
+            logger.info(
+                f"Smart brain generated {len(events)} events for turn {turn.turn_index}"
+            )
+
+    def _finish_batch(self):
         # Clear pending and update timestamp
         self.pending_turns = []
         self.last_analysis_time = datetime.utcnow()
@@ -1,9 +1,69 @@
 import os
-from openai import OpenAI
+import asyncio
+from collections import OrderedDict
+from typing import Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from app.models import UserProfile, AppSettings, SessionMessage, UserState
 from sqlmodel import Session, select
 import json
 
+# Shared async clients: one AsyncOpenAI (and so one httpx connection pool) per
+# event loop and API key, so repeated calls reuse keep-alive connections instead
+# of paying a new TCP+TLS handshake each time. Keyed by loop because httpx
+# connections cannot be shared across event loops.
+ASYNC_CLIENT_MAX_KEYS = 8
+ASYNC_CLIENT_TIMEOUT_SECONDS = 30.0
+ASYNC_CLIENT_CONNECT_TIMEOUT_SECONDS = 5.0
+ASYNC_CLIENT_MAX_CONNECTIONS = 64
+ASYNC_CLIENT_MAX_KEEPALIVE = 32
+
+# (loop, api_key) -> client, least recently used first
+_ASYNC_CLIENTS: "OrderedDict[Tuple[asyncio.AbstractEventLoop, str], AsyncOpenAI]" = OrderedDict()
+
+
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client for api_key on the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (loop, api_key)
+    client = _ASYNC_CLIENTS.get(key)
+    if client is not None:
+        _ASYNC_CLIENTS.move_to_end(key)
+        return client
+
+    # Forget clients whose loop has closed; their connections are gone anyway
+    for stale in [k for k in _ASYNC_CLIENTS if k[0].is_closed()]:
+        del _ASYNC_CLIENTS[stale]
+
+    # Bound the number of keys. The evicted client is only dropped from the
+    # pool, never closed: callers may still have requests in flight on it, and
+    # its connections are released once the last of them lets go of it.
+    while len(_ASYNC_CLIENTS) >= ASYNC_CLIENT_MAX_KEYS:
+        _ASYNC_CLIENTS.popitem(last=False)
+
+    client = AsyncOpenAI(
+        api_key=api_key,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_CLIENT_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(
+                ASYNC_CLIENT_TIMEOUT_SECONDS,
+                connect=ASYNC_CLIENT_CONNECT_TIMEOUT_SECONDS,
+            ),
+        ),
+    )
+    _ASYNC_CLIENTS[key] = client
+    return client
+
+
+async def close_async_openai_clients():
+    """Close the shared clients that belong to the running event loop (app shutdown)."""
+    loop = asyncio.get_running_loop()
+    for key in [k for k in _ASYNC_CLIENTS if k[0] is loop]:
+        await _ASYNC_CLIENTS.pop(key).close()
+
 SYSTEM_TUTOR_PROMPT = """You are a personal English tutor for a Russian-speaking student.
 
 Context about the student:
@@ -9,10 +9,14 @@ This module builds focused, concise system prompts that are:
 Philosophy: Less is more. A 100-line focused prompt beats a 700-line essay.
 """
 
+import io
 import json
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+from sqlalchemy import and_, case, exists, func, or_
+from sqlalchemy.engine import Row
 from sqlmodel import Session, select
 
 logger = logging.getLogger(__name__)
@@ -84,6 +88,14 @@ Keep it CONVERSATIONAL, not like a form. Be friendly!
 """
 
 
+# Fixed head of the intro prompt, assembled once at import
+INTRO_PROMPT_SKELETON = "\n".join([
+    CORE_IDENTITY,
+    FIRST_LESSON_INTRO,
+    get_language_enforcement_prompt(None),  # No mode set yet
+])
+
+
 # ============================================================
 # REGULAR LESSON GREETING
 # ============================================================
@@ -108,6 +120,19 @@ Example BAD greeting (NEVER DO THIS):
 """
 
 
+# ============================================================
+# FINAL REMINDER (closes every regular prompt)
+# ============================================================
+
+FINAL_REMINDER = """
+🎯 REMEMBER:
+- Keep responses SHORT (1-3 sentences)
+- WAIT for student after each response
+- Start activities immediately
+- ONLY English and Russian
+"""
+
+
 # ============================================================
 # LEVEL-SPECIFIC INSTRUCTIONS
 # ============================================================
@@ -153,6 +178,72 @@ LEVEL: ADVANCED (C1)
 }
 
 
+# ============================================================
+# PROMPT SIZE LIMITS
+# ============================================================
+
+MAX_WEAK_WORDS = 10  # Weak words listed in the prompt
+MAX_DYNAMIC_RULES = 5  # Active rules listed in the prompt
+
+
+# ============================================================
+# PERSONALIZATION (intro preference -> prompt line)
+# ============================================================
+
+ADDRESSING_INSTRUCTIONS = {
+    "ty": "Address student with 'ты' (informal)",
+    "vy": "Address student with 'вы' (formal)",
+}
+
+CORRECTION_STYLE_INSTRUCTIONS = {
+    "often": "Student wants frequent corrections",
+    "soft": "Correct softly, prioritize fluency",
+    "on_request": "Only correct when asked",
+}
+
+
+# ============================================================
+# BUILT PROMPT CACHE
+# ============================================================
+
+# Reconnects within a few seconds rebuild the same prompt; keep finished
+# prompts briefly, keyed by (user, lesson, resume, profile fields) and
+# validated against a one-query data-version probe (see _get_data_version).
+PROMPT_CACHE_TTL_SECONDS = 30
+PROMPT_CACHE_MAX_ENTRIES = 1024
+
+# key -> (stored_at monotonic, data_version, prompt)
+_PROMPT_CACHE: Dict[Tuple, Tuple[float, Tuple, str]] = {}
+
+
+def invalidate_prompt_cache(user_account_id: Optional[int] = None) -> None:
+    """Drop cached prompts for one user (or everyone if no id is given)."""
+    if user_account_id is None:
+        _PROMPT_CACHE.clear()
+        return
+    for key in [k for k in _PROMPT_CACHE if k[0] == user_account_id]:
+        _PROMPT_CACHE.pop(key, None)
+
+
+def _prune_prompt_cache(now: float) -> None:
+    """Evict expired entries once the cache grows past its bound."""
+    if len(_PROMPT_CACHE) < PROMPT_CACHE_MAX_ENTRIES:
+        return
+    for key, (stored_at, _, _) in list(_PROMPT_CACHE.items()):
+        if now - stored_at > PROMPT_CACHE_TTL_SECONDS:
+            _PROMPT_CACHE.pop(key, None)
+    if len(_PROMPT_CACHE) >= PROMPT_CACHE_MAX_ENTRIES:
+        _PROMPT_CACHE.clear()
+
+
+def _write_joined(buf: io.StringIO, items: List[str], sep: str) -> None:
+    """Write items separated by sep, without building the joined string first."""
+    for i, item in enumerate(items):
+        if i:
+            buf.write(sep)
+        buf.write(item)
+
+
 # ============================================================
 # PROMPT BUILDER CLASS
 # ============================================================
@@ -178,16 +269,26 @@ class PromptBuilder:
         self.lesson_session_id = lesson_session_id
         self.is_resume = is_resume
 
-        # Loaded data
-        self.knowledge: Optional[TutorStudentKnowledge] = None
+        # Loaded data (column-only rows, not full ORM entities)
+        self.knowledge: Optional[Row] = None
         self.language_mode: Optional[str] = None
         self.last_summary: Optional[str] = None
-        self.dynamic_rules: List[TutorRule] = []
+        self.dynamic_rules: List[Row] = []
         self.weak_words: List[str] = []
         self.is_first_lesson: bool = False
 
+        # Derived values, resolved once per build() (see _get_* helpers)
+        self._level: Optional[str] = None
+        self._student_name: Optional[str] = None
+        self._prefs: Optional[dict] = None
+
     def _load_data(self):
         """Load all necessary data from database."""
+        # Reset derived values so they are recomputed from fresh data
+        self._level = None
+        self._student_name = None
+        self._prefs = None
+
         if not self.profile:
             return
 
@@ -198,8 +299,25 @@ class PromptBuilder:
             logger.warning("Profile has no user_account_id, skipping data load")
             return
 
-        # Load student knowledge
-        self.knowledge = self.db.get(TutorStudentKnowledge, user_id)
+        # One cheap probe tells us which per-user tables have rows at all,
+        # so brand-new students skip the queries that would return nothing
+        has_knowledge, has_state, has_summary = self.db.exec(
+            select(
+                exists().where(TutorStudentKnowledge.user_id == user_id),
+                exists().where(UserState.user_account_id == user_id),
+                exists().where(SessionSummary.user_account_id == user_id),
+            )
+        ).one()
+
+        # Load student knowledge (only the columns the prompt reads)
+        if has_knowledge:
+            self.knowledge = self.db.exec(
+                select(
+                    TutorStudentKnowledge.level,
+                    TutorStudentKnowledge.first_lesson_completed,
+                    TutorStudentKnowledge.vocabulary_json,
+                ).where(TutorStudentKnowledge.user_id == user_id)
+            ).first()
 
         # Check if first lesson
         if self.knowledge:
@@ -209,91 +327,162 @@ class PromptBuilder:
 
         # Load language mode from lesson session
         if self.lesson_session_id:
-            lesson = self.db.get(LessonSession, self.lesson_session_id)
-            if lesson:
-                self.language_mode = lesson.language_mode
+            self.language_mode = self.db.exec(
+                select(LessonSession.language_mode)
+                .where(LessonSession.id == self.lesson_session_id)
+            ).first()
 
         # Load last summary
-        last_summary = self.db.exec(
-            select(SessionSummary)
-            .where(SessionSummary.user_account_id == user_id)
-            .order_by(SessionSummary.created_at.desc())
-            .limit(1)
-        ).first()
-        if last_summary:
-            self.last_summary = last_summary.summary_text
+        if has_summary:
+            self.last_summary = self.db.exec(
+                select(SessionSummary.summary_text)
+                .where(SessionSummary.user_account_id == user_id)
+                .order_by(SessionSummary.created_at.desc())
+                .limit(1)
+            ).first()
 
         # Load weak words from UserState
-        user_state = self.db.exec(
-            select(UserState).where(UserState.user_account_id == user_id)
-        ).first()
-        if user_state:
-            self.weak_words = user_state.weak_words or []
-
-        # Load weak words from TutorStudentKnowledge too
+        if has_state:
+            weak_words_json = self.db.exec(
+                select(UserState.weak_words_json).where(UserState.user_account_id == user_id)
+            ).first()
+            if weak_words_json:
+                self.weak_words = (json.loads(weak_words_json) or [])[:MAX_WEAK_WORDS]
+
+        # Load weak words from TutorStudentKnowledge too (deduped, capped)
         if self.knowledge and self.knowledge.vocabulary_json:
+            seen = set(self.weak_words)
             weak = self.knowledge.vocabulary_json.get("weak", [])
             for w in weak:
-                if isinstance(w, dict):
-                    word = w.get("word", "")
-                    if word and word not in self.weak_words:
-                        self.weak_words.append(word)
-                elif isinstance(w, str) and w not in self.weak_words:
-                    self.weak_words.append(w)
-
-        # Load dynamic rules (active, global + student-specific)
-        rules_query = select(TutorRule).where(TutorRule.is_active == True)
-
-        global_rules = self.db.exec(
-            rules_query.where(TutorRule.scope == "global")
-            .order_by(TutorRule.priority)
-            .limit(10)  # Limit to prevent prompt bloat
-        ).all()
-
-        student_rules = self.db.exec(
-            rules_query
-            .where(TutorRule.scope == "student")
-            .where(TutorRule.applies_to_student_id == user_id)
-            .order_by(TutorRule.priority)
-            .limit(5)
+                if len(self.weak_words) >= MAX_WEAK_WORDS:
+                    break
+                word = w.get("word", "") if isinstance(w, dict) else w
+                if word and isinstance(word, str) and word not in seen:
+                    seen.add(word)
+                    self.weak_words.append(word)
+
+        # Load dynamic rules (active, global first, then student-specific),
+        # ordered and limited in SQL to exactly what the prompt emits
+        self.dynamic_rules = self.db.exec(
+            select(
+                TutorRule.type,
+                TutorRule.description,
+                TutorRule.priority,
+                TutorRule.scope,
+            )
+            .where(TutorRule.is_active == True)
+            .where(
+                or_(
+                    TutorRule.scope == "global",
+                    and_(
+                        TutorRule.scope == "student",
+                        TutorRule.applies_to_student_id == user_id,
+                    ),
+                )
+            )
+            .order_by(case((TutorRule.scope == "global", 0), else_=1), TutorRule.priority)
+            .limit(MAX_DYNAMIC_RULES)
         ).all()
 
-        self.dynamic_rules = list(global_rules) + list(student_rules)
-
     def _get_student_name(self) -> str:
         """Get student's display name."""
-        if self.profile and self.profile.name:
-            return self.profile.name
-        return "Student"
+        if self._student_name is None:
+            if self.profile and self.profile.name:
+                self._student_name = self.profile.name
+            else:
+                self._student_name = "Student"
+        return self._student_name
 
     def _get_level(self) -> str:
         """Get student's English level."""
-        # Prefer knowledge level, fallback to profile
-        if self.knowledge and self.knowledge.level:
-            return self.knowledge.level
-        if self.profile and self.profile.english_level:
-            return self.profile.english_level
-        return "A1"
+        if self._level is None:
+            # Prefer knowledge level, fallback to profile
+            if self.knowledge and self.knowledge.level:
+                self._level = self.knowledge.level
+            elif self.profile and self.profile.english_level:
+                self._level = self.profile.english_level
+            else:
+                self._level = "A1"
+        return self._level
 
     def _get_preferences(self) -> dict:
         """Parse profile preferences."""
-        if not self.profile:
-            return {}
-        try:
-            return json.loads(self.profile.preferences or "{}")
-        except:
-            return {}
+        if self._prefs is None:
+            if not self.profile:
+                self._prefs = {}
+            else:
+                try:
+                    self._prefs = json.loads(self.profile.preferences or "{}")
+                except:
+                    self._prefs = {}
+        return self._prefs
+
+    def _get_cache_key(self) -> Optional[Tuple]:
+        """Key for the built-prompt cache, or None if this build is uncacheable."""
+        if not self.profile or not self.profile.user_account_id:
+            return None
+        return (
+            self.profile.user_account_id,
+            self.lesson_session_id,
+            self.is_resume,
+            self.profile.name,
+            self.profile.english_level,
+            self.profile.preferences,
+        )
+
+    def _get_data_version(self, user_id: int) -> Tuple:
+        """Fingerprint of every table the prompt reads, in one round trip."""
+        knowledge_version = (
+            select(func.max(TutorStudentKnowledge.updated_at))
+            .where(TutorStudentKnowledge.user_id == user_id)
+            .scalar_subquery()
+        )
+        rules_filter = or_(
+            TutorRule.scope == "global",
+            TutorRule.applies_to_student_id == user_id,
+        )
+        rules_version = (
+            select(func.max(TutorRule.updated_at)).where(rules_filter).scalar_subquery()
+        )
+        # Count catches deleted rules, which leave no updated_at behind
+        rules_count = (
+            select(func.count(TutorRule.id)).where(rules_filter).scalar_subquery()
+        )
+        summary_version = (
+            select(func.max(SessionSummary.id))
+            .where(SessionSummary.user_account_id == user_id)
+            .scalar_subquery()
+        )
+        # UserState has no updated_at; its weak-word JSON is small enough to compare
+        weak_words_version = (
+            select(UserState.weak_words_json)
+            .where(UserState.user_account_id == user_id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        language_mode = (
+            select(LessonSession.language_mode)
+            .where(LessonSession.id == self.lesson_session_id)
+            .scalar_subquery()
+        )
+        row = self.db.exec(
+            select(
+                knowledge_version,
+                rules_version,
+                rules_count,
+                summary_version,
+                weak_words_version,
+                language_mode,
+            )
+        ).first()
+        return tuple(row) if row else ()
 
     def _build_intro_prompt(self) -> str:
         """Build prompt for first-time onboarding."""
-        parts = [
-            CORE_IDENTITY,
-            FIRST_LESSON_INTRO,
-            get_language_enforcement_prompt(None),  # No mode set yet
-        ]
-
         if self.profile and self.profile.name:
-            parts.append(f"\nCurrent placeholder name: {self.profile.name}")
+            prompt = f"{INTRO_PROMPT_SKELETON}\n\nCurrent placeholder name: {self.profile.name}"
+        else:
+            prompt = INTRO_PROMPT_SKELETON
 
         prefs = self._get_preferences()
         intro = prefs.get("intro", {})
@@ -317,33 +506,44 @@ class PromptBuilder:
         if intro.get("other_languages"):
             known_items.append(f"other_languages: {', '.join(intro.get('other_languages', []))}")
 
-        if known_items:
-            parts.append("\nKNOWN INTRO INFO (do NOT ask again unless missing):")
-            parts.extend(f"- {item}" for item in known_items)
+        if not known_items:
+            return prompt
 
-        return "\n".join(parts)
+        # Emit the known-info lines straight into the buffer
+        buf = io.StringIO()
+        buf.write(prompt)
+        buf.write("\n\nKNOWN INTRO INFO (do NOT ask again unless missing):")
+        for item in known_items:
+            buf.write("\n- ")
+            buf.write(item)
+        return buf.getvalue()
 
     def _build_regular_prompt(self) -> str:
-        """Build prompt for regular lessons."""
-        parts = []
+        """Build prompt for regular lessons.
+
+        Sections are written straight into one buffer (separated by a
+        newline) instead of collecting parts and joining them at the end.
+        """
+        buf = io.StringIO()
+        write = buf.write
 
         # 1. Core identity
-        parts.append(CORE_IDENTITY)
+        write(CORE_IDENTITY)
+        write("\n")
 
         # 2. Language enforcement (CRITICAL)
-        parts.append(get_language_enforcement_prompt(self.language_mode))
+        write(get_language_enforcement_prompt(self.language_mode))
+        write("\n")
 
         # 3. Level-specific instructions
         level = self._get_level()
         level_key = level.upper() if level else "A1"
-        if level_key in LEVEL_INSTRUCTIONS:
-            parts.append(LEVEL_INSTRUCTIONS[level_key])
-        else:
-            parts.append(LEVEL_INSTRUCTIONS["A1"])
+        write(LEVEL_INSTRUCTIONS.get(level_key, LEVEL_INSTRUCTIONS["A1"]))
+        write("\n")
 
         # 4. Greeting protocol (only if not resuming)
+        student_name = self._get_student_name()
         if not self.is_resume:
-            student_name = self._get_student_name()
 
             # Context bridge
             if self.last_summary:
@@ -353,87 +553,101 @@ class PromptBuilder:
                 context_bridge = "This is their first regular lesson after intro"
                 last_summary_line = "No previous lesson summary"
 
-            greeting = REGULAR_GREETING_TEMPLATE.format(
+            write(REGULAR_GREETING_TEMPLATE.format(
                 student_name=student_name,
                 level=level,
                 last_summary_line=last_summary_line,
                 context_bridge=context_bridge,
-            )
-            parts.append(greeting)
+            ))
         else:
             # Resume greeting
-            parts.append(f"""
+            write(f"""
 🔄 RESUMED LESSON
 Student came back after a pause.
-- Say "Welcome back, {self._get_student_name()}!" (short)
+- Say "Welcome back, {student_name}!" (short)
 - Briefly mention what you were doing before
 - Continue immediately - don't restart from beginning
 """)
+        write("\n")
 
         # 5. Personalization from preferences
         prefs = self._get_preferences()
         intro = prefs.get("intro", {})
 
-        personalization = []
-
         tutor_name = intro.get("tutor_name")
-        if tutor_name:
-            personalization.append(f"Your name (how student calls you): {tutor_name}")
-
-        addressing_mode = intro.get("addressing_mode")
-        if addressing_mode == "ty":
-            personalization.append("Address student with 'ты' (informal)")
-        elif addressing_mode == "vy":
-            personalization.append("Address student with 'вы' (formal)")
-
-        correction_style = intro.get("correction_style")
-        if correction_style == "often":
-            personalization.append("Student wants frequent corrections")
-        elif correction_style == "soft":
-            personalization.append("Correct softly, prioritize fluency")
-        elif correction_style == "on_request":
-            personalization.append("Only correct when asked")
-
+        addressing = ADDRESSING_INSTRUCTIONS.get(intro.get("addressing_mode"))
+        correction = CORRECTION_STYLE_INSTRUCTIONS.get(intro.get("correction_style"))
         goals = intro.get("goals", [])
-        if goals:
-            personalization.append(f"Student goals: {', '.join(goals)}")
-
         topics = intro.get("topics_interest", [])
-        if topics:
-            personalization.append(f"Topics they enjoy: {', '.join(topics)}")
 
-        if personalization:
-            parts.append("\n📋 STUDENT PREFERENCES:")
-            parts.append("\n".join(f"- {p}" for p in personalization))
+        if tutor_name or addressing or correction or goals or topics:
+            write("\n📋 STUDENT PREFERENCES:\n")
+            if tutor_name:
+                write(f"- Your name (how student calls you): {tutor_name}\n")
+            if addressing:
+                write(f"- {addressing}\n")
+            if correction:
+                write(f"- {correction}\n")
+            if goals:
+                write("- Student goals: ")
+                _write_joined(buf, goals, ", ")
+                write("\n")
+            if topics:
+                write("- Topics they enjoy: ")
+                _write_joined(buf, topics, ", ")
+                write("\n")
 
         # 6. Weak words to practice
         if self.weak_words:
-            parts.append(f"\n⚠️ WEAK WORDS (practice these):\n{', '.join(self.weak_words[:10])}")
+            write("\n⚠️ WEAK WORDS (practice these):\n")
+            _write_joined(buf, self.weak_words, ", ")
+            write("\n")
 
         # 7. Dynamic rules (keep it short)
         if self.dynamic_rules:
-            parts.append("\n📌 ACTIVE RULES:")
-            for rule in self.dynamic_rules[:5]:  # Max 5 rules
-                parts.append(f"- [{rule.type}] {rule.description}")
+            write("\n📌 ACTIVE RULES:\n")
+            for rule_type, description, _, _ in self.dynamic_rules:
+                write("- [")
+                write(rule_type)
+                write("] ")
+                write(description)
+                write("\n")
 
         # 8. Final reminder
-        parts.append("""
-🎯 REMEMBER:
-- Keep responses SHORT (1-3 sentences)
-- WAIT for student after each response
-- Start activities immediately
-- ONLY English and Russian
-""")
+        write(FINAL_REMINDER)
 
-        return "\n".join(parts)
+        return buf.getvalue()
 
-    def build(self) -> str:
+    def build(self, use_cache: bool = False) -> str:
         """
         Build the complete system prompt.
 
+        Args:
+            use_cache: Reuse a prompt built for the same user/lesson within
+                PROMPT_CACHE_TTL_SECONDS if the underlying data is unchanged.
+                On a cache hit the builder's loaded fields stay empty.
+
         Returns:
             Complete system prompt string
         """
+        cache_key = self._get_cache_key() if use_cache else None
+        if cache_key is None:
+            return self._build_uncached()
+
+        version = self._get_data_version(cache_key[0])
+        now = time.monotonic()
+        cached = _PROMPT_CACHE.get(cache_key)
+        if cached and now - cached[0] <= PROMPT_CACHE_TTL_SECONDS and cached[1] == version:
+            logger.info(f"Using cached prompt for user {cache_key[0]}")
+            return cached[2]
+
+        prompt = self._build_uncached()
+        _prune_prompt_cache(now)
+        _PROMPT_CACHE[cache_key] = (now, version, prompt)
+        return prompt
+
+    def _build_uncached(self) -> str:
+        """Load data and build the prompt without consulting the cache."""
         self._load_data()
 
         # If first lesson and intro not completed, use intro prompt
@@ -479,4 +693,4 @@ def build_simple_prompt(
         lesson_session_id=lesson_session_id,
         is_resume=is_resume,
     )
-    return builder.build()
+    return builder.build(use_cache=True)
@@ -1,55 +1,64 @@
+import re
 import secrets
 from datetime import datetime
 from typing import Optional
 from sqlmodel import Session, select
-from app.models import Referral, UserAccount, WalletTransaction
+from app.models import Referral, UserAccount, UserProfile, WalletTransaction
+
+REFERRAL_CODE_BYTES = 6  # token_urlsafe(6) -> 8-character code
+# Codes handed out before they were stored were derived from the account id
+LEGACY_REFERRAL_CODE_RE = re.compile(r"USER(\d+)")
 
 class ReferralService:
     def __init__(self, session: Session):
         self.session = session
 
-    def generate_referral_code(self, user_id: int) -> str:
+    def generate_referral_code(self, user_id: int) -> Optional[str]:
         """
         Get or create a referral code for a user.
+
+        Codes are random and stored on UserAccount.referral_code (unique,
+        indexed), so signups resolve the referrer with a single indexed lookup.
         """
-        # Check if user already has a code (we might store it in UserProfile later, 
-        # but for now we can check if they are a referrer in 'referrals' table? 
-        # No, 'referrals' table stores relationships. 
-        # We need a place to store the user's OWN code.
-        # For MVP, let's just generate it deterministically or store it in UserProfile?
-        # The prompt said: "generate and store referral_code ... either in user table or separate entity".
-        # Let's assume we generate it on the fly or store it. 
-        # Actually, we didn't add a field for 'my_referral_code' in UserAccount/Profile.
-        # Let's add it to UserProfile now or just use a deterministic one (e.g. user_id based)?
-        # Deterministic is easier for MVP: "REF-{user_id}"
-        # But random is better. Let's stick to "REF-{user_id}-{random}" and store it?
-        # Wait, if we didn't add a column, we can't store it.
-        # Let's use a deterministic one for now: f"USER{user_id}"
-        pass
-        return f"USER{user_id}"
+        user = self.session.get(UserAccount, user_id)
+        if not user:
+            return None
+        if user.referral_code:
+            return user.referral_code
+
+        code = secrets.token_urlsafe(REFERRAL_CODE_BYTES)
+        while LEGACY_REFERRAL_CODE_RE.fullmatch(code) or self._find_referrer(code):
+            code = secrets.token_urlsafe(REFERRAL_CODE_BYTES)
+
+        user.referral_code = code
+        self.session.add(user)
+        self.session.commit()
+        return code
+
+    def _find_referrer(self, referral_code: str) -> Optional[UserAccount]:
+        referrer = self.session.exec(
+            select(UserAccount).where(UserAccount.referral_code == referral_code)
+        ).first()
+        if referrer:
+            return referrer
+        # Legacy USER{id} codes and links are still out there; keep honoring them
+        legacy = LEGACY_REFERRAL_CODE_RE.fullmatch(referral_code)
+        if legacy:
+            return self.session.get(UserAccount, int(legacy.group(1)))
+        return None
 
     def process_referral_signup(self, new_user_id: int, referral_code: str):
         """
         Called when a new user signs up with a code.
         """
-        # Parse code to find referrer
-        # Assuming code format "USER{id}"
-        if not referral_code.startswith("USER"):
+        referrer = self._find_referrer(referral_code)
+        if not referrer:
             return # Invalid code
-            
-        try:
-            referrer_id = int(referral_code.replace("USER", ""))
-        except ValueError:
-            return
 
+        referrer_id = referrer.id
         if referrer_id == new_user_id:
             return # Cannot refer self
 
-        # Check if referrer exists
-        referrer = self.session.get(UserAccount, referrer_id)
-        if not referrer:
-            return
-
         # Create referral record
         ref = Referral(
             referrer_user_id=referrer_id,
@@ -80,7 +89,6 @@ class ReferralService:
             source="referral",
             source_ref=str(ref.id)
         )
-        self.session.add(tx1)
 
         # Award referred
         tx2 = WalletTransaction(
@@ -91,22 +99,26 @@ class ReferralService:
             source="referral",
             source_ref=str(ref.id)
         )
-        self.session.add(tx2)
 
         ref.status = "rewarded"
         ref.rewarded_at = datetime.utcnow()
-        self.session.add(ref)
-        
-        self.session.commit()
-        
+
         # Update balances
         # (Ideally call BillingService, but we are in ReferralService)
-        # We can just let the next read update it, or manually update if we import UserProfile
-        from app.models import UserProfile
-        for uid, delta in [(ref.referrer_user_id, ref.reward_minutes_for_referrer), (ref.referred_user_id, ref.reward_minutes_for_referred)]:
-            p = self.session.exec(select(UserProfile).where(UserProfile.user_account_id == uid)).first()
-            if p:
-                p.minutes_balance += delta
-                self.session.add(p)
-        
+        # Both profiles are fetched in one IN query and saved in the same commit
+        deltas = {
+            ref.referrer_user_id: ref.reward_minutes_for_referrer,
+            ref.referred_user_id: ref.reward_minutes_for_referred,
+        }
+        profiles = self.session.exec(
+            select(UserProfile).where(UserProfile.user_account_id.in_(list(deltas)))
+        ).all()
+        by_uid = {}
+        for p in profiles:
+            by_uid.setdefault(p.user_account_id, p)
+        for uid, p in by_uid.items():
+            p.minutes_balance += deltas[uid]
+
+        # Register everything together so both wallet INSERTs go out in one flush
+        self.session.add_all([tx1, tx2, ref, *by_uid.values()])
         self.session.commit()
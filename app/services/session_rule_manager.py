@@ -15,19 +15,31 @@ The key insight: OpenAI's Realtime API maintains context, but LLMs naturally
 """
 
 import re
+import time
+import functools
 import logging
 import json
 from typing import Optional, List, Dict, Any, Tuple
+from bisect import insort
 from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 from dataclasses import dataclass, field
 
-from app.models import TutorRule, UserAccount, LessonSession
+from app.models import (
+    ACTIVE_STUDENT_PREFERENCE_WHERE,
+    LessonSession,
+    TutorRule,
+    UserAccount,
+)
+from app.services.prompt_builder import invalidate_prompt_cache
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ActiveRule:
     """A rule currently active in this session."""
     rule_id: Optional[int]
@@ -35,12 +47,21 @@ class ActiveRule:
     content: str  # Human-readable rule text for injection
     value: Optional[str] = None  # Raw value (e.g., "RU_ONLY", "slow")
     priority: int = 0
-    created_at: datetime = field(default_factory=datetime.utcnow)
+    created_at_ns: int = field(default_factory=time.monotonic_ns)  # Ordering only; DB rows get a datetime at persist time
     injected: bool = False  # Whether it's been sent to OpenAI
     reminder_count: int = 0
     is_session_only: bool = False  # True = don't persist to DB
 
 
+# Rules at or above this priority are repeated in periodic reminders
+HIGH_PRIORITY_THRESHOLD = 80
+
+
+def _descending_priority(rule: ActiveRule) -> int:
+    """Sort key that orders rules highest priority first."""
+    return -rule.priority
+
+
 # ============================================================
 # PATTERN DEFINITIONS
 # ============================================================
@@ -120,7 +141,7 @@ SLOW_SPEECH_PATTERNS: List[str] = [
 # Repeat/clarification patterns (session-only, not persisted)
 REPEAT_PATTERNS: List[str] = [
     r"повтори",
-    r"ещё\s+раз",
+    r"еще\s+раз",  # "ещё" is folded to "е" before matching
     r"что\s+ты\s+сказал",
     r"что\s+это\s+значит",
     r"не\s+расслышал",
@@ -144,6 +165,288 @@ CORRECTION_PATTERNS: List[Tuple[str, str]] = [
     (r"меньше\s+исправ", "minimal"),
 ]
 
+# Typographic variants folded away before matching, so patterns only need the
+# canonical spelling: curly apostrophes from ASR/keyboards and "ё" written as "е".
+# Non-ASCII whitespace becomes a plain space, so the ASCII-only \s of the
+# English patterns sees the same gaps Unicode \s would.
+_UNICODE_SPACES = (
+    "\x1c\x1d\x1e\x1f\x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+_FOLD = str.maketrans({
+    "\u2019": "'",
+    "\u2018": "'",
+    "\u02bc": "'",
+    "ё": "е",
+    "Ё": "е",
+    **{space: " " for space in _UNICODE_SPACES},
+})
+
+
+def normalize_transcript(transcript: str) -> str:
+    """Lowercase, fold typographic variants and strip a transcript for matching."""
+    return transcript.lower().translate(_FOLD).strip()
+
+
+# Literal anchors: every pattern in a category contains at least one of its
+# category's anchors verbatim, so a category whose anchors are all absent
+# from the (lowercased) transcript cannot match and its regex work is skipped.
+LANGUAGE_ANCHORS: Tuple[str, ...] = (
+    "русск", "понима", "английск", "russian", "understand", "english",
+)
+SLOW_SPEECH_ANCHORS: Tuple[str, ...] = (
+    "медленн", "быстр", "тише", "торопись", "спеши", "успева", "подожди",
+    "slow", "fast", "wait", "keep", "follow", "hold",
+)
+REPEAT_ANCHORS: Tuple[str, ...] = (
+    "повтори", "еще", "сказал", "значит", "расслышал",
+    "repeat", "again", "more", "what", "pardon", "sorry",
+)
+CORRECTION_ANCHORS: Tuple[str, ...] = ("исправ", "поправляй", "correct")
+
+
+CATEGORY_ANCHORS: Dict[str, Tuple[str, ...]] = {
+    "language": LANGUAGE_ANCHORS,
+    "speech_pace": SLOW_SPEECH_ANCHORS,
+    "repeat": REPEAT_ANCHORS,
+    "correction_style": CORRECTION_ANCHORS,
+}
+
+
+def _triggered_categories(text: str) -> set:
+    """Command categories whose anchors occur in text."""
+    return {
+        category
+        for category, anchors in CATEGORY_ANCHORS.items()
+        if any(anchor in text for anchor in anchors)
+    }
+
+
+# Compiled once at import; extract_commands calls .search() on these directly
+# instead of re-resolving pattern strings through re's cache every turn.
+# Unicode matching is already the default for str patterns.
+PATTERN_FLAGS = re.IGNORECASE
+
+
+def _pattern_source(pattern: str) -> str:
+    """
+    Source for one command pattern.
+
+    English patterns are pure ASCII, so their \s and \w only need ASCII
+    classes (smaller and faster to test); Russian ones keep Unicode classes.
+    """
+    if pattern.isascii():
+        return f"(?a:{pattern})"
+    return pattern
+
+
+COMPILED_LANGUAGE_PATTERNS: List[re.Pattern] = [
+    re.compile(_pattern_source(p), PATTERN_FLAGS) for p, _, _ in LANGUAGE_SWITCH_PATTERNS
+]
+COMPILED_SLOW_SPEECH_PATTERNS: List[re.Pattern] = [
+    re.compile(_pattern_source(p), PATTERN_FLAGS) for p in SLOW_SPEECH_PATTERNS
+]
+COMPILED_REPEAT_PATTERNS: List[re.Pattern] = [
+    re.compile(_pattern_source(p), PATTERN_FLAGS) for p in REPEAT_PATTERNS
+]
+COMPILED_CORRECTION_PATTERNS: List[re.Pattern] = [
+    re.compile(_pattern_source(p), PATTERN_FLAGS) for p, _ in CORRECTION_PATTERNS
+]
+
+
+def _fuse_patterns(patterns: List[str]) -> re.Pattern:
+    """Compile patterns into one alternation where group g<i> marks pattern i."""
+    return re.compile(
+        "|".join(f"(?P<g{i}>{_pattern_source(pattern)})" for i, pattern in enumerate(patterns)),
+        PATTERN_FLAGS,
+    )
+
+
+# One alternation per category: a single search() answers "does any pattern
+# in this category match?" instead of one search() per pattern.
+FUSED_LANGUAGE_REGEX = _fuse_patterns([p for p, _, _ in LANGUAGE_SWITCH_PATTERNS])
+FUSED_SLOW_SPEECH_REGEX = _fuse_patterns(SLOW_SPEECH_PATTERNS)
+FUSED_REPEAT_REGEX = _fuse_patterns(REPEAT_PATTERNS)
+FUSED_CORRECTION_REGEX = _fuse_patterns([p for p, _ in CORRECTION_PATTERNS])
+
+# category -> (fused regex, per-pattern regexes); repeat only needs its fused search
+CATEGORY_REGEXES: Dict[str, Tuple[re.Pattern, List[re.Pattern]]] = {
+    "language": (FUSED_LANGUAGE_REGEX, COMPILED_LANGUAGE_PATTERNS),
+    "speech_pace": (FUSED_SLOW_SPEECH_REGEX, COMPILED_SLOW_SPEECH_PATTERNS),
+    "correction_style": (FUSED_CORRECTION_REGEX, COMPILED_CORRECTION_PATTERNS),
+}
+
+
+def _first_matching_index(
+    fused: re.Pattern, compiled: List[re.Pattern], text: str
+) -> Optional[int]:
+    """
+    Index of the first pattern (in list order) that matches anywhere in text.
+
+    The fused search returns the leftmost match, but list order decides
+    priority, so only the patterns listed before the hit need re-checking.
+    """
+    match = fused.search(text)
+    if not match:
+        return None
+    hit = int(match.lastgroup[1:])
+    for i in range(hit):
+        if compiled[i].search(text):
+            return i
+    return hit
+
+
+# One combined alternation over every pattern above, compiled once at import.
+# A single search() rejects turns with no command at all (the common case)
+# before the per-category scans in extract_commands run.
+ANY_COMMAND_REGEX = re.compile(
+    "|".join(
+        f"(?:{_pattern_source(pattern)})"
+        for pattern in (
+            [p for p, _, _ in LANGUAGE_SWITCH_PATTERNS]
+            + SLOW_SPEECH_PATTERNS
+            + REPEAT_PATTERNS
+            + [p for p, _ in CORRECTION_PATTERNS]
+        )
+    ),
+    PATTERN_FLAGS,
+)
+
+
+def _regex_first_matches(text: str) -> Dict[str, int]:
+    """Lowest matching pattern index per category, via prefilter and regexes."""
+    # Cheap substring prefilter: most turns contain no command at all
+    triggered = _triggered_categories(text)
+    if not triggered:
+        return {}
+
+    # With several candidate categories, one combined search rules them all
+    # out at once; with a single one, its own fused search does the same job
+    if len(triggered) > 1 and not ANY_COMMAND_REGEX.search(text):
+        return {}
+
+    first: Dict[str, int] = {}
+    for category in triggered:
+        if category == "repeat":
+            # All repeat patterns mean the same thing; any hit will do
+            if FUSED_REPEAT_REGEX.search(text):
+                first[category] = 0
+            continue
+        fused, compiled = CATEGORY_REGEXES[category]
+        idx = _first_matching_index(fused, compiled, text)
+        if idx is not None:
+            first[category] = idx
+    return first
+
+
+# Shortest text any command pattern can match ("what?"); filler turns such as
+# "ok", "да" or "uh" are shorter and skip scanning entirely.
+MIN_COMMAND_LENGTH = 5
+
+# Students repeat stock phrases ("повтори", "slower please") all the time, so
+# scan results are memoized per lowered transcript, across sessions.
+SCAN_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=SCAN_CACHE_SIZE)
+def _scan_commands(transcript_lower: str) -> Tuple[Tuple[str, Any, Optional[str]], ...]:
+    """
+    Find the commands in a lowercased transcript.
+
+    Returns (type, value, matched pattern) tuples in category order, at most
+    one per category; the pattern is None for repeat and correction style.
+    """
+    first = _regex_first_matches(transcript_lower)
+    if not first:
+        return ()
+
+    found = []
+
+    # Language switch (only one language command per turn)
+    idx = first.get("language")
+    if idx is not None:
+        pattern, mode, _ = LANGUAGE_SWITCH_PATTERNS[idx]
+        found.append(("language", mode, pattern))
+
+    # Slow speech
+    idx = first.get("speech_pace")
+    if idx is not None:
+        found.append(("speech_pace", "slow", SLOW_SPEECH_PATTERNS[idx]))
+
+    # Repeat (session-only)
+    if "repeat" in first:
+        found.append(("repeat", True, None))
+
+    # Correction style
+    idx = first.get("correction_style")
+    if idx is not None:
+        found.append(("correction_style", CORRECTION_PATTERNS[idx][1], None))
+
+    return tuple(found)
+
+
+# ============================================================
+# RULE TEXT
+# ============================================================
+
+# Injected rule content per (type, value); built once instead of per command
+RULE_CONTENTS: Dict[Tuple[str, str], str] = {
+    ("language", "RU_ONLY"): (
+        "🚨 LANGUAGE: SPEAK RUSSIAN (говори по-русски). "
+        "Use Russian for ALL explanations and conversation. "
+        "English ONLY for teaching new vocabulary words. "
+        "Format vocabulary as: 'Слово \"apple\" означает \"яблоко\"'. "
+        "DO NOT switch back to English unless student explicitly asks."
+    ),
+    ("language", "EN_ONLY"): (
+        "🚨 LANGUAGE: SPEAK ENGLISH. "
+        "Use English for everything. "
+        "Russian ONLY if student is completely stuck (1-2 words max). "
+        "DO NOT switch to Russian unless student explicitly asks."
+    ),
+    ("speech_pace", "slow"): (
+        "🚨 SPEECH PACE: SPEAK SLOWLY (говори медленно). "
+        "Use '...' for pauses between phrases. "
+        "Give student time to process each sentence. "
+        "Example: 'The cat... is sitting... on the table.' "
+        "DO NOT speed up unless student explicitly asks."
+    ),
+    ("correction_style", "frequent"): (
+        "CORRECTION STYLE: Correct student's mistakes frequently. "
+        "Point out grammar and pronunciation errors gently."
+    ),
+    ("correction_style", "minimal"): (
+        "CORRECTION STYLE: Minimize corrections. "
+        "Focus on fluency over accuracy. Only correct critical errors."
+    ),
+}
+
+# Acknowledgment appended when a rule is first injected, per (type, value)
+RULE_ACKNOWLEDGMENTS: Dict[Tuple[str, str], str] = {
+    ("language", "RU_ONLY"): (
+        "\n\n⚠️ CRITICAL: You MUST acknowledge this IMMEDIATELY by saying: "
+        "'Хорошо, буду говорить по-русски.' or similar in RUSSIAN. "
+        "Then CONTINUE in Russian."
+    ),
+    ("language", "EN_ONLY"): (
+        "\n\n⚠️ CRITICAL: You MUST acknowledge this IMMEDIATELY by saying: "
+        "'Okay, I'll speak English now.' or similar in ENGLISH. "
+        "Then CONTINUE in English."
+    ),
+    ("speech_pace", "slow"): (
+        "\n\n⚠️ You MUST acknowledge by saying: "
+        "'Хорошо, буду говорить медленнее.' / 'Okay, I'll speak more slowly.' "
+        "Then demonstrate the slower pace immediately."
+    ),
+}
+
+RULE_PRIORITIES: Dict[str, int] = {
+    "language": 100,  # Highest - language is critical
+    "speech_pace": 90,
+    "correction_style": 70,
+}
+
 
 class SessionRuleManager:
     """
@@ -175,11 +478,19 @@ class SessionRuleManager:
         self.user = user
         self.user_id = user.id
         self.lesson_session = lesson_session
+        # Kept sorted by priority (highest first, ties in insertion order)
         self.active_rules: List[ActiveRule] = []
+        # Indexes over active_rules, kept in sync by _track_rule:
+        # first rule of each type, and high-priority rules in list order
+        self._rules_by_type: Dict[str, ActiveRule] = {}
+        self._high_priority: List[ActiveRule] = []
         self.turn_count = 0
         self.last_reminder_turn = 0
         self.reminder_interval = 8  # Remind every N turns
         self.commands_this_session: List[Dict[str, Any]] = []  # Log of all detected commands
+        self._now: Optional[datetime] = None  # Wall-clock time of the current turn, taken on first DB write
+        # Rules flushed this turn but not yet committed, with their rule_id before the write
+        self._pending_rules: List[Tuple[ActiveRule, Optional[int]]] = []
 
         # Load existing persistent rules from DB
         self._load_persistent_rules()
@@ -198,7 +509,7 @@ class SessionRuleManager:
             ).all()
 
             for rule in rules:
-                self.active_rules.append(ActiveRule(
+                self._track_rule(ActiveRule(
                     rule_id=rule.id,
                     type=rule.type,
                     content=rule.description,
@@ -208,71 +519,57 @@ class SessionRuleManager:
             logger.info(f"Loaded {len(self.active_rules)} persistent rules for user {self.user_id}")
 
             # Log high-priority rules
-            for rule in self.active_rules:
-                if rule.priority >= 80:
-                    logger.info(f"  High-priority rule: [{rule.type}] {rule.content[:50]}...")
+            for rule in self._high_priority:
+                logger.info(f"  High-priority rule: [{rule.type}] {rule.content[:50]}...")
 
         except Exception as e:
             logger.error(f"Failed to load persistent rules: {e}")
 
-    def extract_commands(self, transcript: str) -> List[Dict[str, Any]]:
+    def _track_rule(self, rule: ActiveRule):
+        """Insert a rule into active_rules in priority order and update the lookup indexes."""
+        insort(self.active_rules, rule, key=_descending_priority)
+        self._rules_by_type.setdefault(rule.type, rule)
+        if rule.priority >= HIGH_PRIORITY_THRESHOLD:
+            insort(self._high_priority, rule, key=_descending_priority)
+
+    def extract_commands(
+        self, transcript: str, lowered: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Extract commands/preferences from user's speech.
 
+        `lowered` is the transcript already passed through
+        normalize_transcript, when the caller has it; otherwise it is
+        computed here.
+
         Returns list of detected commands with their types and values.
         """
         if not transcript:
             return []
 
-        transcript_lower = transcript.lower().strip()
-        commands = []
+        transcript_lower = lowered if lowered is not None else normalize_transcript(transcript)
+        if len(transcript_lower) < MIN_COMMAND_LENGTH:
+            return []
 
-        # Check language switch patterns
-        for pattern, mode, _ in LANGUAGE_SWITCH_PATTERNS:
-            if re.search(pattern, transcript_lower, re.IGNORECASE | re.UNICODE):
-                commands.append({
-                    "type": "language",
-                    "value": mode,
-                    "source_text": transcript[:100],
-                    "pattern": pattern,
-                })
-                logger.info(f"🎯 Detected LANGUAGE command: {mode} from '{transcript[:50]}...'")
-                break  # Only one language command per turn
-
-        # Check slow speech patterns
-        for pattern in SLOW_SPEECH_PATTERNS:
-            if re.search(pattern, transcript_lower, re.IGNORECASE | re.UNICODE):
-                commands.append({
-                    "type": "speech_pace",
-                    "value": "slow",
-                    "source_text": transcript[:100],
-                    "pattern": pattern,
-                })
-                logger.info(f"🎯 Detected SPEECH_PACE command: slow from '{transcript[:50]}...'")
-                break
-
-        # Check repeat patterns (session-only)
-        for pattern in REPEAT_PATTERNS:
-            if re.search(pattern, transcript_lower, re.IGNORECASE | re.UNICODE):
-                commands.append({
-                    "type": "repeat",
-                    "value": True,
-                    "source_text": transcript[:100],
-                    "session_only": True,
-                })
+        commands = []
+        for cmd_type, value, pattern in _scan_commands(transcript_lower):
+            cmd = {
+                "type": cmd_type,
+                "value": value,
+                "source_text": transcript[:100],
+            }
+            if cmd_type == "language":
+                cmd["pattern"] = pattern
+                logger.info(f"🎯 Detected LANGUAGE command: {value} from '{transcript[:50]}...'")
+            elif cmd_type == "speech_pace":
+                cmd["pattern"] = pattern
+                logger.info(f"🎯 Detected SPEECH_PACE command: {value} from '{transcript[:50]}...'")
+            elif cmd_type == "repeat":
+                cmd["session_only"] = True
                 logger.info(f"🎯 Detected REPEAT request")
-                break
-
-        # Check correction style patterns
-        for pattern, style in CORRECTION_PATTERNS:
-            if re.search(pattern, transcript_lower, re.IGNORECASE | re.UNICODE):
-                commands.append({
-                    "type": "correction_style",
-                    "value": style,
-                    "source_text": transcript[:100],
-                })
-                logger.info(f"🎯 Detected CORRECTION_STYLE command: {style}")
-                break
+            else:
+                logger.info(f"🎯 Detected CORRECTION_STYLE command: {value}")
+            commands.append(cmd)
 
         # Log all commands for analytics
         self.commands_this_session.extend(commands)
@@ -290,23 +587,30 @@ class SessionRuleManager:
             Optional system message to inject into conversation, or None
         """
         self.turn_count += 1
-        commands = self.extract_commands(transcript)
+        self._now = None
+        lowered = normalize_transcript(transcript) if transcript else ""
+        commands = self.extract_commands(transcript, lowered=lowered)
 
-        injection_parts = []
+        # Every injection fragment goes into one flat list, joined once
+        injection_parts: List[str] = []
 
         for cmd in commands:
             rule = self._add_rule_from_command(cmd)
             if rule:
-                injection_parts.append(self._format_rule_injection(rule, is_new=True))
+                if injection_parts:
+                    injection_parts.append("\n\n")
+                self._append_rule_injection(injection_parts, rule, is_new=True)
+
+        # One commit for every rule written this turn
+        if self._pending_rules:
+            self._commit_pending_rules()
 
         # Check if we should send a reminder
-        if self._should_send_reminder() and not injection_parts:
-            reminder = self._build_reminder()
-            if reminder:
-                injection_parts.append(reminder)
+        if not injection_parts and self._should_send_reminder():
+            self._append_reminder(injection_parts)
 
         if injection_parts:
-            return "\n\n".join(injection_parts)
+            return "".join(injection_parts)
 
         return None
 
@@ -321,11 +625,7 @@ class SessionRuleManager:
             return None
 
         # Check if we already have this rule type
-        existing_rule = None
-        for rule in self.active_rules:
-            if rule.type == cmd_type:
-                existing_rule = rule
-                break
+        existing_rule = self._rules_by_type.get(cmd_type)
 
         # Build rule content based on type and value
         content = self._build_rule_content(cmd_type, cmd_value)
@@ -338,7 +638,7 @@ class SessionRuleManager:
                 existing_rule.content = content
                 existing_rule.value = cmd_value
                 existing_rule.injected = False  # Mark for re-injection
-                existing_rule.created_at = datetime.utcnow()
+                existing_rule.created_at_ns = time.monotonic_ns()
 
                 if not session_only:
                     self._persist_rule(existing_rule)
@@ -359,7 +659,7 @@ class SessionRuleManager:
                 priority=self._get_rule_priority(cmd_type),
                 is_session_only=session_only,
             )
-            self.active_rules.append(new_rule)
+            self._track_rule(new_rule)
 
             if not session_only:
                 self._persist_rule(new_rule)
@@ -369,57 +669,23 @@ class SessionRuleManager:
 
     def _build_rule_content(self, rule_type: str, value: str) -> Optional[str]:
         """Build human-readable rule content for injection."""
-        if rule_type == "language":
-            if value == "RU_ONLY":
-                return (
-                    "🚨 LANGUAGE: SPEAK RUSSIAN (говори по-русски). "
-                    "Use Russian for ALL explanations and conversation. "
-                    "English ONLY for teaching new vocabulary words. "
-                    "Format vocabulary as: 'Слово \"apple\" означает \"яблоко\"'. "
-                    "DO NOT switch back to English unless student explicitly asks."
-                )
-            elif value == "EN_ONLY":
-                return (
-                    "🚨 LANGUAGE: SPEAK ENGLISH. "
-                    "Use English for everything. "
-                    "Russian ONLY if student is completely stuck (1-2 words max). "
-                    "DO NOT switch to Russian unless student explicitly asks."
-                )
-
-        elif rule_type == "speech_pace":
-            return (
-                "🚨 SPEECH PACE: SPEAK SLOWLY (говори медленно). "
-                "Use '...' for pauses between phrases. "
-                "Give student time to process each sentence. "
-                "Example: 'The cat... is sitting... on the table.' "
-                "DO NOT speed up unless student explicitly asks."
-            )
-
-        elif rule_type == "correction_style":
-            if value == "frequent":
-                return (
-                    "CORRECTION STYLE: Correct student's mistakes frequently. "
-                    "Point out grammar and pronunciation errors gently."
-                )
-            elif value == "minimal":
-                return (
-                    "CORRECTION STYLE: Minimize corrections. "
-                    "Focus on fluency over accuracy. Only correct critical errors."
-                )
-
-        return None
+        return RULE_CONTENTS.get((rule_type, value))
 
     def _get_rule_priority(self, rule_type: str) -> int:
         """Get default priority for a rule type."""
-        priorities = {
-            "language": 100,  # Highest - language is critical
-            "speech_pace": 90,
-            "correction_style": 70,
-        }
-        return priorities.get(rule_type, 50)
+        return RULE_PRIORITIES.get(rule_type, 50)
 
     def _persist_rule(self, rule: ActiveRule):
-        """Persist a rule to the database."""
+        """
+        Write a rule to the database session.
+
+        Only flushes; process_user_turn commits all of a turn's writes at once.
+        """
+        # One wall-clock timestamp shared by every write in this turn
+        if self._now is None:
+            self._now = datetime.utcnow()
+        now = self._now
+        self._pending_rules.append((rule, rule.rule_id))
         try:
             if rule.rule_id:
                 # Update existing
@@ -427,88 +693,83 @@ class SessionRuleManager:
                 if db_rule:
                     db_rule.description = rule.content
                     db_rule.priority = rule.priority
-                    db_rule.updated_at = datetime.utcnow()
+                    db_rule.updated_at = now
                     self.db.add(db_rule)
             else:
-                # Check if similar rule exists (to avoid duplicates)
-                existing = self.db.exec(
-                    select(TutorRule)
-                    .where(TutorRule.scope == "student")
-                    .where(TutorRule.applies_to_student_id == self.user_id)
-                    .where(TutorRule.type == rule.type)
-                    .where(TutorRule.is_active == True)
-                ).first()
-
-                if existing:
-                    # Update existing instead of creating new
-                    existing.description = rule.content
-                    existing.priority = rule.priority
-                    existing.updated_at = datetime.utcnow()
-                    self.db.add(existing)
-                    rule.rule_id = existing.id
-                else:
-                    # Create new
-                    db_rule = TutorRule(
-                        scope="student",
-                        type=rule.type,
-                        title=f"{rule.type.replace('_', ' ').title()} Preference",
-                        description=rule.content,
-                        priority=rule.priority,
-                        is_active=True,
-                        applies_to_student_id=self.user_id,
-                        created_by="system",
-                        updated_by="system",
-                        source="voice_detection",
-                        created_at=datetime.utcnow(),
-                        updated_at=datetime.utcnow(),
-                    )
-                    self.db.add(db_rule)
-                    self.db.flush()
-                    rule.rule_id = db_rule.id
+                # One upsert against the partial unique index on active student
+                # preferences: updates the existing row or inserts a new one
+                rule.rule_id = self.db.execute(
+                    self._preference_upsert(rule, now)
+                ).scalar_one()
 
-            self.db.commit()
+            self.db.flush()
             logger.info(f"💾 Persisted rule: {rule.type} (id={rule.rule_id}) for user {self.user_id}")
 
         except Exception as e:
             logger.error(f"Failed to persist rule: {e}")
-            self.db.rollback()
+            self._rollback_pending_rules()
 
-    def _format_rule_injection(self, rule: ActiveRule, is_new: bool = False) -> str:
-        """Format a rule as a system message injection."""
-        prefix = "🚨 NEW INSTRUCTION FROM STUDENT" if is_new else "📌 REMINDER"
-
-        acknowledgment = ""
+    def _commit_pending_rules(self):
+        """Commit the rule writes flushed during this turn."""
+        try:
+            self.db.commit()
+            self._pending_rules.clear()
+            invalidate_prompt_cache(self.user_id)
+        except Exception as e:
+            logger.error(f"Failed to commit rules: {e}")
+            self._rollback_pending_rules()
+
+    def _rollback_pending_rules(self):
+        """Roll back this turn's uncommitted writes and forget ids they assigned."""
+        self.db.rollback()
+        for rule, previous_id in self._pending_rules:
+            rule.rule_id = previous_id
+        self._pending_rules.clear()
+
+    def _preference_upsert(self, rule: ActiveRule, now: datetime):
+        """INSERT ... ON CONFLICT DO UPDATE for a student preference rule."""
+        if self.db.get_bind().dialect.name == "sqlite":
+            insert = sqlite_insert
+        else:
+            insert = pg_insert
+
+        stmt = insert(TutorRule).values(
+            scope="student",
+            type=rule.type,
+            title=f"{rule.type.replace('_', ' ').title()} Preference",
+            description=rule.content,
+            priority=rule.priority,
+            is_active=True,
+            applies_to_student_id=self.user_id,
+            created_by="system",
+            updated_by="system",
+            source="voice_detection",
+            created_at=now,
+            updated_at=now,
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[TutorRule.applies_to_student_id, TutorRule.type],
+            index_where=text(ACTIVE_STUDENT_PREFERENCE_WHERE),
+            set_={
+                "description": stmt.excluded.description,
+                "priority": stmt.excluded.priority,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(TutorRule.id)
+
+    def _append_rule_injection(self, parts: List[str], rule: ActiveRule, is_new: bool = False):
+        """Append a rule's system message injection to parts (joined with "")."""
+        parts.append("🚨 NEW INSTRUCTION FROM STUDENT:\n" if is_new else "📌 REMINDER:\n")
+        parts.append(rule.content)
         if is_new:
-            if rule.type == "language":
-                if rule.value == "RU_ONLY":
-                    acknowledgment = (
-                        "\n\n⚠️ CRITICAL: You MUST acknowledge this IMMEDIATELY by saying: "
-                        "'Хорошо, буду говорить по-русски.' or similar in RUSSIAN. "
-                        "Then CONTINUE in Russian."
-                    )
-                else:
-                    acknowledgment = (
-                        "\n\n⚠️ CRITICAL: You MUST acknowledge this IMMEDIATELY by saying: "
-                        "'Okay, I'll speak English now.' or similar in ENGLISH. "
-                        "Then CONTINUE in English."
-                    )
-            elif rule.type == "speech_pace":
-                acknowledgment = (
-                    "\n\n⚠️ You MUST acknowledge by saying: "
-                    "'Хорошо, буду говорить медленнее.' / 'Okay, I'll speak more slowly.' "
-                    "Then demonstrate the slower pace immediately."
-                )
-
-        return f"{prefix}:\n{rule.content}{acknowledgment}"
+            acknowledgment = RULE_ACKNOWLEDGMENTS.get((rule.type, rule.value))
+            if acknowledgment:
+                parts.append(acknowledgment)
 
     def _should_send_reminder(self) -> bool:
         """Check if we should send a rule reminder."""
-        if not self.active_rules:
-            return False
-
         # Only remind for high-priority rules
-        high_priority_rules = [r for r in self.active_rules if r.priority >= 80]
-        if not high_priority_rules:
+        if not self._high_priority:
             return False
 
         turns_since_reminder = self.turn_count - self.last_reminder_turn
@@ -516,25 +777,30 @@ class SessionRuleManager:
 
     def _build_reminder(self) -> Optional[str]:
         """Build a reminder message with active rules."""
-        high_priority_rules = [r for r in self.active_rules if r.priority >= 80]
-        if not high_priority_rules:
+        parts: List[str] = []
+        if not self._append_reminder(parts):
             return None
+        return "".join(parts)
 
-        self.last_reminder_turn = self.turn_count
+    def _append_reminder(self, parts: List[str]) -> bool:
+        """Append a reminder of the active rules to parts; False if there is nothing to remind."""
+        high_priority_rules = self._high_priority
+        if not high_priority_rules:
+            return False
 
-        # Sort by priority
-        sorted_rules = sorted(high_priority_rules, key=lambda r: r.priority, reverse=True)
+        self.last_reminder_turn = self.turn_count
 
-        parts = ["📌 REMINDER - These rules are ACTIVE for this student:"]
-        for rule in sorted_rules[:3]:  # Max 3 rules in reminder
+        parts.append("📌 REMINDER - These rules are ACTIVE for this student:")
+        for rule in high_priority_rules[:3]:  # Max 3 rules in reminder (already sorted)
             # Shorter version for reminders
-            short_content = rule.content.split('.')[0] + '.'
-            parts.append(f"• {short_content}")
+            short_content = rule.content.split('.')[0]
+            parts.append("\n• ")
+            parts.append(short_content)
+            parts.append(".")
             rule.reminder_count += 1
 
-        parts.append("\n⚠️ You MUST continue following these rules.")
-
-        return "\n".join(parts)
+        parts.append("\n\n⚠️ You MUST continue following these rules.")
+        return True
 
     def get_initial_rules_injection(self) -> Optional[str]:
         """
@@ -545,10 +811,8 @@ class SessionRuleManager:
         if not self.active_rules:
             return None
 
-        sorted_rules = sorted(self.active_rules, key=lambda r: r.priority, reverse=True)
-
         parts = ["📌 STUDENT-SPECIFIC RULES (you MUST follow these strictly):"]
-        for rule in sorted_rules:
+        for rule in self.active_rules:  # Already sorted by priority
             parts.append(f"• [{rule.type.upper()}] {rule.content}")
             rule.injected = True
 
@@ -558,10 +822,8 @@ class SessionRuleManager:
 
     def get_language_mode(self) -> Optional[str]:
         """Get the current language mode if a language rule is active."""
-        for rule in self.active_rules:
-            if rule.type == "language" and rule.value:
-                return rule.value
-        return None
+        rule = self._rules_by_type.get("language")
+        return rule.value if rule and rule.value else None
 
     def force_reminder(self) -> Optional[str]:
         """Force a reminder now, regardless of turn count."""
@@ -577,6 +839,6 @@ class SessionRuleManager:
             "reminders_sent": sum(r.reminder_count for r in self.active_rules),
             "high_priority_rules": [
                 {"type": r.type, "value": r.value}
-                for r in self.active_rules if r.priority >= 80
+                for r in self._high_priority
             ],
         }
@@ -15,21 +15,30 @@ The brain runs asynchronously alongside the streaming pipeline.
 """
 
 import asyncio
+import functools
 import json
 import logging
+import os
+import threading
+import time
+import warnings
 from typing import Optional, List, Dict, Any, Tuple
-from datetime import datetime
-from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from dataclasses import dataclass, fields
 from enum import Enum
 
+from sqlalchemy import text, update
 from sqlmodel import Session, select
-from openai import AsyncOpenAI
+from starlette.concurrency import run_in_threadpool
+from app.database import engine
+from app.services.openai_service import get_async_openai_client
 
 from app.models import (
     TutorLessonTurn,
     TutorBrainEvent,
     TutorStudentKnowledge,
     TutorRule,
+    TutorBrainBatch,
     UserAccount,
     AppSettings,
 )
@@ -37,6 +46,25 @@ from app.models import (
 logger = logging.getLogger(__name__)
 
 
+def _debug_tracebacks() -> bool:
+    """
+    Whether per-request failures should log a traceback.
+
+    Analysis failures (timeouts, 429s) are routine in production; walking
+    and formatting their tracebacks is only worth it when debugging.
+    """
+    return logger.isEnabledFor(logging.DEBUG)
+
+# Optional: orjson decodes the per-turn analysis JSON several times faster
+# than the stdlib and builds fewer intermediate strings. Falls back to json.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
 # ============================================================
 # Data Classes for Brain Analysis Results
 # ============================================================
@@ -49,7 +77,7 @@ class WeakWordReason(str, Enum):
     SPELLING = "spelling"
 
 
-@dataclass
+@dataclass(slots=True)
 class WeakWordDetection:
     word: str
     reason: WeakWordReason
@@ -57,7 +85,7 @@ class WeakWordDetection:
     suggestion: str
 
 
-@dataclass
+@dataclass(slots=True)
 class GrammarIssue:
     pattern: str  # e.g., "past_simple", "articles", "prepositions"
     mistake: str  # What the student said
@@ -65,14 +93,14 @@ class GrammarIssue:
     explanation: str  # Brief explanation
 
 
-@dataclass
+@dataclass(slots=True)
 class LevelAssessment:
     current_estimate: str  # CEFR level
     confidence: float  # 0.0 - 1.0
     evidence: str  # Why this assessment
 
 
-@dataclass
+@dataclass(slots=True)
 class SuggestedRule:
     type: str  # greeting, practice, focus, etc.
     description: str
@@ -80,7 +108,7 @@ class SuggestedRule:
     trigger: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class BrainAnalysisResult:
     weak_words: List[WeakWordDetection]
     grammar_issues: List[GrammarIssue]
@@ -91,6 +119,20 @@ class BrainAnalysisResult:
     next_activity_hint: Optional[str]
 
 
+def _to_plain_dict(obj) -> Dict[str, Any]:
+    """
+    Shallow dict of a result dataclass, with enums stored by value.
+
+    The result classes only hold scalars, so this avoids the recursive
+    copy that dataclasses.asdict does for every field.
+    """
+    plain = {}
+    for f in fields(obj):
+        value = getattr(obj, f.name)
+        plain[f.name] = value.value if isinstance(value, Enum) else value
+    return plain
+
+
 # ============================================================
 # Analysis Prompts
 # ============================================================
@@ -108,62 +150,302 @@ Be STRICT and PRECISE:
 Return ONLY valid JSON, no explanations outside the JSON.
 """
 
-ANALYSIS_USER_PROMPT_TEMPLATE = """Analyze this tutoring exchange:
-
-STUDENT (level estimate: {level}): "{user_text}"
-TUTOR RESPONSE: "{tutor_text}"
+# Completion budget per analyzed turn (batched requests get one per turn)
+ANALYSIS_MAX_TOKENS_PER_TURN = 1000
 
-Context:
-- Current known weak words: {weak_words}
-- Topics being practiced: {topics}
-- Language mode: {language_mode}
-
-Return JSON with this exact structure:
-{{
+# Per-turn result structure, shared by the single-turn and batched prompts
+ANALYSIS_RESULT_SCHEMA = """{
   "weak_words": [
-    {{
+    {
       "word": "string",
       "reason": "pronunciation|meaning|usage|grammar|spelling",
       "context": "what happened",
       "suggestion": "how to help"
-    }}
+    }
   ],
   "grammar_issues": [
-    {{
+    {
       "pattern": "e.g. past_simple, articles, prepositions",
       "mistake": "what student said",
       "correction": "correct form",
       "explanation": "brief explanation"
-    }}
+    }
   ],
-  "level_assessment": {{
+  "level_assessment": {
     "current_estimate": "A1|A2|B1|B2|C1|C2",
     "confidence": 0.0-1.0,
     "evidence": "why this assessment"
-  }} or null if not enough data,
+  } or null if not enough data,
   "suggested_rules": [
-    {{
+    {
       "type": "practice|focus|avoid|encourage",
       "description": "specific instruction for tutor",
       "priority": 1-5
-    }}
+    }
   ],
   "topics_detected": ["list", "of", "topics"],
   "student_mood": "confident|struggling|frustrated|engaged|neutral",
   "next_activity_hint": "suggestion for next activity" or null
-}}
+}"""
 
-IMPORTANT:
+ANALYSIS_GUIDELINES = """IMPORTANT:
 - If student made NO mistakes, return empty arrays
 - Only include level_assessment if you have clear evidence
 - Be conservative - don't over-diagnose issues
 """
 
 
+def _format_literal(text: str) -> str:
+    """Escape braces so text survives str.format unchanged."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+# The single-turn prompt is the per-turn exchange followed by a context block
+# that only changes with the student's weak words, topics and language mode.
+ANALYSIS_TURN_TEMPLATE = """Analyze this tutoring exchange:
+
+STUDENT (level estimate: {level}): "{user_text}"
+TUTOR RESPONSE: "{tutor_text}"
+
+"""
+
+ANALYSIS_CONTEXT_TEMPLATE = """Context:
+- Current known weak words: {weak_words}
+- Topics being practiced: {topics}
+- Language mode: {language_mode}
+
+Return JSON with this exact structure:
+""" + _format_literal(ANALYSIS_RESULT_SCHEMA) + "\n\n" + ANALYSIS_GUIDELINES
+
+ANALYSIS_USER_PROMPT_TEMPLATE = ANALYSIS_TURN_TEMPLATE + ANALYSIS_CONTEXT_TEMPLATE
+
+ANALYSIS_BATCH_PROMPT_TEMPLATE = """Analyze each of these tutoring exchanges independently:
+
+{turns_json}
+
+Each exchange has its "turn_id", the student's level estimate ("level"), what the
+STUDENT said ("user_text"), the TUTOR RESPONSE ("tutor_text"), the current known
+weak words, the topics being practiced and the language mode.
+
+Return JSON of the form {{"results": [...]}} with exactly one object per exchange.
+Each object has the exchange's "turn_id" plus this exact structure:
+""" + _format_literal(ANALYSIS_RESULT_SCHEMA) + "\n\n" + ANALYSIS_GUIDELINES
+
+
+def _context_strings(
+    weak_words: Tuple[str, ...],
+    topics: Tuple[str, ...],
+    language_mode: str,
+) -> Dict[str, str]:
+    """Prompt fields for the analysis context."""
+    return {
+        "weak_words": ", ".join(weak_words) if weak_words else "none",
+        "topics": ", ".join(topics) if topics else "general",
+        "language_mode": language_mode,
+    }
+
+
+# Context blocks repeat turn after turn within a session (and across sessions
+# of students with the same weak words), so the formatted block is memoized.
+ANALYSIS_CONTEXT_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=ANALYSIS_CONTEXT_CACHE_SIZE)
+def _analysis_context_block(
+    weak_words: Tuple[str, ...],
+    topics: Tuple[str, ...],
+    language_mode: str,
+) -> str:
+    """Formatted context block of the single-turn analysis prompt."""
+    return ANALYSIS_CONTEXT_TEMPLATE.format(
+        **_context_strings(weak_words, topics, language_mode)
+    )
+
+
+# ============================================================
+# Rate Limiting
+# ============================================================
+
+# Proactive limits for analysis requests, kept a little under the account's
+# OpenAI limits so bursts from the worker queue are paced instead of 429'd.
+BRAIN_REQUESTS_PER_MINUTE = 450
+BRAIN_TOKENS_PER_MINUTE = 180_000
+# Rough prompt size estimate used to charge the token bucket up front
+CHARS_PER_TOKEN = 4
+
+
+class _TokenBucket:
+    """
+    Continuously refilling token bucket shared by every event loop.
+
+    Callers wait (without blocking their loop) until enough capacity has
+    accumulated, and may refund what they reserved but did not use.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float) -> None:
+        # A request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float) -> None:
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+_request_bucket = _TokenBucket(BRAIN_REQUESTS_PER_MINUTE)
+_token_bucket = _TokenBucket(BRAIN_TOKENS_PER_MINUTE)
+
+
+def _estimate_tokens(text_chars: int) -> int:
+    return text_chars // CHARS_PER_TOKEN + 1
+
+
+async def _stream_json_completion(client, **kwargs) -> str:
+    """
+    Run a JSON-mode chat completion as a stream and return its content.
+
+    Stops reading as soon as the accumulated text is a complete JSON
+    object: in JSON mode the model sometimes pads the object with
+    whitespace up to max_tokens, which a non-streamed call waits out.
+
+    The request is paced by the module's request and token buckets. It is
+    charged its prompt plus max_tokens up front, and the unused part of
+    the completion budget is refunded once the content is known.
+    """
+    prompt_tokens = _estimate_tokens(sum(len(m["content"]) for m in kwargs["messages"]))
+    reserved = prompt_tokens + kwargs["max_tokens"]
+    await _request_bucket.acquire(1)
+    await _token_bucket.acquire(reserved)
+
+    parts: List[str] = []
+    try:
+        stream = await client.chat.completions.create(stream=True, **kwargs)
+    except Exception:
+        _token_bucket.refund(reserved - prompt_tokens)
+        raise
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            # Only a chunk ending in "}" can complete the top-level object
+            if delta.rstrip().endswith("}"):
+                content = "".join(parts)
+                try:
+                    _json_loads(content)
+                except ValueError:
+                    continue
+                return content
+    finally:
+        await stream.close()
+        used = prompt_tokens + _estimate_tokens(sum(len(p) for p in parts))
+        _token_bucket.refund(reserved - used)
+    return "".join(parts)
+
+
 # ============================================================
 # Smart Brain Service
 # ============================================================
 
+# The settings key is global config that only changes through the admin
+# settings endpoint, so services built per request share a cached copy.
+API_KEY_CACHE_TTL_SECONDS = 60
+
+# (stored_at monotonic, key); stored_at of None means "not cached"
+_API_KEY_CACHE: Tuple[Optional[float], Optional[str]] = (None, None)
+
+
+def refresh_api_key_cache() -> None:
+    """Forget the cached settings API key (call after settings change)."""
+    global _API_KEY_CACHE
+    _API_KEY_CACHE = (None, None)
+
+
+def _settings_api_key(session: Session) -> Optional[str]:
+    """OpenAI API key from AppSettings, cached for API_KEY_CACHE_TTL_SECONDS."""
+    global _API_KEY_CACHE
+    stored_at, api_key = _API_KEY_CACHE
+    now = time.monotonic()
+    if stored_at is not None and now - stored_at < API_KEY_CACHE_TTL_SECONDS:
+        return api_key
+    settings = session.get(AppSettings, 1)
+    api_key = settings.openai_api_key if settings else None
+    _API_KEY_CACHE = (now, api_key)
+    return api_key
+
+
+# Delta update of tutor_student_knowledge's JSONB documents: new weak words
+# are appended to vocabulary_json.weak and touched grammar patterns replace
+# their entries in grammar_json.patterns.
+KNOWLEDGE_JSON_PATCH_SQL = text("""
+UPDATE tutor_student_knowledge SET
+    vocabulary_json = jsonb_set(
+        COALESCE(vocabulary_json, CAST('{}' AS jsonb)),
+        '{weak}',
+        COALESCE(vocabulary_json -> 'weak', CAST('[]' AS jsonb)) || CAST(:new_weak AS jsonb)
+    ),
+    grammar_json = jsonb_set(
+        COALESCE(grammar_json, CAST('{}' AS jsonb)),
+        '{patterns}',
+        COALESCE(grammar_json -> 'patterns', CAST('{}' AS jsonb)) || CAST(:patterns AS jsonb)
+    )
+WHERE user_id = :user_id
+""")
+
+
+# Batch API statuses after which a batch will never produce results
+BATCH_FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+# Off by default: background analyses go to the regular API, nothing is ever
+# submitted to the Batch API, and so there is nothing for the poller to poll.
+USE_BRAIN_BATCH_API = os.getenv("USE_BRAIN_BATCH_API", "False").lower() == "true"
+
+# Sync callers (analyze_turn_sync) hand their analyses to one long-lived event
+# loop on a daemon thread instead of spinning up a thread and loop per call.
+SYNC_ANALYSIS_TIMEOUT_SECONDS = 10
+
+_brain_loop: Optional[asyncio.AbstractEventLoop] = None
+_brain_loop_lock = threading.Lock()
+
+
+def _get_brain_loop() -> asyncio.AbstractEventLoop:
+    """Return the background brain loop, starting its thread on first use."""
+    global _brain_loop
+    with _brain_loop_lock:
+        if _brain_loop is None:
+            _brain_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_brain_loop.run_forever,
+                name="smart-brain-loop",
+                daemon=True,
+            ).start()
+    return _brain_loop
+
+
 class SmartBrainService:
     """
     Intelligent brain service that uses LLM for analysis.
@@ -181,11 +463,7 @@ class SmartBrainService:
         self.model = model
 
         # Get API key from settings if not provided
-        if api_key:
-            self.api_key = api_key
-        else:
-            settings = session.get(AppSettings, 1)
-            self.api_key = settings.openai_api_key if settings else None
+        self.api_key = api_key or _settings_api_key(session)
 
         if not self.api_key:
             logger.warning("SmartBrainService initialized without API key")
@@ -214,53 +492,301 @@ class SmartBrainService:
         if not turn.user_text:
             return self._empty_result()
 
-        # Prepare context
-        context = context or {}
-        knowledge = self.session.get(TutorStudentKnowledge, user.id)
+        request = self._analysis_request(turn, user, context)
 
-        weak_words = []
-        if knowledge:
-            weak_words = [
-                w.get("word") if isinstance(w, dict) else w
-                for w in knowledge.vocabulary_json.get("weak", [])
-            ][:10]
+        try:
+            client = get_async_openai_client(self.api_key)
 
-        prompt = ANALYSIS_USER_PROMPT_TEMPLATE.format(
-            level=knowledge.level if knowledge else "A1",
-            user_text=turn.user_text,
-            tutor_text=turn.tutor_text or "(no response yet)",
-            weak_words=", ".join(weak_words) if weak_words else "none",
-            topics=", ".join(context.get("topics", [])) if context.get("topics") else "general",
-            language_mode=context.get("language_mode", "MIXED"),
+            result_json = await _stream_json_completion(client, **request)
+
+            result = self._parse_analysis_result(result_json)
+
+            logger.info(
+                "Brain analysis complete: %d weak words, %d grammar issues",
+                len(result.weak_words), len(result.grammar_issues),
+            )
+
+            return result
+
+        except Exception as e:
+            logger.error("Brain analysis failed: %s", e, exc_info=_debug_tracebacks())
+            return self._empty_result()
+
+    async def analyze_turns_async(
+        self,
+        items: List[Tuple[TutorLessonTurn, UserAccount, Optional[Dict[str, Any]]]],
+    ) -> Dict[int, BrainAnalysisResult]:
+        """
+        Analyze several conversation turns with a single LLM request.
+
+        Args:
+            items: (turn, user, context) tuples, as for analyze_turn_async
+
+        Returns:
+            Result per turn id; turns the model skipped get an empty result
+        """
+        results = {turn.id: self._empty_result() for turn, _, _ in items}
+        if not self.api_key:
+            logger.error("Cannot analyze: no API key")
+            return results
+
+        items = [item for item in items if item[0].user_text]
+        if not items:
+            return results
+
+        turns = []
+        for turn, user, context in items:
+            turns.append({
+                "turn_id": turn.id,
+                "user_text": turn.user_text,
+                "tutor_text": turn.tutor_text or "(no response yet)",
+                **self._prompt_context(user, context),
+            })
+        prompt = ANALYSIS_BATCH_PROMPT_TEMPLATE.format(
+            turns_json=json.dumps(turns, ensure_ascii=False, indent=2),
         )
 
         try:
-            client = AsyncOpenAI(api_key=self.api_key)
+            client = get_async_openai_client(self.api_key)
 
-            response = await client.chat.completions.create(
+            content = await _stream_json_completion(
+                client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.3,  # Lower temperature for more consistent analysis
-                max_tokens=1000,
+                max_tokens=ANALYSIS_MAX_TOKENS_PER_TURN * len(items),
                 response_format={"type": "json_object"},
             )
 
-            result_json = response.choices[0].message.content
-            result = self._parse_analysis_result(result_json)
+            data = _json_loads(content)
+            for entry in data.get("results", []):
+                try:
+                    turn_id = int(entry.get("turn_id"))
+                except (TypeError, ValueError):
+                    continue
+                if turn_id in results:
+                    results[turn_id] = self._result_from_data(entry)
 
-            logger.info(
-                f"Brain analysis complete: {len(result.weak_words)} weak words, "
-                f"{len(result.grammar_issues)} grammar issues"
-            )
+            logger.info("Batched brain analysis complete for %d turns", len(items))
 
-            return result
+        except Exception as e:
+            logger.error("Batched brain analysis failed: %s", e, exc_info=_debug_tracebacks())
+
+        return results
+
+    def _analysis_request(
+        self,
+        turn: TutorLessonTurn,
+        user: UserAccount,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Chat completion arguments for analyzing a single turn."""
+        level, weak_words, topics, language_mode = self._prompt_inputs(user, context)
+        prompt = ANALYSIS_TURN_TEMPLATE.format(
+            level=level,
+            user_text=turn.user_text,
+            tutor_text=turn.tutor_text or "(no response yet)",
+        ) + _analysis_context_block(weak_words, topics, language_mode)
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.3,  # Lower temperature for more consistent analysis
+            "max_tokens": ANALYSIS_MAX_TOKENS_PER_TURN,
+            "response_format": {"type": "json_object"},
+        }
+
+    async def submit_batch_analysis(
+        self,
+        items: List[Tuple[TutorLessonTurn, UserAccount, Optional[Dict[str, Any]]]],
+    ) -> Optional[TutorBrainBatch]:
+        """
+        Submit turns for analysis through the OpenAI Batch API.
+
+        For turns that don't need live feedback: batch requests cost half as
+        much but complete within 24h. Results are saved later by
+        process_completed_batches.
+
+        Args:
+            items: (turn, user, context) tuples, as for analyze_turns_async
+
+        Returns:
+            The stored TutorBrainBatch, or None if nothing was submitted
+        """
+        if not self.api_key:
+            logger.error("Cannot submit batch analysis: no API key")
+            return None
+
+        items = [item for item in items if item[0].user_text]
+        if not items:
+            return None
+
+        lines = []
+        for turn, user, context in items:
+            lines.append(json.dumps({
+                "custom_id": str(turn.id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._analysis_request(turn, user, context),
+            }, ensure_ascii=False))
+        jsonl = ("\n".join(lines) + "\n").encode("utf-8")
 
+        try:
+            client = get_async_openai_client(self.api_key)
+            input_file = await client.files.create(
+                file=("brain_analysis.jsonl", jsonl),
+                purpose="batch",
+            )
+            openai_batch = await client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
         except Exception as e:
-            logger.error(f"Brain analysis failed: {e}", exc_info=True)
-            return self._empty_result()
+            logger.error("Batch analysis submission failed: %s", e, exc_info=_debug_tracebacks())
+            return None
+
+        batch = TutorBrainBatch(
+            openai_batch_id=openai_batch.id,
+            turn_ids_json=[turn.id for turn, _, _ in items],
+        )
+        self.session.add(batch)
+        self.session.commit()
+        self.session.refresh(batch)
+
+        logger.info("Submitted %d turns to batch %s", len(items), openai_batch.id)
+        return batch
+
+    async def process_completed_batches(self) -> int:
+        """
+        Check submitted batches and save the results of finished ones.
+
+        A finished batch is claimed (submitted -> completed) and all of its
+        results are saved in one transaction, so a failure or restart midway
+        leaves nothing behind and the next poll starts that batch over, and
+        two pollers can't both save the same batch.
+
+        Returns:
+            Number of turns whose analysis was saved
+        """
+        if not self.api_key:
+            return 0
+
+        pending = self.session.exec(
+            select(TutorBrainBatch).where(TutorBrainBatch.status == "submitted")
+        ).all()
+        if not pending:
+            return 0
+
+        client = get_async_openai_client(self.api_key)
+        saved = 0
+        for batch in pending:
+            try:
+                openai_batch = await client.batches.retrieve(batch.openai_batch_id)
+                if openai_batch.status in BATCH_FAILED_STATUSES:
+                    batch.status = openai_batch.status
+                    batch.completed_at = datetime.utcnow()
+                    self.session.add(batch)
+                    self.session.commit()
+                    logger.warning(
+                        "Brain batch %s ended as %s",
+                        batch.openai_batch_id, openai_batch.status,
+                    )
+                    continue
+                if openai_batch.status != "completed":
+                    continue
+
+                output_text = None
+                if openai_batch.output_file_id:
+                    output = await client.files.content(openai_batch.output_file_id)
+                    output_text = output.text
+
+                claimed = self.session.execute(
+                    update(TutorBrainBatch)
+                    .where(
+                        TutorBrainBatch.id == batch.id,
+                        TutorBrainBatch.status == "submitted",
+                    )
+                    .values(status="completed", completed_at=datetime.utcnow())
+                ).rowcount
+                if not claimed:
+                    # Another poller got there first
+                    self.session.rollback()
+                    continue
+
+                batch_saved = self._save_batch_output(output_text) if output_text else 0
+                self.session.commit()
+                saved += batch_saved
+            except Exception as e:
+                self.session.rollback()
+                logger.error(
+                    "Processing brain batch %s failed: %s",
+                    batch.openai_batch_id, e,
+                    exc_info=_debug_tracebacks(),
+                )
+
+        return saved
+
+    def _save_batch_output(self, output: str) -> int:
+        """Save each successful result line of a batch output file (uncommitted)."""
+        saved = 0
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = _json_loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                content = response["body"]["choices"][0]["message"]["content"]
+                turn = self.session.get(TutorLessonTurn, int(entry["custom_id"]))
+            except Exception as e:
+                logger.error("Skipping malformed batch result line: %s", e)
+                continue
+            if turn is None:
+                continue
+            result = self._parse_analysis_result(content)
+            self.save_analysis_to_db(result, turn, turn.user_id, commit=False)
+            saved += 1
+        return saved
+
+    def _prompt_inputs(
+        self,
+        user: UserAccount,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, Tuple[str, ...], Tuple[str, ...], str]:
+        """Level, weak words, topics and language mode for the analysis prompt."""
+        context = context or {}
+        knowledge = self.session.get(TutorStudentKnowledge, user.id)
+
+        weak_words = ()
+        if knowledge:
+            weak_words = tuple(
+                w.get("word") if isinstance(w, dict) else w
+                for w in knowledge.vocabulary_json.get("weak", [])[:10]
+            )
+
+        return (
+            knowledge.level if knowledge else "A1",
+            weak_words,
+            tuple(context.get("topics") or ()),
+            context.get("language_mode", "MIXED"),
+        )
+
+    def _prompt_context(
+        self,
+        user: UserAccount,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, str]:
+        """Level, weak words, topics and language mode as prompt strings."""
+        level, weak_words, topics, language_mode = self._prompt_inputs(user, context)
+        return {"level": level, **_context_strings(weak_words, topics, language_mode)}
 
     def analyze_turn_sync(
         self,
@@ -270,33 +796,48 @@ class SmartBrainService:
     ) -> BrainAnalysisResult:
         """
         Synchronous wrapper for analyze_turn_async.
+
+        Runs the analysis on the shared background brain loop, so repeated
+        calls reuse one thread, one event loop and its pooled OpenAI client.
+
+        Deprecated: code running on an event loop should await
+        analyze_turn_async directly.
         """
+        warnings.warn(
+            "analyze_turn_sync is deprecated; await analyze_turn_async instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        future = asyncio.run_coroutine_threadsafe(
+            self.analyze_turn_async(turn, user, context),
+            _get_brain_loop(),
+        )
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If we're already in an async context, create a new task
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        asyncio.run,
-                        self.analyze_turn_async(turn, user, context)
-                    )
-                    return future.result(timeout=10)
-            else:
-                return loop.run_until_complete(
-                    self.analyze_turn_async(turn, user, context)
-                )
+            return future.result(timeout=SYNC_ANALYSIS_TIMEOUT_SECONDS)
+        except TimeoutError:
+            future.cancel()
+            logger.error("Sync analysis timed out after %ss", SYNC_ANALYSIS_TIMEOUT_SECONDS)
+            return self._empty_result()
         except Exception as e:
-            logger.error(f"Sync analysis failed: {e}")
+            future.cancel()
+            logger.error("Sync analysis failed: %s", e)
             return self._empty_result()
 
     def _parse_analysis_result(self, json_str: str) -> BrainAnalysisResult:
         """Parse JSON response into BrainAnalysisResult."""
         try:
-            data = json.loads(json_str)
+            return self._result_from_data(_json_loads(json_str))
+        except Exception as e:
+            logger.error("Failed to parse analysis result: %s", e)
+            return self._empty_result()
 
+    def _result_from_data(self, data: Dict[str, Any]) -> BrainAnalysisResult:
+        """Build a BrainAnalysisResult from one decoded analysis object."""
+        # One bound lookup for the several top-level reads below
+        data_get = data.get
+        try:
             weak_words = []
-            for w in data.get("weak_words", []):
+            for w in data_get("weak_words", []):
                 try:
                     weak_words.append(WeakWordDetection(
                         word=w.get("word", ""),
@@ -308,7 +849,7 @@ class SmartBrainService:
                     pass
 
             grammar_issues = []
-            for g in data.get("grammar_issues", []):
+            for g in data_get("grammar_issues", []):
                 try:
                     grammar_issues.append(GrammarIssue(
                         pattern=g.get("pattern", ""),
@@ -320,8 +861,8 @@ class SmartBrainService:
                     pass
 
             level_assessment = None
-            if data.get("level_assessment"):
-                la = data["level_assessment"]
+            la = data_get("level_assessment")
+            if la:
                 level_assessment = LevelAssessment(
                     current_estimate=la.get("current_estimate", "A1"),
                     confidence=float(la.get("confidence", 0.5)),
@@ -329,7 +870,7 @@ class SmartBrainService:
                 )
 
             suggested_rules = []
-            for r in data.get("suggested_rules", []):
+            for r in data_get("suggested_rules", []):
                 try:
                     suggested_rules.append(SuggestedRule(
                         type=r.get("type", "practice"),
@@ -345,13 +886,13 @@ class SmartBrainService:
                 grammar_issues=grammar_issues,
                 level_assessment=level_assessment,
                 suggested_rules=suggested_rules,
-                topics_detected=data.get("topics_detected", []),
-                student_mood=data.get("student_mood", "neutral"),
-                next_activity_hint=data.get("next_activity_hint"),
+                topics_detected=data_get("topics_detected", []),
+                student_mood=data_get("student_mood", "neutral"),
+                next_activity_hint=data_get("next_activity_hint"),
             )
 
         except Exception as e:
-            logger.error(f"Failed to parse analysis result: {e}")
+            logger.error("Failed to parse analysis result: %s", e)
             return self._empty_result()
 
     def _empty_result(self) -> BrainAnalysisResult:
@@ -371,13 +912,22 @@ class SmartBrainService:
         result: BrainAnalysisResult,
         turn: TutorLessonTurn,
         user_id: int,
+        commit: bool = True,
     ) -> List[TutorBrainEvent]:
         """
         Save analysis results to database as brain events.
 
         Returns list of created events.
+
+        With commit=False the writes are only flushed, so the caller can
+        save several turns (and its own bookkeeping) in one transaction.
+
+        Events and rules are bulk-inserted (one multi-row INSERT per table)
+        rather than flushed one by one through the unit of work, so their
+        primary keys are not populated on the returned objects.
         """
         events = []
+        rules = []
 
         # 1. Save weak words
         for ww in result.weak_words:
@@ -387,9 +937,8 @@ class SmartBrainService:
                 turn_id=turn.id,
                 pipeline_type="ANALYSIS",
                 event_type="WEAK_WORD_DETECTED",
-                event_payload_json=asdict(ww),
+                event_payload_json=_to_plain_dict(ww),
             )
-            self.session.add(event)
             events.append(event)
 
         # 2. Save grammar issues
@@ -400,9 +949,8 @@ class SmartBrainService:
                 turn_id=turn.id,
                 pipeline_type="ANALYSIS",
                 event_type="GRAMMAR_ISSUE_DETECTED",
-                event_payload_json=asdict(gi),
+                event_payload_json=_to_plain_dict(gi),
             )
-            self.session.add(event)
             events.append(event)
 
         # 3. Save level assessment if present
@@ -413,9 +961,8 @@ class SmartBrainService:
                 turn_id=turn.id,
                 pipeline_type="ANALYSIS",
                 event_type="LEVEL_ASSESSMENT",
-                event_payload_json=asdict(result.level_assessment),
+                event_payload_json=_to_plain_dict(result.level_assessment),
             )
-            self.session.add(event)
             events.append(event)
 
         # 4. Create suggested rules as TutorRule entries
@@ -433,56 +980,122 @@ class SmartBrainService:
                     updated_by="smart_brain",
                     source="brain_analysis",
                 )
-                self.session.add(rule)
+                rules.append(rule)
+
+        if events:
+            self.session.bulk_save_objects(events)
+        if rules:
+            self.session.bulk_save_objects(rules)
 
         # 5. Update student knowledge
         knowledge = self.session.get(TutorStudentKnowledge, user_id)
         if knowledge:
+            # One naive-UTC timestamp for the whole save, matching the
+            # TIMESTAMP columns and the added_at format used elsewhere
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            now_iso = now.isoformat()
+
             # Add weak words
             current_weak = knowledge.vocabulary_json.get("weak", [])
+            existing_words = {
+                w.get("word") if isinstance(w, dict) else w for w in current_weak
+            }
+            new_weak = []
             for ww in result.weak_words:
-                exists = any(
-                    (isinstance(w, dict) and w.get("word") == ww.word) or w == ww.word
-                    for w in current_weak
-                )
-                if not exists:
-                    current_weak.append({
+                if ww.word not in existing_words:
+                    existing_words.add(ww.word)
+                    new_weak.append({
                         "word": ww.word,
                         "reason": ww.reason.value,
                         "frequency": 1,
-                        "added_at": datetime.utcnow().isoformat(),
+                        "added_at": now_iso,
                     })
-            knowledge.vocabulary_json["weak"] = current_weak
 
-            # Update grammar patterns
+            # Update grammar patterns (only the touched ones are rewritten)
             patterns = knowledge.grammar_json.get("patterns", {})
+            changed_patterns = {}
             for gi in result.grammar_issues:
-                if gi.pattern not in patterns:
-                    patterns[gi.pattern] = {"attempts": 0, "mistakes": 0, "mastery": 0.0}
-                patterns[gi.pattern]["mistakes"] += 1
-                patterns[gi.pattern]["attempts"] += 1
+                p = changed_patterns.get(gi.pattern)
+                if p is None:
+                    p = dict(patterns.get(gi.pattern) or {"attempts": 0, "mistakes": 0, "mastery": 0.0})
+                    changed_patterns[gi.pattern] = p
+                p["mistakes"] += 1
+                p["attempts"] += 1
                 # Recalculate mastery
-                p = patterns[gi.pattern]
                 p["mastery"] = 1.0 - (p["mistakes"] / max(p["attempts"], 1))
-            knowledge.grammar_json["patterns"] = patterns
+
+            if new_weak or changed_patterns:
+                if self.session.get_bind().dialect.name == "postgresql":
+                    self._patch_knowledge_json(user_id, new_weak, changed_patterns)
+                else:
+                    # Reassign (not mutate) so the JSON columns are marked dirty
+                    knowledge.vocabulary_json = {
+                        **knowledge.vocabulary_json, "weak": current_weak + new_weak
+                    }
+                    knowledge.grammar_json = {
+                        **knowledge.grammar_json, "patterns": {**patterns, **changed_patterns}
+                    }
 
             # Update level if confident assessment
             if result.level_assessment and result.level_assessment.confidence >= 0.7:
                 knowledge.level = result.level_assessment.current_estimate
 
-            knowledge.updated_at = datetime.utcnow()
+            knowledge.updated_at = now
             self.session.add(knowledge)
 
-        self.session.commit()
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
+            if knowledge is not None:
+                # The PostgreSQL patch bypasses this copy; reload it so the
+                # next save in the same transaction builds on this one
+                self.session.expire(knowledge)
 
-        logger.info(f"Saved {len(events)} brain events to database")
+        logger.info("Saved %d brain events to database", len(events))
         return events
 
+    def _patch_knowledge_json(
+        self,
+        user_id: int,
+        new_weak: List[Dict[str, Any]],
+        changed_patterns: Dict[str, Dict[str, Any]],
+    ):
+        """
+        Append weak words and merge grammar patterns in place (PostgreSQL).
+
+        Sends only this turn's delta instead of rewriting the student's whole
+        vocabulary and grammar documents, which grow lesson after lesson.
+        """
+        self.session.execute(
+            KNOWLEDGE_JSON_PATCH_SQL,
+            {
+                "user_id": user_id,
+                "new_weak": json.dumps(new_weak, ensure_ascii=False),
+                "patterns": json.dumps(changed_patterns, ensure_ascii=False),
+            },
+        )
+
 
 # ============================================================
 # Async Brain Worker
 # ============================================================
 
+# Background batching: up to this many queued turns share one LLM request
+BRAIN_BATCH_MAX = 8
+BRAIN_BATCH_WAIT_SECONDS = 0.2
+# Keeps batched prompts a sane size regardless of turn count
+BRAIN_BATCH_MAX_CHARS = 12000
+# Consumer tasks draining the queue in parallel
+BRAIN_WORKER_CONCURRENCY = 8
+# Turns waiting beyond this are dropped rather than piling up during an outage
+BRAIN_QUEUE_MAX = 256
+
+
+def _turn_chars(turn: TutorLessonTurn) -> int:
+    return len(turn.user_text or "") + len(turn.tutor_text or "")
+
+
 class AsyncBrainWorker:
     """
     Worker that processes turns in the background.
@@ -491,29 +1104,46 @@ class AsyncBrainWorker:
     the streaming pipeline.
     """
 
-    def __init__(self, session: Session, api_key: str):
-        self.brain = SmartBrainService(session, api_key)
-        self.queue: asyncio.Queue = asyncio.Queue()
+    def __init__(
+        self,
+        session: Session,
+        api_key: str,
+        use_batch_api: bool = USE_BRAIN_BATCH_API,
+        concurrency: int = BRAIN_WORKER_CONCURRENCY,
+    ):
+        # Only used to resolve the API key; each batch opens its own Session
+        brain = SmartBrainService(session, api_key)
+        self.api_key = brain.api_key
+        self.model = brain.model
+        # Consumers share the queue; the request/token buckets cap throughput
+        self.concurrency = max(1, concurrency)
+        # Route drained turns to the (cheaper, slower) OpenAI Batch API
+        self.use_batch_api = use_batch_api
+        # Holds (turn_id, user_id, context, turn_chars), not ORM objects, so
+        # a backlog doesn't pin session-attached rows in memory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=BRAIN_QUEUE_MAX)
+        self.dropped = 0
         self.running = False
-        self._task: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
 
     async def start(self):
-        """Start the background worker."""
+        """Start the background worker's consumer tasks."""
         if self.running:
             return
         self.running = True
-        self._task = asyncio.create_task(self._process_loop())
-        logger.info("AsyncBrainWorker started")
+        self._tasks = [
+            asyncio.create_task(self._process_loop())
+            for _ in range(self.concurrency)
+        ]
+        logger.info("AsyncBrainWorker started with %d consumers", self.concurrency)
 
     async def stop(self):
         """Stop the background worker."""
         self.running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
         logger.info("AsyncBrainWorker stopped")
 
     async def submit_turn(
@@ -522,9 +1152,14 @@ class AsyncBrainWorker:
         user: UserAccount,
         context: Optional[Dict[str, Any]] = None,
     ):
-        """Submit a turn for background analysis."""
-        await self.queue.put((turn, user, context))
-        logger.debug(f"Turn {turn.id} submitted for brain analysis")
+        """Submit a turn for background analysis (dropped if the queue is full)."""
+        try:
+            self.queue.put_nowait((turn.id, user.id, context, _turn_chars(turn)))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Brain queue full, dropping turn %s", turn.id)
+            return
+        logger.debug("Turn %s submitted for brain analysis", turn.id)
 
     async def _process_loop(self):
         """Main processing loop."""
@@ -532,23 +1167,138 @@ class AsyncBrainWorker:
             try:
                 # Wait for items with timeout
                 try:
-                    turn, user, context = await asyncio.wait_for(
+                    first = await asyncio.wait_for(
                         self.queue.get(),
                         timeout=1.0
                     )
                 except asyncio.TimeoutError:
                     continue
 
-                # Process the turn
+                queued = await self._drain_batch(first)
+
+                # Process the batch: one LLM request, however many turns
                 try:
-                    result = await self.brain.analyze_turn_async(turn, user, context)
-                    self.brain.save_analysis_to_db(result, turn, user.id)
+                    # A Session per batch: consumers never share one, and none
+                    # sits idle in a transaction between batches
+                    with Session(engine) as session:
+                        brain = SmartBrainService(session, self.api_key, self.model)
+                        batch = self._load_batch(session, queued)
+                        if self.use_batch_api:
+                            # Results are saved later by the batch poller
+                            await brain.submit_batch_analysis(batch)
+                        else:
+                            if len(batch) == 1:
+                                turn, user, context = batch[0]
+                                results = {turn.id: await brain.analyze_turn_async(turn, user, context)}
+                            else:
+                                results = await brain.analyze_turns_async(batch)
+                            # Blocking DB writes go to the threadpool, off the event loop
+                            await run_in_threadpool(self._save_batch, brain, batch, results)
                 except Exception as e:
-                    logger.error(f"Brain analysis error: {e}", exc_info=True)
+                    logger.error("Brain analysis error: %s", e, exc_info=_debug_tracebacks())
+
+                for _ in queued:
+                    self.queue.task_done()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Brain worker error: %s", e, exc_info=True)
+
+    def _save_batch(
+        self, brain: SmartBrainService, batch: list, results: Dict[int, BrainAnalysisResult]
+    ):
+        """Save every result of a batch (runs in a worker thread)."""
+        for turn, user, _ in batch:
+            brain.save_analysis_to_db(results[turn.id], turn, user.id)
+
+    def _load_batch(self, session: Session, queued: list) -> list:
+        """Fetch the (turn, user, context) items for queued ids, skipping gone rows."""
+        batch = []
+        for turn_id, user_id, context, _ in queued:
+            turn = session.get(TutorLessonTurn, turn_id)
+            user = session.get(UserAccount, user_id)
+            if turn is None or user is None:
+                logger.warning("Turn %s vanished before brain analysis", turn_id)
+                continue
+            batch.append((turn, user, context))
+        return batch
+
+    async def _drain_batch(self, first) -> list:
+        """
+        Collect queued turns to analyze together with `first`.
+
+        Stops at BRAIN_BATCH_MAX turns, at BRAIN_BATCH_MAX_CHARS of turn text,
+        or once no new turn arrives within BRAIN_BATCH_WAIT_SECONDS.
+        """
+        batch = [first]
+        chars = first[3]
+        while len(batch) < BRAIN_BATCH_MAX and chars < BRAIN_BATCH_MAX_CHARS:
+            try:
+                item = await asyncio.wait_for(
+                    self.queue.get(),
+                    timeout=BRAIN_BATCH_WAIT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            chars += item[3]
+        return batch
+
+
+# ============================================================
+# Batch API Poller
+# ============================================================
+
+# Batch results arrive within 24h; checking every few minutes is plenty
+BRAIN_BATCH_POLL_SECONDS = 300
+
+
+class BrainBatchPoller:
+    """
+    Periodically saves the results of finished Batch API analyses.
+
+    Each poll opens its own Session and reads the API key from settings,
+    so the poller can run for the whole life of the app. Only started when
+    USE_BRAIN_BATCH_API is on.
+    """
+
+    def __init__(self, interval: float = BRAIN_BATCH_POLL_SECONDS):
+        self.interval = interval
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start polling in the background."""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info("BrainBatchPoller started")
 
-                self.queue.task_done()
+    async def stop(self):
+        """Stop polling."""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("BrainBatchPoller stopped")
 
+    async def _poll_loop(self):
+        while self.running:
+            try:
+                with Session(engine) as session:
+                    saved = await SmartBrainService(session).process_completed_batches()
+                if saved:
+                    logger.info("Saved batch analyses for %d turns", saved)
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"Brain worker error: {e}", exc_info=True)
+                logger.error("Brain batch poll failed: %s", e, exc_info=_debug_tracebacks())
+            await asyncio.sleep(self.interval)
+
+
+brain_batch_poller = BrainBatchPoller()
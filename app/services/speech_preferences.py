@@ -6,8 +6,10 @@ repeat, etc.) and creates persistent TutorRules so the tutor remembers.
 """
 
 import re
+import time
 import logging
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
+from sqlalchemy import and_, bindparam
 from sqlmodel import Session, select
 from datetime import datetime
 
@@ -16,7 +18,7 @@ from app.models import TutorRule
 logger = logging.getLogger(__name__)
 
 # Patterns to detect "speak slowly" requests in multiple languages
-SLOW_SPEECH_PATTERNS = [
+SLOW_SPEECH_PATTERNS: Tuple[str, ...] = (
     # Russian patterns
     r"говори\s*(по)?медленн",
     r"медленн\w*\s+говори",
@@ -33,7 +35,7 @@ SLOW_SPEECH_PATTERNS = [
     r"more\s+slowly",
     r"not\s+so\s+fast",
     r"can\s+you\s+slow",
-]
+)
 
 # Compile patterns for efficiency
 SLOW_SPEECH_REGEX = re.compile(
@@ -41,6 +43,55 @@ SLOW_SPEECH_REGEX = re.compile(
     re.IGNORECASE | re.UNICODE
 )
 
+# Literal anchors: every pattern above contains at least one of these verbatim,
+# so a lowercased transcript without any of them cannot match. Most turns are
+# ordinary speech and stop at this substring check.
+SLOW_SPEECH_ANCHORS: Tuple[str, ...] = ("медленн", "быстр", "slow", "fast")
+
+
+# Built once at import; only the student id changes between calls. The
+# partial unique index uq_tutor_rules_active_student_preference covers it.
+_SLOW_SPEECH_RULE_STMT = select(TutorRule).where(
+    and_(
+        TutorRule.scope == "student",
+        TutorRule.type == "speech_pace",
+        TutorRule.is_active == True,
+        TutorRule.applies_to_student_id == bindparam("user_id"),
+    )
+)
+
+# Students who are known to already have the rule skip the lookup on repeated
+# "slower please" turns. Entries expire so admin edits are picked up again.
+KNOWN_RULE_TTL_SECONDS = 300
+KNOWN_RULE_MAX_ENTRIES = 4096
+
+# user_id -> monotonic time the rule was last seen
+_KNOWN_SLOW_SPEECH_USERS: Dict[int, float] = {}
+
+
+def forget_slow_speech_rule(user_id: Optional[int] = None) -> None:
+    """Drop the "rule exists" mark for one user (or everyone if no id is given)."""
+    if user_id is None:
+        _KNOWN_SLOW_SPEECH_USERS.clear()
+        return
+    _KNOWN_SLOW_SPEECH_USERS.pop(user_id, None)
+
+
+def _has_known_slow_speech_rule(user_id: int) -> bool:
+    seen_at = _KNOWN_SLOW_SPEECH_USERS.get(user_id)
+    if seen_at is None:
+        return False
+    if time.monotonic() - seen_at > KNOWN_RULE_TTL_SECONDS:
+        _KNOWN_SLOW_SPEECH_USERS.pop(user_id, None)
+        return False
+    return True
+
+
+def _mark_slow_speech_rule(user_id: int) -> None:
+    if len(_KNOWN_SLOW_SPEECH_USERS) >= KNOWN_RULE_MAX_ENTRIES:
+        _KNOWN_SLOW_SPEECH_USERS.clear()
+    _KNOWN_SLOW_SPEECH_USERS[user_id] = time.monotonic()
+
 
 def detect_slow_speech_request(text: str) -> bool:
     """
@@ -54,6 +105,9 @@ def detect_slow_speech_request(text: str) -> bool:
     """
     if not text:
         return False
+    text_lower = text.lower()
+    if not any(anchor in text_lower for anchor in SLOW_SPEECH_ANCHORS):
+        return False
     return bool(SLOW_SPEECH_REGEX.search(text))
 
 
@@ -73,14 +127,11 @@ def get_or_create_slow_speech_rule(
     """
     # Check if rule already exists for this student
     existing = db.exec(
-        select(TutorRule)
-        .where(TutorRule.scope == "student")
-        .where(TutorRule.applies_to_student_id == user_id)
-        .where(TutorRule.type == "speech_pace")
-        .where(TutorRule.is_active == True)
+        _SLOW_SPEECH_RULE_STMT, params={"user_id": user_id}
     ).first()
 
     if existing:
+        _mark_slow_speech_rule(user_id)
         return existing, False
 
     # Create new rule
@@ -110,6 +161,7 @@ def get_or_create_slow_speech_rule(
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    _mark_slow_speech_rule(user_id)
 
     logger.info(f"Created SLOW_SPEECH rule for user {user_id}")
     return rule, True
@@ -139,6 +191,9 @@ def process_user_speech_preferences(
     # Check for slow speech request
     if detect_slow_speech_request(transcript):
         logger.info(f"Detected SLOW SPEECH request from user {user_id}: '{transcript[:50]}...'")
+        if _has_known_slow_speech_rule(user_id):
+            logger.debug(f"Speech pace rule already exists for user {user_id}")
+            return None
         rule, was_created = get_or_create_slow_speech_rule(db, user_id)
         if was_created:
             logger.info(f"Created new speech pace rule for user {user_id}")
@@ -3,97 +3,403 @@ Token health check service for AI providers.
 
 This module provides health checking for AI API tokens (OpenAI, Yandex SpeechKit, etc).
 """
+import asyncio
+import hashlib
 import logging
 import json
-from typing import Literal, Any
-from pydantic import BaseModel
-from datetime import datetime
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Literal, Any, AsyncIterator, Awaitable, Callable
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    AuthenticationError,
+    RateLimitError,
+)
+from datetime import datetime, timezone
+
+from app.services.http_clients import get_health_client
 
 logger = logging.getLogger(__name__)
 
-class TokenHealthResult(BaseModel):
-    """Result of a token health check."""
+@dataclass(slots=True, frozen=True)
+class TokenHealthResult:
+    """Result of a token health check.
+    
+    A plain dataclass rather than a pydantic model: results are built and
+    cached on every check, and the API layer copies the fields it returns
+    into its own response models anyway.
+    """
     status: Literal["ok", "invalid", "quota", "error", "unknown"]
     message: str
     raw_error: str | None = None
     debug_info: dict[str, Any] | None = None  # Full request/response for debugging
+    transient: bool = False  # Upstream outage (5xx, connection, timeout), not a verdict on the key
+    stale: bool = False  # Last known "ok" result served during an upstream outage
+
+    def to_debug_dict(self) -> dict[str, Any] | None:
+        """debug_info for display, with the raw test_time_ns formatted as test_time."""
+        if self.debug_info is None:
+            return None
+        debug = dict(self.debug_info)
+        test_time_ns = debug.pop("test_time_ns", None)
+        if test_time_ns is not None:
+            debug["test_time"] = (
+                datetime.fromtimestamp(test_time_ns / 1e9, timezone.utc)
+                .replace(tzinfo=None)
+                .isoformat()
+            )
+        return debug
+
+# Upper bound for one provider check, so a hung provider can't stall the
+# admin dashboard for the clients' full default timeouts
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# One retry for transient provider failures (5xx, dropped connection), after
+# a short jittered backoff. Bad keys (401) and rate limits (429) are final.
+HEALTH_CHECK_RETRIES = 1
+HEALTH_CHECK_BACKOFF_SECONDS = 0.1
+HEALTH_CHECK_BACKOFF_JITTER_SECONDS = 0.05
+
+# Recent results are reused so repeated dashboard checks don't each cost a
+# provider round trip (and quota). Failures expire fast so a rotated or
+# topped-up key is picked up quickly.
+HEALTH_CACHE_MAX_ENTRIES = 128
+HEALTH_CACHE_TTL_OK_SECONDS = 30.0
+HEALTH_CACHE_TTL_ERROR_SECONDS = 5.0
+
+# sha256(provider|key|model|debug) -> (stored_at monotonic, result)
+_HEALTH_CACHE: "OrderedDict[str, tuple[float, TokenHealthResult]]" = OrderedDict()
+
+# While a provider is down (transient failures only), the key's last "ok"
+# result is served for up to this long instead of flipping the dashboard red
+HEALTH_MAX_STALE_SECONDS = 300.0
+
+# Same keys as _HEALTH_CACHE -> (stored_at monotonic, last "ok" result)
+_LAST_OK: "OrderedDict[str, tuple[float, TokenHealthResult]]" = OrderedDict()
+
+
+# Fallback for errors outside the SDK's typed hierarchy: one pass over the
+# message for an HTTP status mentioned in it, or a bad key / quota phrase
+_OPENAI_ERR_RE = re.compile(
+    r"\b(?P<code>401|429|500|503)\b|(?P<unauth>unauthoriz|invalid)|(?P<quota>quota|rate[ _-]?limit)",
+    re.IGNORECASE,
+)
+_OPENAI_CODE_KINDS = {"401": "unauth", "429": "quota"}
+
+
+def _classify_openai_error(error_str: str) -> tuple[int | None, str | None]:
+    """Return (HTTP status found in the message, "unauth" / "quota" / None)."""
+    http_status = None
+    kinds = set()
+    for match in _OPENAI_ERR_RE.finditer(error_str):
+        kind = match.lastgroup
+        if kind == "code":
+            code = match.group("code")
+            if http_status is None:
+                http_status = int(code)
+            kind = _OPENAI_CODE_KINDS.get(code)
+        kinds.add(kind)
+    # A bad key wins over quota, as the key has to be fixed first
+    if "unauth" in kinds:
+        return http_status, "unauth"
+    if "quota" in kinds:
+        return http_status, "quota"
+    return http_status, None
+
+
+# Syntactic key shapes. Keys that can't match are rejected before any network
+# call (saves a TLS round trip and a quota-counted request). OpenAI keys are
+# "sk-" plus an optional kind prefix ("proj-", "svcacct-", ...).
+_OPENAI_KEY_RE = re.compile(r"^sk-[A-Za-z0-9_-]{20,}$")
+_YC_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{30,}$")
+
+
+def _malformed_key_result(provider: str) -> TokenHealthResult:
+    """Result for a key that fails the syntactic check."""
+    return TokenHealthResult(
+        status="invalid",
+        message="✗ Malformed API key (not sent to the provider)",
+        debug_info={
+            "provider": provider,
+            "error": {
+                "type": "MalformedKey",
+                "message": "Key does not match the provider's key format",
+            },
+        },
+    )
+
+
+def _is_transient_openai_error(e: Exception) -> bool:
+    """Whether a failed OpenAI call is worth one more attempt."""
+    if isinstance(e, APITimeoutError):
+        # Already used up the check's time budget
+        return False
+    if isinstance(e, APIConnectionError):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for retry number attempt (0-based)."""
+    return (
+        HEALTH_CHECK_BACKOFF_SECONDS * (2 ** attempt)
+        + random.random() * HEALTH_CHECK_BACKOFF_JITTER_SECONDS
+    )
+
+
+def _sanitize_key(api_key: str) -> str:
+    """Remove whitespace and quotes around a pasted key."""
+    if api_key:
+        api_key = api_key.strip().strip("'").strip('"')
+    return api_key
+
+
+async def _cached_check(
+    provider: str,
+    api_key: str,
+    model: str,
+    capture_debug: bool,
+    probe: Callable[[], Awaitable[TokenHealthResult]],
+) -> TokenHealthResult:
+    """Return a fresh cached result for this key, or run the probe and cache it."""
+    # Debug and plain checks are cached apart, so a debug view never gets a
+    # result that was stored without its debug_info
+    cache_key = hashlib.sha256(
+        f"{provider}|{api_key}|{model}|{int(capture_debug)}".encode()
+    ).hexdigest()
+    now = time.monotonic()
+    cached = _HEALTH_CACHE.get(cache_key)
+    if cached is not None:
+        stored_at, result = cached
+        fresh_ok = result.status == "ok" and not result.stale
+        ttl = HEALTH_CACHE_TTL_OK_SECONDS if fresh_ok else HEALTH_CACHE_TTL_ERROR_SECONDS
+        if now - stored_at < ttl:
+            _HEALTH_CACHE.move_to_end(cache_key)
+            return result
+    
+    try:
+        result = await asyncio.wait_for(probe(), HEALTH_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"{provider} key test timed out after {HEALTH_CHECK_TIMEOUT}s")
+        result = TokenHealthResult(
+            status="error",
+            message=f"✗ Timed out after {HEALTH_CHECK_TIMEOUT:g}s",
+            raw_error="timeout",
+            transient=True,
+            debug_info={
+                "provider": provider,
+                "error": {
+                    "type": "TimeoutError",
+                    "message": f"No response within {HEALTH_CHECK_TIMEOUT}s",
+                },
+            },
+        )
+    result = _stale_while_error(cache_key, result)
+    _remember(_HEALTH_CACHE, cache_key, result)
+    return result
+
 
-async def test_openai_key(api_key: str, model: str = "gpt-4o-mini") -> TokenHealthResult:
+def _remember(
+    cache: "OrderedDict[str, tuple[float, TokenHealthResult]]",
+    cache_key: str,
+    result: TokenHealthResult,
+) -> None:
+    """Store a result in one of the bounded LRU caches."""
+    cache[cache_key] = (time.monotonic(), result)
+    cache.move_to_end(cache_key)
+    while len(cache) > HEALTH_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+
+def _stale_while_error(cache_key: str, result: TokenHealthResult) -> TokenHealthResult:
+    """Remember ok results; on a transient failure serve a recent ok one instead."""
+    if result.status == "ok":
+        _remember(_LAST_OK, cache_key, result)
+        return result
+    if not result.transient:
+        return result
+    last_ok = _LAST_OK.get(cache_key)
+    if last_ok is None or time.monotonic() - last_ok[0] >= HEALTH_MAX_STALE_SECONDS:
+        return result
+    
+    logger.warning(f"Serving last ok key check during upstream error: {result.message}")
+    debug_info = None
+    if last_ok[1].debug_info is not None:
+        debug_info = {**last_ok[1].debug_info, "stale": True, "upstream_error": result.raw_error}
+    return replace(
+        last_ok[1],
+        message="✓ (stale, upstream error) " + last_ok[1].message.removeprefix("✓ "),
+        raw_error=result.raw_error,
+        debug_info=debug_info,
+        stale=True,
+    )
+
+
+def clear_health_cache() -> None:
+    """Forget all cached check results."""
+    _HEALTH_CACHE.clear()
+    _LAST_OK.clear()
+
+
+async def test_openai_key(
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    *,
+    capture_debug: bool = False,
+    deep: bool = False,
+) -> TokenHealthResult:
     """
-    Test an OpenAI API key by making a minimal API call.
+    Test an OpenAI API key.
+    
+    By default this lists the account's models, which authenticates the key
+    without spending tokens. With deep=True it makes a 1-token chat
+    completion with `model` instead, to prove the key can actually generate.
+    
+    Malformed keys are reported as invalid without a request. Results are
+    cached briefly (see HEALTH_CACHE_TTL_OK_SECONDS).
     
     Args:
         api_key: The OpenAI API key to test
-        model: The model to use for the test (default: gpt-4o-mini)
+        model: The model to check (default: gpt-4o-mini)
+        capture_debug: Attach the full request/response as debug_info
+            (for the admin debug view; skipped for plain status checks)
+        deep: Make a real (billed) completion instead of listing models
         
     Returns:
-        TokenHealthResult with status, message, and full debug info
+        TokenHealthResult with status and message (plus debug info if requested)
     """
-    # Sanitize key: remove whitespace and quotes
-    if api_key:
-        api_key = api_key.strip().strip("'").strip('"')
+    api_key = _sanitize_key(api_key)
+    if not api_key or not _OPENAI_KEY_RE.match(api_key):
+        return _malformed_key_result("OpenAI")
+    return await _cached_check(
+        "openai", api_key, f"{model}|deep" if deep else model, capture_debug,
+        lambda: _probe_openai_key(api_key, model, capture_debug, deep),
+    )
 
-    debug_info = {
-        "provider": "OpenAI",
-        "test_time": datetime.utcnow().isoformat(),
-        "request": {
-            "url": "https://api.openai.com/v1/chat/completions",
-            "method": "POST",
-            "headers": {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key[:10]}..." if api_key else "None"
-            },
-            "body": {
-                "model": model,
-                "messages": [{"role": "system", "content": "ping"}],
-                "max_tokens": 1,
-                "temperature": 0
+async def _with_transient_retry(call: Callable[[], Awaitable[Any]]) -> Any:
+    """Await call(), retrying transient OpenAI failures after a short backoff."""
+    for attempt in range(HEALTH_CHECK_RETRIES + 1):
+        try:
+            return await call()
+        except (APIConnectionError, APIStatusError) as e:
+            if attempt < HEALTH_CHECK_RETRIES and _is_transient_openai_error(e):
+                logger.info(f"OpenAI key test transient failure, retrying: {e}")
+                await asyncio.sleep(_backoff_delay(attempt))
+                continue
+            raise
+
+async def _probe_openai_key(
+    api_key: str,
+    model: str,
+    capture_debug: bool,
+    deep: bool,
+) -> TokenHealthResult:
+    """Make the OpenAI request behind test_openai_key."""
+    debug_info = None
+    if capture_debug:
+        if deep:
+            request = {
+                "url": "https://api.openai.com/v1/chat/completions",
+                "method": "POST",
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {api_key[:10]}..." if api_key else "None"
+                },
+                "body": {
+                    "model": model,
+                    "messages": [{"role": "system", "content": "ping"}],
+                    "max_tokens": 1,
+                    "temperature": 0
+                }
             }
-        },
-        "response": None,
-        "http_status": None,
-        "error": None
-    }
+        else:
+            request = {
+                "url": "https://api.openai.com/v1/models",
+                "method": "GET",
+                "headers": {
+                    "Authorization": f"Bearer {api_key[:10]}..." if api_key else "None"
+                },
+            }
+        debug_info = {
+            "provider": "OpenAI",
+            "test_time_ns": time.time_ns(),
+            "request": request,
+            "response": None,
+            "http_status": None,
+            "error": None
+        }
     
     try:
-        from openai import AsyncOpenAI
-        import httpx
+        # A throwaway SDK client over the shared health-check connection pool:
+        # checks may try many keys, which must not evict the per-key clients
+        # the brain is using. Not closed, since that would close the pool too.
+        # The SDK's own retries would also retry 429s, so they're replaced by ours.
+        client = AsyncOpenAI(api_key=api_key, max_retries=0, http_client=get_health_client())
         
-        # Create client with the key
-        client = AsyncOpenAI(api_key=api_key)
+        if not deep:
+            # Listing models authenticates the key and costs no tokens
+            logger.info("Testing OpenAI key by listing models...")
+            models = await _with_transient_retry(
+                lambda: client.models.list(timeout=HEALTH_CHECK_TIMEOUT)
+            )
+            model_ids = {m.id for m in models.data}
+            if debug_info is not None:
+                debug_info["response"] = {
+                    "models_count": len(model_ids),
+                    "model_listed": model in model_ids,
+                }
+                debug_info["http_status"] = 200
+            
+            logger.info("OpenAI key test: SUCCESS")
+            availability = "" if model in model_ids else f" Note: {model} is not listed for this key."
+            return TokenHealthResult(
+                status="ok",
+                message=f"✓ Key is valid. Authenticated ({len(model_ids)} models available).{availability}",
+                debug_info=debug_info
+            )
         
         # Make a minimal test request
         logger.info("Testing OpenAI key with minimal request...")
-        completion = await client.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": "ping"}],
-            max_tokens=1,
-            temperature=0
+        completion = await _with_transient_retry(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": "ping"}],
+                max_tokens=1,
+                temperature=0,
+                timeout=HEALTH_CHECK_TIMEOUT,
+            )
         )
         
         # Capture response details
-        debug_info["response"] = {
-            "id": completion.id,
-            "object": completion.object,
-            "created": completion.created,
-            "model": completion.model,
-            "choices": [
-                {
-                    "index": c.index,
-                    "message": {
-                        "role": c.message.role,
-                        "content": c.message.content
-                    },
-                    "finish_reason": c.finish_reason
-                } for c in completion.choices
-            ],
-            "usage": {
-                "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
-                "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
-                "total_tokens": completion.usage.total_tokens if completion.usage else 0
+        if debug_info is not None:
+            debug_info["response"] = {
+                "id": completion.id,
+                "object": completion.object,
+                "created": completion.created,
+                "model": completion.model,
+                "choices": [
+                    {
+                        "index": c.index,
+                        "message": {
+                            "role": c.message.role,
+                            "content": c.message.content
+                        },
+                        "finish_reason": c.finish_reason
+                    } for c in completion.choices
+                ],
+                "usage": {
+                    "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
+                    "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
+                    "total_tokens": completion.usage.total_tokens if completion.usage else 0
+                }
             }
-        }
-        debug_info["http_status"] = 200
+            debug_info["http_status"] = 200
         
         # If we got here, the key works
         logger.info("OpenAI key test: SUCCESS")
@@ -103,164 +409,309 @@ async def test_openai_key(api_key: str, model: str = "gpt-4o-mini") -> TokenHeal
             debug_info=debug_info
         )
         
+    except AuthenticationError as e:
+        return _openai_failure(e, debug_info, e.status_code, "invalid")
+    except RateLimitError as e:
+        return _openai_failure(e, debug_info, e.status_code, "quota")
+    except APITimeoutError as e:
+        return _openai_failure(
+            e, debug_info, None, "error",
+            message=f"✗ Timed out after {HEALTH_CHECK_TIMEOUT:g}s",
+            transient=True,
+        )
+    except APIStatusError as e:
+        status = _OPENAI_STATUS_BY_CODE.get(e.status_code, "error")
+        return _openai_failure(
+            e, debug_info, e.status_code, status, transient=e.status_code >= 500
+        )
+    except APIConnectionError as e:
+        return _openai_failure(
+            e, debug_info, None, "error",
+            message=f"✗ Connection error: {str(e)[:100]}",
+            transient=True,
+        )
     except Exception as e:
-        error_str = str(e)
-        error_lower = error_str.lower()
-        
-        # Try to extract HTTP status if available
-        http_status = None
-        if hasattr(e, 'status_code'):
-            http_status = e.status_code
-        elif "401" in error_str:
-            http_status = 401
-        elif "429" in error_str:
-            http_status = 429
-        elif "500" in error_str or "503" in error_str:
-            http_status = int(error_str.split()[0]) if error_str.split()[0].isdigit() else 500
-        
+        # Not raised by the SDK's HTTP layer; fall back to reading the message
+        parsed_status, kind = _classify_openai_error(str(e))
+        status = {"unauth": "invalid", "quota": "quota"}.get(kind, "error")
+        return _openai_failure(e, debug_info, parsed_status, status)
+
+
+_OPENAI_STATUS_BY_CODE = {401: "invalid", 429: "quota"}
+
+_OPENAI_FAILURE_MESSAGES = {
+    "invalid": "✗ Invalid API key (HTTP 401 Unauthorized)",
+    "quota": "⚠ Rate limit exceeded or quota exhausted (HTTP 429)",
+}
+
+
+def _openai_failure(
+    e: Exception,
+    debug_info: dict[str, Any] | None,
+    http_status: int | None,
+    status: Literal["invalid", "quota", "error"],
+    message: str | None = None,
+    transient: bool = False,
+) -> TokenHealthResult:
+    """Record a failed OpenAI key test in debug_info and build its result."""
+    error_str = str(e)
+    if debug_info is not None:
         debug_info["http_status"] = http_status
         debug_info["error"] = {
             "type": type(e).__name__,
             "message": error_str,
             "details": repr(e)
         }
-        
-        logger.warning(f"OpenAI key test failed: {e}")
-        
-        # Parse error type
-        if "401" in error_lower or "invalid" in error_lower or "unauthorized" in error_lower:
-            return TokenHealthResult(
-                status="invalid",
-                message="✗ Invalid API key (HTTP 401 Unauthorized)",
-                raw_error=error_str,
-                debug_info=debug_info
-            )
-        elif "429" in error_lower or "quota" in error_lower or "rate limit" in error_lower:
-            return TokenHealthResult(
-                status="quota",
-                message="⚠ Rate limit exceeded or quota exhausted (HTTP 429)",
-                raw_error=error_str,
-                debug_info=debug_info
-            )
-        else:
-            return TokenHealthResult(
-                status="error",
-                message=f"✗ Unexpected error: {error_str[:100]}",
-                raw_error=error_str,
-                debug_info=debug_info
-            )
+    
+    logger.warning(f"OpenAI key test failed: {e}")
+    
+    if message is None:
+        message = _OPENAI_FAILURE_MESSAGES.get(status) or f"✗ Unexpected error: {error_str[:100]}"
+    return TokenHealthResult(
+        status=status,
+        message=message,
+        raw_error=error_str,
+        debug_info=debug_info,
+        transient=transient,
+    )
 
-async def test_yandex_speechkit_key(api_key: str) -> TokenHealthResult:
+async def test_yandex_speechkit_key(
+    api_key: str,
+    *,
+    capture_debug: bool = False,
+) -> TokenHealthResult:
     """
-    Test a Yandex SpeechKit API key using the REST API (TTS).
+    Test a Yandex SpeechKit API key with an auth-only TTS request.
+    
+    Malformed keys are reported as invalid without a request. Results are
+    cached briefly (see HEALTH_CACHE_TTL_OK_SECONDS).
     
     Args:
         api_key: The Yandex API key to test
+        capture_debug: Attach the full request/response as debug_info
         
     Returns:
-        TokenHealthResult with status, message, and full debug info
+        TokenHealthResult with status and message (plus debug info if requested)
     """
-    # Sanitize key
-    if api_key:
-        api_key = api_key.strip().strip("'").strip('"')
+    api_key = _sanitize_key(api_key)
+    if not api_key or not _YC_KEY_RE.match(api_key):
+        return _malformed_key_result("Yandex SpeechKit")
+    return await _cached_check(
+        "yandex_speechkit", api_key, "", capture_debug,
+        lambda: _probe_yandex_speechkit_key(api_key, capture_debug),
+    )
 
+async def _probe_yandex_speechkit_key(api_key: str, capture_debug: bool) -> TokenHealthResult:
+    """Make the auth-only TTS request behind test_yandex_speechkit_key.
+    
+    The request carries empty text, so nothing is synthesized or billed.
+    SpeechKit authenticates before validating the body: a bad key gets 401,
+    while an accepted key gets 400 for the empty text.
+    """
     url = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
     headers = {
         "Authorization": f"Api-Key {api_key}"
     }
     data = {
-        "text": "test",
+        "text": "",
         "lang": "ru-RU",
         "voice": "alena"
     }
     
     # Prepare debug info structure
-    debug_info = {
-        "provider": "Yandex SpeechKit",
-        "test_time": datetime.utcnow().isoformat(),
-        "request": {
-            "url": url,
-            "method": "POST",
-            "headers": {
-                "Authorization": f"Api-Key {api_key[:8]}..." if api_key else "None",
-                "Content-Type": "application/x-www-form-urlencoded"
+    debug_info = None
+    if capture_debug:
+        debug_info = {
+            "provider": "Yandex SpeechKit",
+            "test_time_ns": time.time_ns(),
+            "request": {
+                "url": url,
+                "method": "POST",
+                "headers": {
+                    "Authorization": f"Api-Key {api_key[:8]}..." if api_key else "None",
+                    "Content-Type": "application/x-www-form-urlencoded"
+                },
+                "body": data
             },
-            "body": data
-        },
-        "response": None,
-        "http_status": None,
-        "error": None
-    }
+            "response": None,
+            "http_status": None,
+            "error": None
+        }
 
     try:
-        import httpx
-        
         logger.info("Testing Yandex SpeechKit API key...")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, data=data)
-            
+        # Shared pooled client (reuses keep-alive connections)
+        client = get_health_client()
+        response = await client.post(url, headers=headers, data=data)
+        
+        if debug_info is not None:
             debug_info["http_status"] = response.status_code
-            
-            # For success (audio), we don't want to log the binary body
-            if response.status_code == 200:
+        
+        # 400 = authenticated, empty text rejected (the expected outcome);
+        # 200 only if the API ever starts accepting empty text.
+        if response.status_code in (200, 400):
+            if debug_info is not None:
                 debug_info["response"] = {
                     "content_type": response.headers.get("content-type"),
                     "size_bytes": len(response.content),
-                    "message": "Audio data received successfully"
+                    "message": "Key authenticated (empty-text probe, no audio synthesized)"
                 }
-                
-                logger.info("Yandex key test: SUCCESS")
-                return TokenHealthResult(
-                    status="ok",
-                    message="✓ Key is valid. TTS request succeeded.",
-                    debug_info=debug_info
-                )
+            
+            logger.info("Yandex key test: SUCCESS")
+            return TokenHealthResult(
+                status="ok",
+                message=f"✓ Key is valid. Authenticated (auth-only probe, HTTP {response.status_code}).",
+                debug_info=debug_info
+            )
+        else:
+            # Try to parse error JSON if possible
+            try:
+                error_json = response.json()
+                error_msg = error_json.get("error_message", response.text)
+            except:
+                error_json = response.text
+                error_msg = response.text
+            if debug_info is not None:
+                debug_info["response"] = error_json
+
+            logger.warning(f"Yandex key test failed: HTTP {response.status_code} - {error_msg}")
+            
+            status = "error"
+            if response.status_code == 401:
+                status = "invalid"
+                msg = "✗ Invalid API key (HTTP 401 Unauthorized)"
+            elif response.status_code == 429:
+                status = "quota"
+                msg = "⚠ Rate limit exceeded (HTTP 429)"
             else:
-                # Try to parse error JSON if possible
-                try:
-                    error_json = response.json()
-                    debug_info["response"] = error_json
-                    error_msg = error_json.get("error_message", response.text)
-                except:
-                    debug_info["response"] = response.text
-                    error_msg = response.text
-
-                logger.warning(f"Yandex key test failed: HTTP {response.status_code} - {error_msg}")
-                
-                status = "error"
-                if response.status_code == 401:
-                    status = "invalid"
-                    msg = "✗ Invalid API key (HTTP 401 Unauthorized)"
-                elif response.status_code == 429:
-                    status = "quota"
-                    msg = "⚠ Rate limit exceeded (HTTP 429)"
-                else:
-                    msg = f"✗ Error: HTTP {response.status_code}"
-
-                return TokenHealthResult(
-                    status=status,
-                    message=msg,
-                    raw_error=error_msg,
-                    debug_info=debug_info
-                )
+                msg = f"✗ Error: HTTP {response.status_code}"
+
+            return TokenHealthResult(
+                status=status,
+                message=msg,
+                raw_error=error_msg,
+                debug_info=debug_info,
+                transient=response.status_code >= 500,
+            )
 
     except Exception as e:
         error_str = str(e)
         logger.error(f"Yandex key test exception: {e}")
         
-        debug_info["error"] = {
-            "type": type(e).__name__,
-            "message": error_str
-        }
+        if debug_info is not None:
+            debug_info["error"] = {
+                "type": type(e).__name__,
+                "message": error_str
+            }
         
         return TokenHealthResult(
             status="error",
             message=f"✗ Connection error: {error_str[:100]}",
             raw_error=error_str,
-            debug_info=debug_info
+            debug_info=debug_info,
+            transient=True,
         )
 
+PROVIDERS = ("openai", "yandex_speechkit")
+
+# Cap on provider requests in flight for one batch of checks, so checking many
+# keys at once doesn't rate-limit ourselves at the provider
+CHECK_CONCURRENCY = 8
+
+
+def _provider_check(
+    provider: str,
+    api_key: str,
+    model: str,
+    capture_debug: bool,
+) -> Awaitable[TokenHealthResult]:
+    """The health check coroutine for one provider's key."""
+    if provider == "openai":
+        return test_openai_key(api_key, model=model, capture_debug=capture_debug)
+    return test_yandex_speechkit_key(api_key, capture_debug=capture_debug)
+
+
+async def check_many(
+    keys: list[tuple[str, str]],
+    model: str = "gpt-4o-mini",
+    *,
+    concurrency: int = CHECK_CONCURRENCY,
+    capture_debug: bool = False,
+) -> AsyncIterator[tuple[int, TokenHealthResult]]:
+    """
+    Test many (provider, api_key) pairs, yielding results as they complete.
+    
+    At most `concurrency` checks run at once, and a slow provider doesn't
+    hold back results that are already in.
+    
+    Args:
+        keys: (provider name, API key) pairs; unknown providers are skipped
+        model: The OpenAI model to use for its tests
+        concurrency: Maximum number of checks in flight
+        capture_debug: Attach each check's request/response as debug_info
+        
+    Yields:
+        (index into keys, TokenHealthResult) in completion order; a probe
+        that raised is reported as an "error" result
+    """
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def bound(index: int, provider: str, api_key: str) -> tuple[int, TokenHealthResult]:
+        async with sem:
+            try:
+                return index, await _provider_check(provider, api_key, model, capture_debug)
+            except Exception as e:
+                logger.error(f"{provider} key check raised: {e}")
+                return index, TokenHealthResult(
+                    status="error",
+                    message=f"✗ Unexpected error: {str(e)[:100]}",
+                    raw_error=str(e),
+                )
+    
+    tasks = [
+        asyncio.create_task(bound(index, provider, api_key))
+        for index, (provider, api_key) in enumerate(keys)
+        if provider in PROVIDERS
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer stopped early (e.g. client disconnected): drop the rest
+        for task in tasks:
+            task.cancel()
+
+
+async def check_all_tokens(
+    keys: dict[str, str],
+    model: str = "gpt-4o-mini",
+    *,
+    capture_debug: bool = False,
+) -> dict[str, TokenHealthResult]:
+    """
+    Test several providers' keys concurrently.
+    
+    Args:
+        keys: Provider name ("openai", "yandex_speechkit") -> API key
+        model: The OpenAI model to use for its test
+        capture_debug: Attach each check's request/response as debug_info
+        
+    Returns:
+        Provider name -> TokenHealthResult; a probe that raised is reported
+        as an "error" result instead of failing the whole check
+    """
+    pairs = list(keys.items())
+    results: dict[str, TokenHealthResult] = {}
+    async for index, result in check_many(pairs, model, capture_debug=capture_debug):
+        results[pairs[index][0]] = result
+    return results
+
+# Masking prefix source, sliced to length instead of building "*" * n per call
+# (grown if a longer key ever shows up)
+_STARS = "*" * 128
+
+
 def mask_api_key(key: str | None) -> str:
     """
     Mask an API key for display, showing only the last 4 characters.
@@ -271,8 +722,12 @@ def mask_api_key(key: str | None) -> str:
     Returns:
         Masked key string like "********abcd" or "Not set"
     """
+    global _STARS
     if not key:
         return "Not set"
-    if len(key) <= 4:
+    n = len(key)
+    if n <= 4:
         return "****"
-    return "*" * (len(key) - 4) + key[-4:]
+    if n - 4 > len(_STARS):
+        _STARS = "*" * (n - 4)
+    return _STARS[:n - 4] + key[-4:]
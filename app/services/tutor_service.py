@@ -1,12 +1,35 @@
+import functools
 import json
-from typing import Optional
+import os
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+from sqlalchemy import JSON, and_, case, cast, func, lambda_stmt, or_
 from sqlmodel import Session, select
+from app.database import no_expire_on_commit
 from app.models import (
     UserProfile, UserState, TutorSystemRule, SessionSummary, TutorRule, 
     LessonSession, LessonPauseEvent, TutorLesson, TutorStudentKnowledge
 )
 
 
+# Profiles are re-read on every turn but their preferences string rarely changes,
+# so the parsed dict is memoized on the raw JSON text.
+PREFERENCES_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=PREFERENCES_CACHE_SIZE)
+def _parse_preferences(raw: Optional[str]) -> dict:
+    """Parsed UserProfile.preferences; shared between callers, so treat as read-only."""
+    try:
+        prefs = json.loads(raw or "{}")
+    except Exception:
+        return {}
+    return prefs if isinstance(prefs, dict) else {}
+
+
 def get_or_create_student_knowledge(session: Session, user_id: int) -> TutorStudentKnowledge:
     """Get or create student knowledge record."""
     knowledge = session.get(TutorStudentKnowledge, user_id)
@@ -17,27 +40,21 @@ def get_or_create_student_knowledge(session: Session, user_id: int) -> TutorStud
             lesson_count=0,
             first_lesson_completed=False
         )
-        session.add(knowledge)
-        session.commit()
-        session.refresh(knowledge)
+        with no_expire_on_commit(session):
+            session.add(knowledge)
+            session.commit()
     return knowledge
 
 
 def get_next_lesson_number(session: Session, user_id: int) -> int:
     """Get the next lesson number for a user."""
-    # Check for existing lessons
-    statement = (
-        select(TutorLesson)
+    # Highest existing number as a single scalar (0 when there are no lessons);
+    # served from the (user_id, lesson_number) index
+    last_number = session.exec(
+        select(func.coalesce(func.max(TutorLesson.lesson_number), 0))
         .where(TutorLesson.user_id == user_id)
-        .order_by(TutorLesson.lesson_number.desc())
-        .limit(1)
-    )
-    last_lesson = session.exec(statement).first()
-    
-    if last_lesson:
-        return last_lesson.lesson_number + 1
-    else:
-        return 1
+    ).one()
+    return last_number + 1
 
 
 def is_first_lesson(session: Session, user_id: int) -> bool:
@@ -63,27 +80,47 @@ def create_tutor_lesson(
         placement_test_run=False,
         legacy_session_id=legacy_session_id
     )
-    session.add(lesson)
-    session.commit()
-    session.refresh(lesson)
+    with no_expire_on_commit(session):
+        session.add(lesson)
+        session.commit()
     return lesson
 
 def get_tutor_memory_for_user(session: Session, user_id: int) -> dict:
-    # Get UserState
-    user_state = session.exec(select(UserState).where(UserState.user_id == user_id)).first()
-    
-    # Get last session summary
-    last_summary = session.exec(
-        select(SessionSummary)
-        .where(SessionSummary.user_account_id == user_state.user_account_id)
+    # UserState and its most recent session summary in a single round trip.
+    # A correlated subquery works on both PostgreSQL and SQLite (no LATERAL),
+    # and unlike an outer join + ORDER BY/LIMIT it only sorts the summaries.
+    # Only the columns the memory needs are selected, so no ORM object is built
+    # and there is nothing to lazy-load or refresh after an expiring commit.
+    # known_words can grow into the thousands and only its length is needed,
+    # so the count is computed in the database instead of shipping the list.
+    if session.get_bind().dialect.name == "postgresql":
+        known_words_count = func.json_array_length(cast(UserState.known_words_json, JSON))
+    else:
+        known_words_count = func.json_array_length(UserState.known_words_json)
+    last_summary_text = (
+        select(SessionSummary.summary_text)
+        .where(SessionSummary.user_account_id == UserState.user_account_id)
         .order_by(SessionSummary.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = session.exec(
+        select(
+            UserState.weak_words_json,
+            func.coalesce(known_words_count, 0),
+            UserState.xp_points,
+            last_summary_text,
+        ).where(UserState.user_id == user_id)
     ).first()
+    if row is None:
+        return {"weak_words": [], "known_words_count": 0, "xp": 0, "last_summary": None}
 
+    weak_words_json, known_words_count, xp_points, last_summary = row
     memory = {
-        "weak_words": user_state.weak_words if user_state else [],
-        "known_words_count": len(user_state.known_words) if user_state else 0,
-        "xp": user_state.xp_points if user_state else 0,
-        "last_summary": last_summary.summary_text if last_summary else None
+        "weak_words": json.loads(weak_words_json),
+        "known_words_count": known_words_count,
+        "xp": xp_points,
+        "last_summary": last_summary
     }
     return memory
 
@@ -91,9 +128,12 @@ def should_run_intro_session(
     session: Session,
     user: Optional[UserProfile],
     lesson_session_id: Optional[int],
+    prefs: Optional[dict] = None,
 ) -> bool:
     """Determine whether this lesson should run the onboarding intro flow.
 
+    `prefs` is the already parsed user.preferences, if the caller has it.
+
     Current policy (v1):
     - If there is no UserProfile or no lesson_session_id → do NOT run intro.
     - If `preferences.intro.intro_completed` is True → intro уже пройден, не запускать.
@@ -106,11 +146,8 @@ def should_run_intro_session(
     if not user or not lesson_session_id:
         return False
 
-    # Parse preferences safely
-    try:
-        prefs = json.loads(user.preferences)
-    except Exception:
-        prefs = {}
+    if prefs is None:
+        prefs = _parse_preferences(user.preferences)
 
     intro = prefs.get("intro") or {}
     if intro.get("intro_completed"):
@@ -119,39 +156,52 @@ def should_run_intro_session(
     # Intro not completed yet → run onboarding
     return True
 
-def build_intro_system_prompt(user: UserProfile) -> str:
+# Intro facts echoed back into the onboarding prompt, in prompt order:
+# (preferences.intro key, value is a list joined with ", ", keep falsy values
+# such as a level of 0)
+_INTRO_FIELDS = (
+    ("tutor_name", False, False),
+    ("student_name", False, False),
+    ("addressing_mode", False, False),
+    ("english_level_scale_1_10", False, True),
+    ("goals", True, False),
+    ("topics_interest", True, False),
+    ("correction_style", False, False),
+    ("native_language", False, False),
+    ("other_languages", True, False),
+)
+
+
+def build_intro_system_prompt(user: UserProfile, prefs: Optional[dict] = None) -> str:
     """Build system prompt for the very first onboarding/intro session.
 
     This prompt is significantly smaller than the generic one and is focused on
     collecting stable profile data via [PROFILE_UPDATE] JSON markers.
+    `prefs` is the already parsed user.preferences, if the caller has it.
     """
     display_name = user.name or "Student"
-    known_info_block = ""
-    try:
-        prefs = json.loads(user.preferences or "{}")
-    except Exception:
-        prefs = {}
+    if prefs is None:
+        prefs = _parse_preferences(user.preferences)
     intro = prefs.get("intro") or {}
     known_items = []
-    if intro.get("tutor_name"):
-        known_items.append(f"tutor_name: {intro.get('tutor_name')}")
-    if intro.get("student_name"):
-        known_items.append(f"student_name: {intro.get('student_name')}")
-    if intro.get("addressing_mode"):
-        known_items.append(f"addressing_mode: {intro.get('addressing_mode')}")
-    if intro.get("english_level_scale_1_10") is not None:
-        known_items.append(f"english_level_scale_1_10: {intro.get('english_level_scale_1_10')}")
-    if intro.get("goals"):
-        known_items.append(f"goals: {', '.join(intro.get('goals', []))}")
-    if intro.get("topics_interest"):
-        known_items.append(f"topics_interest: {', '.join(intro.get('topics_interest', []))}")
-    if intro.get("correction_style"):
-        known_items.append(f"correction_style: {intro.get('correction_style')}")
-    if intro.get("native_language"):
-        known_items.append(f"native_language: {intro.get('native_language')}")
-    if intro.get("other_languages"):
-        known_items.append(f"other_languages: {', '.join(intro.get('other_languages', []))}")
+    for key, is_list, keep_falsy in _INTRO_FIELDS:
+        value = intro.get(key)
+        if value is None or not (value or keep_falsy):
+            continue
+        known_items.append(f"{key}: {', '.join(value) if is_list else value}")
+
+    return _build_intro_prompt_cached(display_name, tuple(known_items))
 
+
+# The intro prompt only depends on the name and the intro facts already known,
+# which repeat turn after turn during onboarding, so built prompts are memoized.
+INTRO_PROMPT_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=INTRO_PROMPT_CACHE_SIZE)
+def _build_intro_prompt_cached(display_name: str, known_items: Tuple[str, ...]) -> str:
+    """Onboarding prompt text for a display name and the known intro facts."""
+    known_info_block = ""
     if known_items:
         known_info_block = "\nKnown intro info (do NOT ask again unless missing):\n- " + "\n- ".join(known_items) + "\n"
 
@@ -326,6 +376,161 @@ Throughout this onboarding:
 """
     return prompt
 
+
+# Legacy TutorSystemRule texts change at admin-edit frequency, so they are kept
+# in-process and only reloaded after bump_rules_version() or once the TTL lapses
+# (the TTL lets other workers pick up edits made through a different process).
+RULES_CACHE_TTL_SECONDS = 60
+
+_RULES_VERSION = 0
+# (rules version, loaded at monotonic time, enabled rule texts in sort order)
+_RULES_CACHE: Optional[Tuple[int, float, Tuple[str, ...]]] = None
+
+
+def bump_rules_version() -> None:
+    """Mark cached system rules (and prompts built from them) as stale."""
+    global _RULES_VERSION
+    _RULES_VERSION += 1
+    invalidate_tutor_prompt()
+
+
+def _get_system_rule_texts(session: Session) -> Tuple[str, ...]:
+    """Enabled legacy system rule texts, served from the in-process cache."""
+    global _RULES_CACHE
+    now = time.monotonic()
+    cached = _RULES_CACHE
+    if (
+        cached is not None
+        and cached[0] == _RULES_VERSION
+        and now - cached[1] < RULES_CACHE_TTL_SECONDS
+    ):
+        return cached[2]
+
+    version = _RULES_VERSION
+    texts = tuple(
+        session.exec(
+            select(TutorSystemRule.rule_text)
+            .where(TutorSystemRule.enabled == True)
+            .order_by(TutorSystemRule.sort_order)
+        ).all()
+    )
+    _RULES_CACHE = (version, now, texts)
+    return texts
+
+
+# Built tutor prompts, reused while nothing they read has changed. Each lookup
+# is validated by a one-query data-version probe (see _tutor_prompt_version).
+TUTOR_PROMPT_CACHE_MAX_ENTRIES = 512
+
+# (profile id, lesson_session_id, is_resume) -> (version, prompt)
+_TUTOR_PROMPT_CACHE: "OrderedDict[Tuple, Tuple[Tuple, str]]" = OrderedDict()
+# Bumped by invalidate_tutor_prompt() to drop every cached prompt at once
+_tutor_prompt_generation = 0
+
+
+# Prompts already built during the current HTTP request, keyed on the profile
+# fields as well, so a request that edits preferences gets a fresh prompt. Lets
+# repeated builds in one request skip even the version probe. Unset (None)
+# outside tutor_prompt_request_cache(), e.g. on long-lived websockets.
+_REQUEST_PROMPT_CACHE: ContextVar[Optional[dict]] = ContextVar(
+    "tutor_prompt_request_cache", default=None
+)
+
+
+@contextmanager
+def tutor_prompt_request_cache() -> Iterator[None]:
+    """Share built tutor prompts for the rest of the current request."""
+    token = _REQUEST_PROMPT_CACHE.set({})
+    try:
+        yield
+    finally:
+        _REQUEST_PROMPT_CACHE.reset(token)
+
+
+def invalidate_tutor_prompt(user_id: Optional[int] = None) -> None:
+    """Drop cached tutor prompts for one profile (or everyone if no id is given)."""
+    global _tutor_prompt_generation
+    request_cache = _REQUEST_PROMPT_CACHE.get()
+    if user_id is None:
+        _tutor_prompt_generation += 1
+        _TUTOR_PROMPT_CACHE.clear()
+        if request_cache is not None:
+            request_cache.clear()
+        return
+    for key in [k for k in _TUTOR_PROMPT_CACHE if k[0] == user_id]:
+        _TUTOR_PROMPT_CACHE.pop(key, None)
+    if request_cache is not None:
+        for key in [k for k in request_cache if k[0] == user_id]:
+            request_cache.pop(key, None)
+
+
+def _tutor_prompt_version(
+    session: Session,
+    user: UserProfile,
+    lesson_session_id: Optional[int],
+    system_rule_texts: Tuple[str, ...],
+) -> Tuple:
+    """Fingerprint of everything build_tutor_system_prompt reads, in one round trip."""
+    # This probe runs on every build, cache hit or not, so it is a lambda_stmt:
+    # the statement is constructed and compiled once per code path and later
+    # calls only supply new parameter values. The per-account comparisons are
+    # built outside the lambdas so a missing account still renders IS NULL.
+    profile_id = user.id
+    student_rules = TutorRule.applies_to_student_id == user.user_account_id
+    student_summaries = SessionSummary.user_account_id == user.user_account_id
+
+    stmt = lambda_stmt(
+        lambda: select(
+            select(func.max(TutorRule.updated_at))
+            .where(or_(TutorRule.scope == "global", TutorRule.scope == "session", student_rules))
+            .scalar_subquery(),
+            # Count catches deleted or deactivated rules, which may leave updated_at as is
+            select(func.count(TutorRule.id))
+            .where(
+                or_(TutorRule.scope == "global", TutorRule.scope == "session", student_rules),
+                TutorRule.is_active == True,
+            )
+            .scalar_subquery(),
+            select(func.max(SessionSummary.id)).where(student_summaries).scalar_subquery(),
+            # UserState has no updated_at; its word lists are compared directly
+            select(UserState.weak_words_json)
+            .where(UserState.user_id == profile_id)
+            .limit(1)
+            .scalar_subquery(),
+            select(func.length(UserState.known_words_json))
+            .where(UserState.user_id == profile_id)
+            .limit(1)
+            .scalar_subquery(),
+        )
+    )
+    if lesson_session_id:
+        stmt += lambda s: s.add_columns(
+            select(LessonSession.language_mode)
+            .where(LessonSession.id == lesson_session_id)
+            .scalar_subquery(),
+            select(LessonSession.language_level)
+            .where(LessonSession.id == lesson_session_id)
+            .scalar_subquery(),
+            select(func.count(LessonPauseEvent.id))
+            .where(LessonPauseEvent.lesson_session_id == lesson_session_id)
+            .scalar_subquery(),
+            select(LessonPauseEvent.summary_text)
+            .where(LessonPauseEvent.lesson_session_id == lesson_session_id)
+            .order_by(LessonPauseEvent.paused_at.desc())
+            .limit(1)
+            .scalar_subquery(),
+        )
+    row = session.exec(stmt).first()
+    return (
+        _tutor_prompt_generation,
+        system_rule_texts,
+        user.name,
+        user.english_level,
+        user.preferences,
+        tuple(row) if row else (),
+    )
+
+
 def build_tutor_system_prompt(
     session: Session,
     user: UserProfile,
@@ -335,6 +540,10 @@ def build_tutor_system_prompt(
     """
     Build the system prompt for the AI tutor.
     
+    The built prompt is cached per (profile, lesson, resume) and reused as long
+    as the rules, memory, lesson and profile it was built from are unchanged.
+    Inside tutor_prompt_request_cache() repeated builds skip that check too.
+    
     Args:
         session: Database session
         user: User profile
@@ -346,88 +555,74 @@ def build_tutor_system_prompt(
     if not user:
         return "You are an English tutor. The user profile could not be loaded, so please be polite and ask for their name."
 
+    request_cache = _REQUEST_PROMPT_CACHE.get()
+    request_key = (
+        user.id, lesson_session_id, is_resume,
+        user.name, user.english_level, user.preferences,
+    )
+    if request_cache is not None and request_key in request_cache:
+        return request_cache[request_key]
+
+    prompt = _build_tutor_system_prompt_versioned(session, user, lesson_session_id, is_resume)
+    if request_cache is not None:
+        request_cache[request_key] = prompt
+    return prompt
+
+
+def _build_tutor_system_prompt_versioned(
+    session: Session,
+    user: UserProfile,
+    lesson_session_id: Optional[int],
+    is_resume: bool,
+) -> str:
+    """Intro prompt or tutor prompt, the latter through the version-checked cache."""
+    # Parsed once here and handed to every step below
+    prefs = _parse_preferences(user.preferences)
+
     # If this is the student's very first lesson and intro is not yet completed,
     # use the dedicated onboarding prompt instead of the big generic one.
-    if should_run_intro_session(session, user, lesson_session_id):
-        return build_intro_system_prompt(user)
-
-    # 1. Fetch Legacy System Rules (backward compatibility)
-    legacy_rules = session.exec(
-        select(TutorSystemRule)
-        .where(TutorSystemRule.enabled == True)
-        .order_by(TutorSystemRule.sort_order)
-    ).all()
-    
-    # 2. Fetch New TutorRule (active, global + student-specific + session-scoped)
-    new_rules_statement = select(TutorRule).where(TutorRule.is_active == True)
-    
-    # Get global rules
-    global_rules = session.exec(
-        new_rules_statement.where(TutorRule.scope == "global")
-        .order_by(TutorRule.priority)
-    ).all()
-    
-    # Get student-specific rules
-    student_rules = session.exec(
-        new_rules_statement
-        .where(TutorRule.scope == "student")
-        .where(TutorRule.applies_to_student_id == user.user_account_id)
-        .order_by(TutorRule.priority)
-    ).all()
-    
-    # Get session-scoped rules (if lesson_session_id provided)
-    session_rules = []
-    if lesson_session_id:
-        session_rules = session.exec(
-            new_rules_statement
-            .where(TutorRule.scope == "session")
-            .order_by(TutorRule.priority)
-        ).all()
-    
-    # Combine all new rules
-    all_new_rules = list(global_rules) + list(student_rules) + list(session_rules)
-    
-    # 3. Fetch Language Mode and pause metadata (if lesson_session_id provided)
-    language_mode = None
-    language_level = None
-    pause_count = 0
-    last_pause_summary: Optional[str] = None
-    if lesson_session_id:
-        lesson = session.get(LessonSession, lesson_session_id)
-        if lesson:
-            language_mode = lesson.language_mode
-            language_level = lesson.language_level
-
-            # Pause metadata is stored in LessonPauseEvent to avoid altering the existing lesson_sessions schema.
-            pause_events = session.exec(
-                select(LessonPauseEvent)
-                .where(LessonPauseEvent.lesson_session_id == lesson_session_id)
-                .order_by(LessonPauseEvent.paused_at)
-            ).all()
-            pause_count = len(pause_events)
-            if pause_events:
-                last_event = pause_events[-1]
-                last_pause_summary = last_event.summary_text
-    
-    # 4. Fetch User Preferences
+    if should_run_intro_session(session, user, lesson_session_id, prefs):
+        return build_intro_system_prompt(user, prefs)
+
+    system_rule_texts = _get_system_rule_texts(session)
+    cache_key = (user.id, lesson_session_id, is_resume)
+    version = _tutor_prompt_version(session, user, lesson_session_id, system_rule_texts)
+    cached = _TUTOR_PROMPT_CACHE.get(cache_key)
+    if cached is not None and cached[0] == version:
+        _TUTOR_PROMPT_CACHE.move_to_end(cache_key)
+        return cached[1]
+
+    prompt = _build_tutor_system_prompt_uncached(
+        session, user, lesson_session_id, is_resume, system_rule_texts, prefs
+    )
+    _TUTOR_PROMPT_CACHE[cache_key] = (version, prompt)
+    _TUTOR_PROMPT_CACHE.move_to_end(cache_key)
+    while len(_TUTOR_PROMPT_CACHE) > TUTOR_PROMPT_CACHE_MAX_ENTRIES:
+        _TUTOR_PROMPT_CACHE.popitem(last=False)
+    return prompt
+
+
+# TutorRule.action / trigger_condition are admin-edited JSON that changes
+# rarely and repeats across rules, so parsing is memoized on the raw text.
+RULE_JSON_CACHE_SIZE = 2048
+_INVALID_RULE_JSON = object()
+
+
+@functools.lru_cache(maxsize=RULE_JSON_CACHE_SIZE)
+def _parse_rule_json(raw: Optional[str]):
+    """Parsed rule JSON, or _INVALID_RULE_JSON if empty or malformed; treat as read-only."""
+    if not raw:
+        return _INVALID_RULE_JSON
     try:
-        prefs = json.loads(user.preferences)
+        return json.loads(raw)
     except Exception:
-        prefs = {}
-    preferred_address = prefs.get("preferred_address")
-    intro_prefs = prefs.get("intro") or {}
-    
-    # 5. Fetch Memory
-    memory = get_tutor_memory_for_user(session, user.id)
-    
-    # 6. Construct Prompt
-    prompt_parts = []
-    
-    # Base Identity
-    prompt_parts.append("You are a personal English tutor for a Russian-speaking student.")
+        return _INVALID_RULE_JSON
+
+
+# Static sections of the tutor prompt (see _build_tutor_system_prompt_uncached).
+# Each is spliced in after a literal "\\n" section separator.
 
-    # --- UNIVERSAL GREETING PROTOCOL ---
-    prompt_parts.append("""
+_UNIVERSAL_GREETING_PROTOCOL = """
 \\n**🚀 UNIVERSAL GREETING PROTOCOL (STRICT):**
 When the lesson starts (first interaction), you MUST follow this sequence:
 1. **Greet briefly**: Use the student's name if known. Be warm but concise.
@@ -441,14 +636,9 @@ When the lesson starts (first interaction), you MUST follow this sequence:
 - NEVER ask: "What is your plan for today?"
 - NEVER ask: "Shall we start?" (Just start!)
 - NEVER say: "I am ready to help you." (Just help!)
-""")
-    
-    # --- LANGUAGE MODE SECTION (CRITICAL) ---
-    prompt_parts.append("\\n**🗣️ LANGUAGE MODE FOR THIS SESSION:**")
-    
-    if language_mode is None and lesson_session_id:
-        # Language mode not set - must ask at the start
-        prompt_parts.append("""
+"""
+
+_FIRST_INTERACTION_LANGUAGE_SELECT = """
 **⚠️ FIRST INTERACTION - LANGUAGE SELECTION REQUIRED:**
 
 This is the student's FIRST message in this session. You MUST:
@@ -475,9 +665,9 @@ This is the student's FIRST message in this session. You MUST:
 6. **Confirm their choice warmly** and begin the lesson in that mode.
 
 **This language selection happens ONLY ONCE per session.**
-""")
-    elif language_mode == "EN_ONLY":
-        prompt_parts.append("""
+"""
+
+_MODE_EN_ONLY = """
 **Mode: English Only** 🇬🇧
 
 - Speak 95%+ in English
@@ -485,9 +675,9 @@ This is the student's FIRST message in this session. You MUST:
 - Use Russian ONLY for critical clarifications if student is completely stuck
 - Praise English usage: "Great job speaking English!"
 - Gently encourage: "Try to answer in English, you can do it!"
-""")
-    elif language_mode == "RU_ONLY":
-        prompt_parts.append("""
+"""
+
+_MODE_RU_ONLY = """
 **Mode: Russian Only** 🇷🇺
 
 - Explain concepts and give instructions in Russian
@@ -495,10 +685,10 @@ This is the student's FIRST message in this session. You MUST:
 - Practice pronunciation of English words
 - Keep all feedback and meta-commentary in Russian
 - Example: "Давай выучим слово 'app le' - это 'яблоко'. Repeat after me: apple."
-""")
-    elif language_mode == "MIXED":
-        level_desc = f" (Level {language_level}/5)" if language_level else ""
-        prompt_parts.append(f"""
+"""
+
+# Filled in with .format(level_desc=...)
+_MODE_MIXED_TEMPLATE = """
 **Mode: Mixed (Adaptive)**{level_desc} 🌐
 
 - Balance Russian and English based on student comfort
@@ -509,92 +699,241 @@ This is the student's FIRST message in this session. You MUST:
 - After ~5-10 minutes of success, offer upgrade:
   "Как ты себя чувствуешь? Хочешь попробовать чуть больше английского? Если что, всегда можно вернуться на русский!"
 - If student agrees, mark: `[LANGUAGE_LEVEL_UP]` and increase English
-""")
+"""
+
+_RESUMED_LESSON_BEHAVIOR = """\n**⏸️ RESUMED LESSON BEHAVIOR (AFTER A BREAK):**
+- The student has come back to the SAME lesson after a pause.
+- In your VERY NEXT MESSAGE you MUST:
+  1) Start with a very short "welcome back" style greeting (1–2 short sentences).
+  2) If you have a pause summary, briefly remind the student what you were doing before the break (in simple English).
+  3) Immediately continue the planned activity from where you stopped. Do NOT repeat your full introduction or the full lesson plan.
+- Keep this welcome-back moment SHORT, warm, and practical. Then go back into interactive practice.
+"""
+
+_CORE_BEHAVIOR = """
+**Core Behavior:**
+- Speak slowly and clearly.
+- Adapt to the student's level.
+- If the student makes a mistake, correct it gently and explain briefly.
+- Answer primarily based on the language mode set above.
+- Keep your turns SHORT: usually 1–3 short sentences, then stop and wait.
+- Never monologue for a long time; give the student frequent chances to speak.
+- If the student starts speaking (interrupts you), IMMEDIATELY stop your idea, listen,
+  and then continue your explanation taking into account what they just said.
+- Prefer many short interactive exchanges over one long explanation.
+"""
+
+
+# Edited from the admin panel (see reload_beginner_rules)
+BEGINNER_RULES_PATH = os.path.join(os.getcwd(), "app", "data", "tutor_rules_beginner.json")
+BEGINNER_LEVELS = frozenset({"A1", "Beginner", "Absolute Beginner", "Zero"})
+
+
+@functools.lru_cache(maxsize=None)
+def _beginner_curriculum_block() -> str:
+    """Absolute beginner curriculum section of the tutor prompt.
+
+    The rules file is read and formatted once per process (until
+    reload_beginner_rules). Load errors propagate (and aren't cached) so the
+    caller can report them.
+    """
+    if not os.path.exists(BEGINNER_RULES_PATH):
+        return ""
+    with open(BEGINNER_RULES_PATH, "r", encoding="utf-8") as f:
+        beginner_rules = json.load(f)
+
+    sep = "\\n"
+    beginner_lines = []
+    beginner_lines.append("\\n**🎓 SPECIAL CURRICULUM: ABSOLUTE BEGINNER**")
+    beginner_lines.append("You are teaching a complete beginner. Follow this strict structure.")
+    
+    beginner_lines.append(f"\\n**Goals:**")
+    beginner_lines.extend(f"- {g}" for g in beginner_rules.get('goals', []))
+    
+    beginner_lines.append("\\n**Teaching Principles (CRITICAL):**")
+    beginner_lines.extend(f"- {p}" for p in beginner_rules.get('teaching_principles', []))
+        
+    beginner_lines.append("\\n**⛔ FORBIDDEN (DO NOT DO THIS):**")
+    beginner_lines.extend(f"- {f}" for f in beginner_rules.get('forbidden', []))
+        
+    beginner_lines.append("\\n**📋 Lesson Structure (Follow strictly step-by-step):**")
+    for step in beginner_rules.get('lesson_structure', []):
+        beginner_lines.append(f"Step {step['step']} [{step['name']}]: {step['description']}")
+        beginner_lines.append(f"   Example: \"{step['example']}\"")
+        
+    beginner_lines.append("\\n**Core Vocabulary (Limit yourself to these):**")
+    cats = beginner_rules.get('core_categories', {})
+    beginner_lines.extend(f"- {cat}: {', '.join(words)}" for cat, words in cats.items())
+        
+    beginner_lines.append("\\n**Grammar Explanations:**")
+    beginner_lines.extend(
+        f"- {rule['rule']}: {rule['explanation']}"
+        for rule in beginner_rules.get('grammar_rules', [])
+    )
+    return sep + sep.join(beginner_lines)
+
+
+def reload_beginner_rules() -> None:
+    """Drop the rendered beginner curriculum and the prompts built from it."""
+    _beginner_curriculum_block.cache_clear()
+    invalidate_tutor_prompt()
+
+
+def _build_tutor_system_prompt_uncached(
+    session: Session,
+    user: UserProfile,
+    lesson_session_id: Optional[int],
+    is_resume: bool,
+    legacy_rule_texts: Tuple[str, ...],
+    prefs: dict,
+) -> str:
+    """Load everything the tutor prompt needs and build it.
+
+    Legacy system rules (backward compatibility) are passed in already loaded
+    from the rules cache, and the user's preferences already parsed.
+    """
+    # 2. Fetch New TutorRule (active, global + student-specific + session-scoped)
+    # in one query; ordered global first, then student, then session, each by
+    # priority
+    scope_filters = [
+        TutorRule.scope == "global",
+        and_(
+            TutorRule.scope == "student",
+            TutorRule.applies_to_student_id == user.user_account_id,
+        ),
+    ]
+    if lesson_session_id:
+        scope_filters.append(TutorRule.scope == "session")
+    scope_order = case(
+        (TutorRule.scope == "global", 0),
+        (TutorRule.scope == "student", 1),
+        else_=2,
+    )
+    all_new_rules = session.exec(
+        select(TutorRule)
+        .where(TutorRule.is_active == True, or_(*scope_filters))
+        .order_by(scope_order, TutorRule.priority)
+    ).all()
+    
+    # 3. Fetch Language Mode and pause metadata (if lesson_session_id provided)
+    language_mode = None
+    language_level = None
+    pause_count = 0
+    last_pause_summary: Optional[str] = None
+    if lesson_session_id:
+        # Pause metadata is stored in LessonPauseEvent to avoid altering the existing lesson_sessions schema.
+        # The lesson's mode and its pause count / latest summary come back in
+        # one round trip; the pause events themselves are never loaded.
+        lesson_row = session.exec(
+            select(
+                LessonSession.language_mode,
+                LessonSession.language_level,
+                select(func.count(LessonPauseEvent.id))
+                .where(LessonPauseEvent.lesson_session_id == LessonSession.id)
+                .scalar_subquery(),
+                select(LessonPauseEvent.summary_text)
+                .where(LessonPauseEvent.lesson_session_id == LessonSession.id)
+                .order_by(LessonPauseEvent.paused_at.desc())
+                .limit(1)
+                .scalar_subquery(),
+            ).where(LessonSession.id == lesson_session_id)
+        ).first()
+        if lesson_row:
+            language_mode, language_level, pause_count, last_pause_summary = lesson_row
+    
+    # 4. User Preferences
+    preferred_address = prefs.get("preferred_address")
+    intro_prefs = prefs.get("intro") or {}
+    
+    # 5. Fetch Memory
+    memory = get_tutor_memory_for_user(session, user.id)
+    
+    # 6. Construct Prompt
+    # Sections are separated by a literal "\n" marker, as the prompt always has
+    # been; each optional block below carries its own leading separator or is "".
+    sep = "\\n"
+
+    # --- LANGUAGE MODE SECTION (CRITICAL) ---
+    language_mode_block = ""
+    if language_mode is None and lesson_session_id:
+        # Language mode not set - must ask at the start
+        language_mode_block = sep + _FIRST_INTERACTION_LANGUAGE_SELECT
+    elif language_mode == "EN_ONLY":
+        language_mode_block = sep + _MODE_EN_ONLY
+    elif language_mode == "RU_ONLY":
+        language_mode_block = sep + _MODE_RU_ONLY
+    elif language_mode == "MIXED":
+        level_desc = f" (Level {language_level}/5)" if language_level else ""
+        language_mode_block = sep + _MODE_MIXED_TEMPLATE.format(level_desc=level_desc)
     
     # --- NEW RULES BY TYPE ---
-   # Group new rules by type for better organization
-    greeting_rules = [r for r in all_new_rules if r.type == "greeting"]
-    toxicity_rules = [r for r in all_new_rules if r.type == "toxicity_warning"]
-    difficulty_rules = [r for r in all_new_rules if r.type == "difficulty_adjustment"]
-    language_mode_rules = [r for r in all_new_rules if r.type == "language_mode"]
-    other_rules = [r for r in all_new_rules if r.type == "other"]
+    # Group new rules by type in one pass (each bucket keeps the query order)
+    rules_by_type = defaultdict(list)
+    for rule in all_new_rules:
+        rules_by_type[rule.type].append(rule)
+    greeting_rules = rules_by_type["greeting"]
+    toxicity_rules = rules_by_type["toxicity_warning"]
+    difficulty_rules = rules_by_type["difficulty_adjustment"]
+    language_mode_rules = rules_by_type["language_mode"]
+    other_rules = rules_by_type["other"]
+    rule_lines = []
     
     # Apply Language Mode Rules (in addition to built-in mode behavior)
     if language_mode_rules:
-        prompt_parts.append("\\n**Language Mode Rules (from Admin):**")
+        rule_lines.append("\\n**Language Mode Rules (from Admin):**")
         for rule in language_mode_rules:
-            prompt_parts.append(f"- {rule.description}")
-            if rule.action:
-                try:
-                    action = json.loads(rule.action)
-                    for key, value in action.items():
-                        prompt_parts.append(f"  {key}: {value}")
-                except:
-                    pass
+            rule_lines.append(f"- {rule.description}")
+            action = _parse_rule_json(rule.action)
+            if isinstance(action, dict):
+                for key, value in action.items():
+                    rule_lines.append(f"  {key}: {value}")
     
     # Apply Greeting Rules
     if greeting_rules:
-        prompt_parts.append("\\n**Greeting Instructions:**")
+        rule_lines.append("\\n**Greeting Instructions:**")
         for rule in greeting_rules:
-            prompt_parts.append(f"- {rule.description}")
-            if rule.action:
-                try:
-                    action = json.loads(rule.action)
-                    if "say" in action:
-                        prompt_parts.append(f"  Use this greeting: \"{action['say']}\"")
-                except:
-                    pass
+            rule_lines.append(f"- {rule.description}")
+            action = _parse_rule_json(rule.action)
+            if isinstance(action, dict) and "say" in action:
+                rule_lines.append(f"  Use this greeting: \"{action['say']}\"")
     
     # Apply Toxicity Rules
     if toxicity_rules:
-        prompt_parts.append("\\n**Behavior Rules:**")
+        rule_lines.append("\\n**Behavior Rules:**")
         for rule in toxicity_rules:
-            prompt_parts.append(f"- {rule.description}")
-            if rule.trigger_condition:
-                try:
-                    condition = json.loads(rule.trigger_condition)
-                    prompt_parts.append(f"  Trigger: {json.dumps(condition)}")
-                except:
-                    pass
-            if rule.action:
-                try:
-                    action = json.loads(rule.action)
-                    if "say" in action:
-                        prompt_parts.append(f"  Action: Say \"{action['say']}\"")
-                except:
-                    pass
+            rule_lines.append(f"- {rule.description}")
+            condition = _parse_rule_json(rule.trigger_condition)
+            if condition is not _INVALID_RULE_JSON:
+                rule_lines.append(f"  Trigger: {json.dumps(condition)}")
+            action = _parse_rule_json(rule.action)
+            if isinstance(action, dict) and "say" in action:
+                rule_lines.append(f"  Action: Say \"{action['say']}\"")
    
     # Apply Difficulty Rules
     if difficulty_rules:
-        prompt_parts.append("\\n**Difficulty Adaptation:**")
-        for rule in difficulty_rules:
-            prompt_parts.append(f"- {rule.description}")
+        rule_lines.append("\\n**Difficulty Adaptation:**")
+        rule_lines.extend(f"- {rule.description}" for rule in difficulty_rules)
     
     # Apply Other Rules
     if other_rules:
-        prompt_parts.append("\\n**Additional Rules:**")
-        for rule in other_rules:
-            prompt_parts.append(f"- {rule.description}")
+        rule_lines.append("\\n**Additional Rules:**")
+        rule_lines.extend(f"- {rule.description}" for rule in other_rules)
     
     # Legacy System Rules (for backward compatibility)
-    if legacy_rules:
-        prompt_parts.append("\\n**System Rules:**")
-        for rule in legacy_rules:
-            prompt_parts.append(f"- {rule.rule_text}")
-            
-    # Personalization
-    prompt_parts.append("\\n**Student Context:**")
-    prompt_parts.append(f"Name: {user.name}")
-    prompt_parts.append(f"Level: {user.english_level}")
+    if legacy_rule_texts:
+        rule_lines.append("\\n**System Rules:**")
+        rule_lines.extend(f"- {rule_text}" for rule_text in legacy_rule_texts)
+    rules_block = sep + sep.join(rule_lines) if rule_lines else ""
 
     # Intro-based personalization (from onboarding)
+    intro_lines = []
     if intro_prefs:
         tutor_name = intro_prefs.get("tutor_name")
         if tutor_name:
-            prompt_parts.append(
+            intro_lines.append(
                 f"TutorName (how the student calls you): {tutor_name}"
             )
-            prompt_parts.append(
+            intro_lines.append(
                 "When you introduce yourself in Russian, say \"Меня зовут "
                 f"{tutor_name}\" and consistently use this name."
             )
@@ -607,7 +946,7 @@ This is the student's FIRST message in this session. You MUST:
             else:
                 mode_desc = "вы (formal, respectful)"
                 mode_word = "вы"
-            prompt_parts.append(
+            intro_lines.append(
                 "When speaking Russian, ALWAYS address the student using "
                 f"\"{mode_word}\" ({mode_desc}). Do not switch unless the student explicitly asks."
             )
@@ -615,136 +954,94 @@ This is the student's FIRST message in this session. You MUST:
         conversation_style = intro_prefs.get("conversation_style")
         humor_allowed = intro_prefs.get("humor_allowed")
         if conversation_style or humor_allowed is not None:
-            prompt_parts.append("\\n**Style Preferences (from onboarding):**")
+            intro_lines.append("\\n**Style Preferences (from onboarding):**")
             if conversation_style == "informal":
-                prompt_parts.append(
+                intro_lines.append(
                     "- Use a relatively informal, relaxed tone. You may use simple jokes and light slang, "
                     "but stay kind and supportive."
                 )
             elif conversation_style == "formal":
-                prompt_parts.append(
+                intro_lines.append(
                     "- Use a more formal, teacher-like tone. Avoid slang and too many jokes."
                 )
             if humor_allowed is True:
-                prompt_parts.append(
+                intro_lines.append(
                     "- Light humor is allowed if it helps the student relax."
                 )
             elif humor_allowed is False:
-                prompt_parts.append(
+                intro_lines.append(
                     "- Avoid jokes and sarcasm; keep communication neutral and respectful."
                 )
 
         goals = intro_prefs.get("goals") or []
         topics = intro_prefs.get("topics_interest") or []
         if goals or topics:
-            prompt_parts.append("\\n**Student Goals and Interests (from onboarding):**")
+            intro_lines.append("\\n**Student Goals and Interests (from onboarding):**")
             if goals:
                 goals_str = ", ".join(str(g) for g in goals)
-                prompt_parts.append(f"- Goals: {goals_str}")
+                intro_lines.append(f"- Goals: {goals_str}")
             if topics:
                 topics_str = ", ".join(str(t) for t in topics)
-                prompt_parts.append(f"- Topics they enjoy: {topics_str}")
+                intro_lines.append(f"- Topics they enjoy: {topics_str}")
 
         correction_style = intro_prefs.get("correction_style")
         if correction_style:
-            prompt_parts.append("\\n**Error Correction Preference (from onboarding):**")
+            intro_lines.append("\\n**Error Correction Preference (from onboarding):**")
             if correction_style == "often":
-                prompt_parts.append(
+                intro_lines.append(
                     "- The student wants frequent corrections. Correct most clear mistakes, but still be gentle."
                 )
             elif correction_style == "on_request":
-                prompt_parts.append(
+                intro_lines.append(
                     "- Correct mainly when the student asks you to, or when a mistake is blocking understanding."
                 )
             elif correction_style == "soft":
-                prompt_parts.append(
+                intro_lines.append(
                     "- Correct softly without interrupting their speech too much. Prioritize fluency over perfection."
                 )
+    intro_block = sep + sep.join(intro_lines) if intro_lines else ""
 
     if preferred_address:
-        prompt_parts.append(f"Preferred Address: {preferred_address}")
+        address_line = f"Preferred Address: {preferred_address}"
     else:
-        prompt_parts.append("Preferred Address: Not set. You should politely ask for it in the first message.")
+        address_line = "Preferred Address: Not set. You should politely ask for it in the first message."
 
     # --- ABSOLUTE BEGINNER CURRICULUM INJECTION ---
     # Check if user is beginner (A1 or explicit "Absolute Beginner")
-    if user.english_level in ["A1", "Beginner", "Absolute Beginner", "Zero"]:
+    beginner_block = ""
+    if user.english_level in BEGINNER_LEVELS:
         try:
-            import os
-            rules_path = os.path.join(os.getcwd(), "app", "data", "tutor_rules_beginner.json")
-            if os.path.exists(rules_path):
-                with open(rules_path, "r", encoding="utf-8") as f:
-                    beginner_rules = json.load(f)
-                
-                prompt_parts.append("\\n**🎓 SPECIAL CURRICULUM: ABSOLUTE BEGINNER**")
-                prompt_parts.append("You are teaching a complete beginner. Follow this strict structure.")
-                
-                prompt_parts.append(f"\\n**Goals:**")
-                for g in beginner_rules.get('goals', []):
-                    prompt_parts.append(f"- {g}")
-                
-                prompt_parts.append("\\n**Teaching Principles (CRITICAL):**")
-                for p in beginner_rules.get('teaching_principles', []):
-                    prompt_parts.append(f"- {p}")
-                    
-                prompt_parts.append("\\n**⛔ FORBIDDEN (DO NOT DO THIS):**")
-                for f in beginner_rules.get('forbidden', []):
-                    prompt_parts.append(f"- {f}")
-                    
-                prompt_parts.append("\\n**📋 Lesson Structure (Follow strictly step-by-step):**")
-                for step in beginner_rules.get('lesson_structure', []):
-                    prompt_parts.append(f"Step {step['step']} [{step['name']}]: {step['description']}")
-                    prompt_parts.append(f"   Example: \"{step['example']}\"")
-                    
-                prompt_parts.append("\\n**Core Vocabulary (Limit yourself to these):**")
-                cats = beginner_rules.get('core_categories', {})
-                for cat, words in cats.items():
-                    prompt_parts.append(f"- {cat}: {', '.join(words)}")
-                    
-                prompt_parts.append("\\n**Grammar Explanations:**")
-                for rule in beginner_rules.get('grammar_rules', []):
-                    prompt_parts.append(f"- {rule['rule']}: {rule['explanation']}")
-                    
+            beginner_block = _beginner_curriculum_block()
         except Exception as e:
             # Fallback or log error
-            prompt_parts.append(f"\\n[System Error loading beginner rules: {str(e)}]")
+            beginner_block = f"{sep}\\n[System Error loading beginner rules: {str(e)}]"
 
     # Memory
-    prompt_parts.append("\\n**Memory:**")
+    memory_block = ""
     if memory["last_summary"]:
-        prompt_parts.append(f"Last Lesson Summary: {memory['last_summary']}")
+        memory_block += f"{sep}Last Lesson Summary: {memory['last_summary']}"
     if memory["weak_words"]:
-        prompt_parts.append(f"Weak Words to Practice: {', '.join(memory['weak_words'])}")
+        memory_block += f"{sep}Weak Words to Practice: {', '.join(memory['weak_words'])}"
 
     # Pause / Resume context
+    pause_block = ""
     if lesson_session_id and pause_count > 0:
-        prompt_parts.append("\\n**Pause / Resume Context:**")
-        prompt_parts.append(f"This lesson has been paused {pause_count} time(s) before.")
+        pause_block = (
+            f"{sep}\\n**Pause / Resume Context:**"
+            f"{sep}This lesson has been paused {pause_count} time(s) before."
+        )
         if last_pause_summary:
-            prompt_parts.append(f"Most recent pause summary (what you did before the break): {last_pause_summary}")
+            pause_block += f"{sep}Most recent pause summary (what you did before the break): {last_pause_summary}"
 
     # If this is a resumed session, instruct the tutor how to continue
+    resume_block = ""
     if is_resume:
-        prompt_parts.append("""\n**⏸️ RESUMED LESSON BEHAVIOR (AFTER A BREAK):**
-- The student has come back to the SAME lesson after a pause.
-- In your VERY NEXT MESSAGE you MUST:
-  1) Start with a very short "welcome back" style greeting (1–2 short sentences).
-  2) If you have a pause summary, briefly remind the student what you were doing before the break (in simple English).
-  3) Immediately continue the planned activity from where you stopped. Do NOT repeat your full introduction or the full lesson plan.
-- Keep this welcome-back moment SHORT, warm, and practical. Then go back into interactive practice.
-""")
-        
-    # Standard Instructions (can be partially replaced by rules, but keeping core logic here)
-    prompt_parts.append("""\n**Core Behavior:**
-- Speak slowly and clearly.
-- Adapt to the student's level.
-- If the student makes a mistake, correct it gently and explain briefly.
-- Answer primarily based on the language mode set above.
-- Keep your turns SHORT: usually 1–3 short sentences, then stop and wait.
-- Never monologue for a long time; give the student frequent chances to speak.
-- If the student starts speaking (interrupts you), IMMEDIATELY stop your idea, listen,
-  and then continue your explanation taking into account what they just said.
-- Prefer many short interactive exchanges over one long explanation.
-""")
-
-    return "\\n".join(prompt_parts)
+        resume_block = sep + _RESUMED_LESSON_BEHAVIOR
+
+    # Fixed skeleton: identity, greeting protocol, the optional blocks above,
+    # student context and the standard instructions (can be partially replaced
+    # by rules, but keeping core logic here).
+    return f"""You are a personal English tutor for a Russian-speaking student.{sep}{_UNIVERSAL_GREETING_PROTOCOL}{sep}\\n**🗣️ LANGUAGE MODE FOR THIS SESSION:**{language_mode_block}{rules_block}\
+{sep}\\n**Student Context:**{sep}Name: {user.name}{sep}Level: {user.english_level}\
+{intro_block}{sep}{address_line}{beginner_block}\
+{sep}\\n**Memory:**{memory_block}{pause_block}{resume_block}{sep}{_CORE_BEHAVIOR}"""
@@ -0,0 +1,20 @@
+-- Migration: Batch API jobs for background brain analysis
+-- Date: 2026-10-16
+-- Purpose: Track OpenAI Batch API submissions until their results are saved
+
+CREATE TABLE IF NOT EXISTS tutor_brain_batches (
+    id SERIAL PRIMARY KEY,
+    openai_batch_id VARCHAR(100) NOT NULL UNIQUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'submitted',
+
+    -- Turn ids in the batch (custom_id of each request)
+    turn_ids_json JSONB NOT NULL DEFAULT '[]'::jsonb,
+
+    created_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now()),
+    completed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_tutor_brain_batches_status ON tutor_brain_batches(status);
+
+COMMENT ON TABLE tutor_brain_batches IS 'OpenAI Batch API jobs holding background brain analyses';
+COMMENT ON COLUMN tutor_brain_batches.status IS 'submitted, completed, failed, expired or cancelled';
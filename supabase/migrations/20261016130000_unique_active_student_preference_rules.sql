@@ -0,0 +1,32 @@
+-- Migration: One active speech preference rule per student and type
+-- Date: 2026-10-16
+-- Purpose: Partial unique index that SessionRuleManager's ON CONFLICT upsert
+--          of detected preferences relies on (mirrors alembic c3e8f1a4d6b2)
+
+-- tutor_rules is created by the app/alembic, so skip if it isn't there yet
+DO $$
+BEGIN
+    IF to_regclass('public.tutor_rules') IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Keep only the newest active preference per student and type
+    UPDATE tutor_rules SET is_active = false
+    WHERE is_active AND scope = 'student'
+      AND type IN ('language', 'speech_pace', 'correction_style')
+      AND applies_to_student_id IS NOT NULL
+      AND id NOT IN (
+          SELECT MAX(id) FROM tutor_rules
+          WHERE is_active AND scope = 'student'
+            AND type IN ('language', 'speech_pace', 'correction_style')
+            AND applies_to_student_id IS NOT NULL
+          GROUP BY applies_to_student_id, type
+      );
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_tutor_rules_active_student_preference
+        ON tutor_rules (applies_to_student_id, type)
+        WHERE is_active AND scope = 'student'
+          AND type IN ('language', 'speech_pace', 'correction_style');
+
+    COMMENT ON INDEX uq_tutor_rules_active_student_preference IS 'At most one active language/speech_pace/correction_style rule per student';
+END $$;
@@ -0,0 +1,140 @@
+"""
+Test script for Batch API result processing (SmartBrainService.process_completed_batches)
+
+Uses an in-memory SQLite database and a fake OpenAI client to verify that a
+batch which fails partway through saving leaves nothing behind, and that the
+next poll saves every turn exactly once.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add app to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.models import (
+    UserAccount, TutorLesson, TutorLessonTurn, TutorBrainEvent,
+    TutorBrainBatch, TutorStudentKnowledge, TutorRule,
+)
+from app.services import smart_brain
+from app.services.smart_brain import SmartBrainService
+
+ANALYSIS = {
+    "weak_words": [{"word": "went", "reason": "usage"}],
+    "grammar_issues": [{"pattern": "past_simple", "mistake": "I go", "correction": "I went"}],
+    "suggested_rules": [{"type": "practice", "description": "Drill past simple", "priority": 5}],
+}
+
+
+class FakeBatchClient:
+    """Just enough of AsyncOpenAI for process_completed_batches."""
+
+    def __init__(self, output_text: str):
+        async def retrieve(batch_id):
+            return SimpleNamespace(status="completed", output_file_id="file-out")
+
+        async def content(file_id):
+            return SimpleNamespace(text=output_text)
+
+        self.batches = SimpleNamespace(retrieve=retrieve)
+        self.files = SimpleNamespace(content=content)
+
+
+def _output_line(turn_id: int) -> str:
+    return json.dumps({
+        "custom_id": str(turn_id),
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"content": json.dumps(ANALYSIS)}}]},
+        },
+    })
+
+
+def test_partial_failure_is_not_saved_twice():
+    """A batch that fails midway is saved in full, exactly once, on the next poll."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        user = UserAccount(email="batch@ailingva.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        lesson = TutorLesson(user_id=user.id, lesson_number=1)
+        session.add(lesson)
+        session.add(TutorStudentKnowledge(user_id=user.id))
+        session.commit()
+        turns = [
+            TutorLessonTurn(lesson_id=lesson.id, user_id=user.id, turn_index=i, user_text=f"I go {i}")
+            for i in range(3)
+        ]
+        session.add_all(turns)
+        session.commit()
+        turn_ids = [t.id for t in turns]
+        session.add(TutorBrainBatch(openai_batch_id="batch-1", turn_ids_json=turn_ids))
+        session.commit()
+        user_id = user.id
+
+    output = "\n".join(_output_line(turn_id) for turn_id in turn_ids) + "\n"
+    original_get_client = smart_brain.get_async_openai_client
+    original_save = SmartBrainService.save_analysis_to_db
+    smart_brain.get_async_openai_client = lambda api_key: FakeBatchClient(output)
+    try:
+        # Poll 1: the second result line fails to save
+        calls = {"n": 0}
+
+        def failing_save(self, *args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 2:
+                raise RuntimeError("simulated DB failure")
+            return original_save(self, *args, **kwargs)
+
+        SmartBrainService.save_analysis_to_db = failing_save
+        with Session(engine) as session:
+            saved = asyncio.run(SmartBrainService(session, "sk-test").process_completed_batches())
+        assert saved == 0
+
+        with Session(engine) as session:
+            batch = session.exec(select(TutorBrainBatch)).one()
+            assert batch.status == "submitted"
+            assert session.exec(select(TutorBrainEvent)).all() == []
+
+        # Poll 2: everything is saved once; poll 3 finds nothing left to do
+        SmartBrainService.save_analysis_to_db = original_save
+        for expected in (3, 0):
+            with Session(engine) as session:
+                saved = asyncio.run(SmartBrainService(session, "sk-test").process_completed_batches())
+            assert saved == expected
+    finally:
+        SmartBrainService.save_analysis_to_db = original_save
+        smart_brain.get_async_openai_client = original_get_client
+
+    with Session(engine) as session:
+        assert session.exec(select(TutorBrainBatch)).one().status == "completed"
+        for turn_id in turn_ids:
+            events = session.exec(
+                select(TutorBrainEvent).where(TutorBrainEvent.turn_id == turn_id)
+            ).all()
+            # One weak word + one grammar issue per turn
+            assert len(events) == 2, (turn_id, len(events))
+        rules = session.exec(
+            select(TutorRule).where(TutorRule.source == "brain_analysis")
+        ).all()
+        assert len(rules) == 3
+
+        knowledge = session.get(TutorStudentKnowledge, user_id)
+        pattern = knowledge.grammar_json["patterns"]["past_simple"]
+        assert pattern["attempts"] == 3 and pattern["mistakes"] == 3
+        assert [w["word"] for w in knowledge.vocabulary_json["weak"]] == ["went"]
+
+    print("✅ Partially failed batch was saved exactly once")
+
+
+if __name__ == "__main__":
+    test_partial_failure_is_not_saved_twice()